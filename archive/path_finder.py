@@ -1,11 +1,21 @@
 # src/path_finder.py
 from shapely.geometry import Point
+from scipy.spatial import cKDTree
 import networkx as nx
 import numpy as np
 
+def _node_index(graph):
+    """KD-tree over the graph nodes, built once and kept on the graph."""
+    if "_node_index" not in graph.graph or graph.graph["_node_index"][0] != graph.number_of_nodes():
+        nodes = list(graph.nodes)
+        graph.graph["_node_index"] = (len(nodes), nodes, cKDTree(np.asarray(nodes, dtype=float)))
+    return graph.graph["_node_index"]
+
 def find_nearest_node(graph, point):
     """ابحث عن أقرب عقدة للطريق من نقطة معينة."""
-    return min(graph.nodes, key=lambda node: Point(node).distance(point))
+    _, nodes, tree = _node_index(graph)
+    _, idx = tree.query([point.x, point.y])
+    return nodes[idx]
 
 def get_shortest_path(graph, origin: Point, target: Point):
     u = find_nearest_node(graph, origin)
@@ -3,7 +3,7 @@
 # src/main.py
 
 import logging
-from src.config import WEIGHTS_PATH, SHELTER_INPUT, SCORED_OUTPUT, MAPS_DIR
+from src.config import WEIGHTS_PATH, SHELTER_INPUT, SCORED_OUTPUT, SCORED_EXPORT, MAPS_DIR, AHP_PAIRWISE_MATRIX, AHP_CRITERIA
 from src.ahp_analysis import ahp_from_matrix, save_ahp_result
 from src.mcda_scoring import normalize_and_score
 from src.map_visualizer import  visualize_shelters
@@ -11,12 +11,10 @@ from src.map_visualizer import  visualize_shelters
 import numpy as np
 import os
 # from shapely.geometry import Point
-# from archive.road_graph_builder import build_road_graph
-# from archive.path_finder import get_shortest_path
-# import geopandas as gpd
+# from src.road_graph import load_road_graph
+# from src.routing import get_shortest_path
+# from src.shelter_query import ShelterIndex
 
-# roads_path = "data/geo/roads.geojson"
-# shelters_gdf = gpd.read_file("outputs/results.geojson")
 # user_location = Point(39.22, 38.67)
 
 
@@ -25,14 +23,12 @@ import os
 
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
 
-# الخطوة 1: مصفوفة المقارنة الزوجية (تقوم بتعديلها حسب مشروعك)
-PAIRWISE_MATRIX = np.array([
-    [1,   3,   5,   7],
-    [1/3, 1,   3,   5],
-    [1/5, 1/3, 1,   3],
-    [1/7, 1/5, 1/3, 1]
-])
-CRITERIA_NAMES = ["Distance_to_Roads", "Distance_to_Faults", "Population_Density", "LandUse_Score"]
+# هذا الملف يشغّل AHP → MCDA → الخريطة فقط؛ لتشغيل السلسلة كاملة (create_* → enrichment → AHP → MCDA → map)
+# مع تخطي المراحل المحدّثة: python -m src.pipeline  (انظر src/pipeline.py)
+
+# الخطوة 1: مصفوفة المقارنة الزوجية (تُعدَّل في src/config.py حسب مشروعك)
+PAIRWISE_MATRIX = np.array(AHP_PAIRWISE_MATRIX)
+CRITERIA_NAMES = AHP_CRITERIA
 
 def main():
     # 1. حساب الأوزان باستخدام AHP
@@ -44,7 +40,8 @@ def main():
         input_path=SHELTER_INPUT,
         output_path=SCORED_OUTPUT,
         weights_path=WEIGHTS_PATH,
-        export_csv=True
+        export_csv=True,
+        geojson_path=SCORED_EXPORT
     )
 
     # 3. إنشاء الخريطة التفاعلية
@@ -52,14 +49,15 @@ def main():
         gdf=scored_gdf,
         output_path=os.path.join(MAPS_DIR, "shelter_map.html")
     )
-    # G = build_road_graph(roads_path)
-    # # اختر أقرب مأوى
-    # target_shelter = shelters_gdf.sort_values("score", ascending=False).iloc[0]
+    # graph = load_road_graph()
+    # # اختر أفضل مأوى ضمن 5 كم (بدون إعادة ترتيب جميع الملاجئ)
+    # shelter_index = ShelterIndex(scored_gdf)
+    # target_shelter = shelter_index.best_near(user_location, radius=5000)
     # target_point = target_shelter.geometry
 
-    # path_coords = get_shortest_path(G, user_location, target_point)
-    # print("🚶‍♂️ المسار الآمن:", path_coords) 
-    # show_path_on_map(path_coords)
+    # route = get_shortest_path(graph, user_location, target_point)
+    # print("🚶‍♂️ المسار الآمن:", route["path"], f"({route['distance']:.0f} m)")
+    # show_path_on_map(route["path"])
 
 
 if __name__ == "__main__":
@@ -5,42 +5,104 @@ import pandas as pd
 import numpy as np
 from shapely.geometry import Point
 from src import config, load_data
+from src.spatial_index import NearestFeatureIndex
+from src.enrichment_cache import criterion_key, load_cached_columns, save_cached_columns
+from src.projection_context import ProjectionContext
+from src.storage import read_layer, write_layer, export_geojson, resolve_layer_path
+from src.raster_sampling import sample_points, zonal_stats
+from src.distance_field import lookup_distances
+from src.landuse import build_landuse_score_table
+from src.config import LANDUSE_SCORE_RULES, LANDUSE_MATCH_SCORE, LANDUSE_DEFAULT_SCORE
 
 # إعداد اللوج
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
-PROJECTED_CRS = "EPSG:32637"  # UTM Zone 37N - مناسب للمنطقة الشرقية من تركيا
+PROJECTED_CRS = config.PROJECTED_CRS
+ENRICHMENT_VERSION = 2  # يجب زيادته عند تغيير طريقة حساب المعايير لإبطال الكاش
 
-def calculate_distance_to_nearest(source_gdf, target_gdf, label):
+SHELTERS_PATH = "data/geo/shelters.geojson"
+ROADS_PATH = "data/geo/roads.geojson"
+FAULTS_PATH = "data/processed/fault_lines_elazig.geojson"
+POPULATION_PATH = "data/processed/population.geojson"
+LANDUSE_PATH = "data/processed/landuse.geojson"
+SLOPE_PATH = "data/processed/slope.tif"
+DEM_PATH = config.DEM_PATH
+
+def calculate_distance_to_nearest(source_gdf, target_gdf, label, id_label=None):
     """
     حساب أقرب مسافة من كل نقطة في source_gdf إلى أقرب مكان في target_gdf
+
+    يتم بناء فهرس مكاني (STRtree) مرة واحدة للطبقة الهدف ثم الاستعلام عن جميع النقاط دفعة واحدة.
+    إذا تم تمرير id_label يتم حفظ معرف أقرب عنصر أيضًا.
     """
     target_gdf = target_gdf.to_crs(PROJECTED_CRS)
     source_gdf = source_gdf.to_crs(PROJECTED_CRS)
-    source_gdf[label] = source_gdf.geometry.apply(lambda x: target_gdf.distance(x).min())
+    columns = nearest_distance_columns(source_gdf, target_gdf, label, id_label)
+    for col in columns.columns:
+        source_gdf[col] = columns[col].to_numpy()
     return source_gdf.to_crs("EPSG:4326")
 
+
+def nearest_distance_columns(source_proj, target_proj, label, id_label=None):
+    """
+    نسخة تعمل على طبقات مسقطة مسبقًا (بدون أي إعادة إسقاط) وتعيد الأعمدة الناتجة فقط
+    """
+    index = NearestFeatureIndex(target_proj)
+    distances, nearest_ids = index.query(source_proj.geometry)
+    columns = pd.DataFrame({label: distances})
+    if id_label:
+        columns[id_label] = nearest_ids
+    return columns
+
+
+def distance_columns(source_proj, target_proj, label, target_path, method=None):
+    """
+    أقرب مسافة حسب الطريقة المختارة: "vector" استعلام دقيق عبر الفهرس المكاني،
+    "field" قراءة من حقل مسافات نقطي مخزن (خطأ أقصى ≈ 1.5 × الدقة، انظر src/distance_field.py)
+    """
+    method = method or config.DISTANCE_METHOD
+    if method == "vector":
+        return nearest_distance_columns(source_proj, target_proj, label)
+    if method == "field":
+        return pd.DataFrame({label: lookup_distances(target_path, source_proj, layer=target_proj)})
+    raise ValueError(f"❌ Unknown distance method: '{method}'")
+
+
+def _distance_params(crs=PROJECTED_CRS):
+    params = {"crs": crs}
+    if config.DISTANCE_METHOD == "field":
+        params.update(distance_method="field", resolution=config.DISTANCE_FIELD_RESOLUTION, max_distance=config.DISTANCE_FIELD_MAX_DISTANCE)
+    return params
+
+
 def categorize_landuse(gdf, landuse_gdf):
     """
     تصنيف استخدام الأرض ومنح نقاط لكل نوع
+
+    يتم الربط المكاني دفعة واحدة (sjoin) ثم يؤخذ أول مضلع يحتوي النقطة حسب ترتيب الطبقة.
     """
     landuse_gdf = landuse_gdf.to_crs(gdf.crs)
+    gdf["LandUse_Score"] = landuse_score_values(gdf, landuse_gdf)
+    return gdf
 
-    def get_score(point):
-        for _, row in landuse_gdf.iterrows():
-            if row.geometry.contains(point):
-                land_type = str(row.get("landuse", "")).lower()
-                if "park" in land_type:
-                    return 0.9
-                elif "residential" in land_type:
-                    return 0.5
-                elif "industrial" in land_type:
-                    return 0.3
-                else:
-                    return 0.2
-        return 0.1  # default low score for undefined areas
 
-    gdf["LandUse_Score"] = gdf.geometry.apply(get_score)
-    return gdf
+def landuse_score_values(gdf, landuse_gdf):
+    """
+    درجات استخدام الأرض لطبقتين في نفس نظام الإحداثيات (مصفوفة بنفس ترتيب gdf)
+    """
+    landuse_gdf = landuse_gdf.reset_index(drop=True)
+
+    if "landuse" in landuse_gdf.columns:
+        polygon_scores = build_landuse_score_table(landuse_gdf["landuse"]).to_numpy()
+    else:
+        polygon_scores = np.full(len(landuse_gdf), LANDUSE_MATCH_SCORE)
+
+    points = gpd.GeoDataFrame(geometry=gdf.geometry.values, crs=gdf.crs)
+    joined = gpd.sjoin(points, landuse_gdf[["geometry"]], how="inner", predicate="within")
+    first_match = joined.groupby(level=0)["index_right"].min()
+
+    scores = np.full(len(gdf), LANDUSE_DEFAULT_SCORE)
+    scores[first_match.index.to_numpy()] = polygon_scores[first_match.to_numpy()]
+    return scores
 
 def match_population_density(gdf, pop_gdf):
     """
@@ -49,47 +111,190 @@ def match_population_density(gdf, pop_gdf):
     if not all(pop_gdf.geometry.type == "Point"):
         raise ValueError("❌ ملف الكثافة السكانية يجب أن يحتوي فقط على هندسة من النوع Point.")
 
-    gdf_proj = gdf.to_crs(PROJECTED_CRS)
+    gdf_proj = gdf.to_crs(PROJECTED_CRS).reset_index(drop=True)
     pop_proj = pop_gdf.to_crs(PROJECTED_CRS)
+    gdf_proj["Population_Density"] = population_density_values(gdf_proj, pop_proj)
+    return gdf_proj.to_crs("EPSG:4326")
 
-    joined = gpd.sjoin_nearest(gdf_proj, pop_proj, how="left", distance_col="pop_dist")
-    joined = joined.reset_index(drop=True)
-    gdf_proj = gdf_proj.reset_index(drop=True)
 
-    if "population_density" in joined.columns:
-        gdf_proj["Population_Density"] = joined["population_density"].fillna(joined["population_density"].mean())
-    elif "population_estimate" in joined.columns:
-        gdf_proj["Population_Density"] = joined["population_estimate"].fillna(joined["population_estimate"].mean())
-    else:
-        logging.warning("⚠️ لا يوجد عمود population_density أو population_estimate.")
-        gdf_proj["Population_Density"] = 0
+def population_density_values(gdf_proj, pop_proj):
+    """
+    الكثافة السكانية لأقرب نقطة سكانية لطبقتين مسقطتين مسبقًا (مصفوفة بنفس ترتيب gdf_proj)
+    """
+    if not all(pop_proj.geometry.type == "Point"):
+        raise ValueError("❌ ملف الكثافة السكانية يجب أن يحتوي فقط على هندسة من النوع Point.")
 
-    return gdf_proj.to_crs("EPSG:4326")
+    left = gpd.GeoDataFrame(geometry=gdf_proj.geometry.values, crs=gdf_proj.crs)
+    joined = gpd.sjoin_nearest(left, pop_proj, how="left", distance_col="pop_dist")
+    # في حالة التساوي في المسافة نحتفظ بأول تطابق فقط للحفاظ على ترتيب الصفوف
+    joined = joined[~joined.index.duplicated(keep="first")].sort_index()
 
-def main():
-    logging.info("📍 تحميل نقاط الملاجئ...")
-    shelters = gpd.read_file("data/geo/shelters.geojson")
+    for col in ["population_density", "population_estimate"]:
+        if col in joined.columns:
+            return joined[col].fillna(joined[col].mean()).to_numpy()
 
-    logging.info("🚗 تحميل شبكة الطرق...")
-    roads = gpd.read_file("data/geo/roads.geojson")
-    shelters = calculate_distance_to_nearest(shelters, roads, "Distance_to_Roads")
+    logging.warning("⚠️ لا يوجد عمود population_density أو population_estimate.")
+    return np.zeros(len(gdf_proj), dtype=int)
 
-    logging.info("🌍 تحميل خطوط الصدع...")
-    faults = gpd.read_file("data/processed/fault_lines_elazig.geojson")
-    shelters = calculate_distance_to_nearest(shelters, faults, "Distance_to_Faults")
+def raster_values(gdf, raster_path, method=config.TERRAIN_SAMPLING):
+    """
+    قراءة قيم طبقة نقطية (الميل، الارتفاع) عند كل ملجأ
 
-    logging.info("👥 تحميل الكثافة السكانية...")
-    population = gpd.read_file("data/processed/population.geojson")
-    shelters = match_population_density(shelters, population)
+    "zonal": متوسط البكسلات داخل مضلع الملجأ (مع الرجوع إلى الاستيفاء الخطي للمضلعات التي لا تغطي أي بكسل)،
+    "bilinear" / "nearest": قيمة عند نقطة داخل الملجأ.
+    """
+    if method != "zonal":
+        return sample_points(raster_path, gdf, method=method)
+
+    values = np.full(len(gdf), np.nan)
+    polygonal = gdf.geometry.geom_type.isin(["Polygon", "MultiPolygon"]).to_numpy()
+    if polygonal.any():
+        values[polygonal] = zonal_stats(raster_path, gdf[polygonal], stats=("mean",))["mean"].to_numpy()
+    missing = np.isnan(values)
+    if missing.any():
+        values[missing] = sample_points(raster_path, gdf[missing], method="bilinear")
+    return values
+
+
+def _enrichment_steps(roads_path, faults_path, population_path, landuse_path, slope_path=SLOPE_PATH,
+                      dem_path=DEM_PATH, crs=PROJECTED_CRS):
+    """
+    تعريف خطوات حساب المعايير: لكل معيار ملف الإدخال والأعمدة الناتجة والمعاملات التي تدخل في مفتاح الكاش
+
+    دوال compute تستقبل الملاجئ والطبقة بعد إسقاطهما على crs (افتراضيًا PROJECTED_CRS) وتعيد الأعمدة الناتجة فقط.
+    خطوات الطبقات النقطية (raster) تستقبل مسار الملف بدل الطبقة، وهي اختيارية: يتم تخطيها إذا لم يوجد الملف.
+    """
+    return [
+        {
+            "name": "roads",
+            "message": "🚗 تحميل شبكة الطرق...",
+            "path": roads_path,
+            "columns": ["Distance_to_Roads"],
+            "params": _distance_params(crs),
+            "compute": lambda shelters, layer: distance_columns(shelters, layer, "Distance_to_Roads", roads_path),
+        },
+        {
+            "name": "faults",
+            "message": "🌍 تحميل خطوط الصدع...",
+            "path": faults_path,
+            "columns": ["Distance_to_Faults"],
+            "params": _distance_params(crs),
+            "compute": lambda shelters, layer: distance_columns(shelters, layer, "Distance_to_Faults", faults_path),
+        },
+        {
+            "name": "population",
+            "message": "👥 تحميل الكثافة السكانية...",
+            "path": population_path,
+            "columns": ["Population_Density"],
+            "params": {"crs": crs},
+            "compute": lambda shelters, layer: pd.DataFrame(
+                {"Population_Density": population_density_values(shelters, layer)}
+            ),
+        },
+        {
+            "name": "landuse",
+            "message": "🌱 تحميل استخدامات الأراضي...",
+            "path": landuse_path,
+            "columns": ["LandUse_Score"],
+            "params": {
+                "crs": crs,
+                "rules": LANDUSE_SCORE_RULES,
+                "match_score": LANDUSE_MATCH_SCORE,
+                "default_score": LANDUSE_DEFAULT_SCORE,
+            },
+            "compute": lambda shelters, layer: pd.DataFrame(
+                {"LandUse_Score": landuse_score_values(shelters, layer)}
+            ),
+        },
+        {
+            "name": "slope",
+            "message": "⛰️ قراءة الميل من slope.tif...",
+            "path": slope_path,
+            "columns": ["Slope"],
+            "params": {"method": config.TERRAIN_SAMPLING},
+            "raster": True,
+            "optional": True,
+            "compute": lambda shelters, raster: pd.DataFrame({"Slope": raster_values(shelters, raster)}),
+        },
+        {
+            "name": "elevation",
+            "message": "🏔️ قراءة الارتفاع من DEM...",
+            "path": dem_path,
+            "columns": ["Elevation"],
+            "params": {"method": config.TERRAIN_SAMPLING},
+            "raster": True,
+            "optional": True,
+            "compute": lambda shelters, raster: pd.DataFrame({"Elevation": raster_values(shelters, raster)}),
+        },
+    ]
 
-    logging.info("🌱 تحميل استخدامات الأراضي...")
-    landuse = gpd.read_file("data/processed/landuse.geojson")
-    shelters = categorize_landuse(shelters, landuse)
 
-    output_path = config.SHELTER_INPUT
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    shelters.to_file(output_path, driver="GeoJSON")
+def enrich_shelters(
+    shelters_path=SHELTERS_PATH,
+    roads_path=ROADS_PATH,
+    faults_path=FAULTS_PATH,
+    population_path=POPULATION_PATH,
+    landuse_path=LANDUSE_PATH,
+    slope_path=SLOPE_PATH,
+    dem_path=DEM_PATH,
+    output_path=config.SHELTER_INPUT,
+    geojson_path=config.SHELTER_EXPORT,
+    cache_dir=config.ENRICHMENT_CACHE_DIR,
+    use_cache=True,
+    crs=PROJECTED_CRS,
+):
+    """
+    حساب جميع المعايير للملاجئ مع كاش لكل معيار
+
+    مفتاح الكاش = بصمة محتوى ملف الملاجئ + ملف الطبقة + معاملات الدالة،
+    لذلك لا يُعاد حساب إلا المعايير التي تغيرت مدخلاتها.
+    يتم إسقاط كل طبقة مرة واحدة فقط عبر ProjectionContext، والتحويل إلى EPSG:4326 عند الحفظ فقط.
+    crs هو النظام المتري للحساب (لكل منطقة منطقة UTM الخاصة بها، انظر src/region_runner.py).
+    """
+    logging.info("📍 تحميل نقاط الملاجئ...")
+    shelters_path = resolve_layer_path(shelters_path)
+    shelters = read_layer(shelters_path)
+    context = ProjectionContext(crs)
+
+    for step in _enrichment_steps(roads_path, faults_path, population_path, landuse_path, slope_path, dem_path, crs):
+        if step.get("optional") and not os.path.exists(step["path"]):
+            logging.warning(f"⚠️ الملف غير موجود، تم تخطي معيار {step['name']}: {step['path']}")
+            continue
+        params = dict(step["params"], version=ENRICHMENT_VERSION, columns=step["columns"])
+        layer_path = step["path"] if step.get("raster") else resolve_layer_path(step["path"])
+        key = criterion_key(step["name"], [shelters_path, layer_path], params)
+        cached = load_cached_columns(cache_dir, step["name"], key, shelters_path) if use_cache else None
+
+        if cached is not None and len(cached) == len(shelters) and set(step["columns"]) <= set(cached.columns):
+            logging.info(f"♻️ استخدام القيم المخزنة لمعيار: {step['name']}")
+            values = cached
+        else:
+            logging.info(step["message"])
+            with context.step(step["name"]):
+                shelters_proj = context.project("shelters", shelters)
+                if step.get("raster"):
+                    layer_proj = layer_path
+                else:
+                    layer_proj = context.project(step["name"], read_layer(layer_path))
+                values = step["compute"](shelters_proj, layer_proj)[step["columns"]].reset_index(drop=True)
+            if use_cache:
+                save_cached_columns(cache_dir, step["name"], key, values, shelters_path)
+
+        for col in step["columns"]:
+            shelters[col] = values[col].to_numpy()
+
+    shelters = context.export(shelters)
+    write_layer(shelters, output_path)
     logging.info(f"✅ تم حفظ بيانات الملاجئ المعززة: {output_path}")
+    if geojson_path:
+        export_geojson(shelters, geojson_path)
+        logging.info(f"🌐 تم تصدير نسخة GeoJSON: {geojson_path}")
+    context.report()
+    return shelters
+
+
+def main():
+    enrich_shelters()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
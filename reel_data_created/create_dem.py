@@ -13,11 +13,11 @@ from rasterio.transform import from_origin
 sys.stdout.reconfigure(encoding='utf-8')
 
 # 📍 Elazığ için SRTM veri dosyası (1° x 1° aralığı kapsar)
-TILE_NAME = "N38E039"
-URL = f"https://s3.amazonaws.com/elevation-tiles-prod/skadi/N38/{TILE_NAME}.hgt.gz"
+TILE_NAME = os.environ.get("SHELTER_DEM_TILE", "N38E039")
+URL = f"https://s3.amazonaws.com/elevation-tiles-prod/skadi/{TILE_NAME[:3]}/{TILE_NAME}.hgt.gz"
 
 # 📁 Klasörleri tanımla
-RAW_DIR = "data/raw"
+RAW_DIR = os.path.join(os.environ.get("SHELTER_DATA_DIR", "data"), "raw")
 os.makedirs(RAW_DIR, exist_ok=True)
 
 gz_path = os.path.join(RAW_DIR, f"{TILE_NAME}.hgt.gz")
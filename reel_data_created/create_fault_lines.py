@@ -7,16 +7,19 @@ sys.stdout.reconfigure(encoding='utf-8')
 
 # 📍 Kaynak: Global Plate Boundaries (PB2002)
 URL = "https://github.com/fraxen/tectonicplates/raw/master/GeoJSON/PB2002_boundaries.json"
-SAVE_PATH = "data/processed/fault_lines_elazig.geojson"
-os.makedirs("data/processed", exist_ok=True)
+DATA_DIR = os.environ.get("SHELTER_DATA_DIR", "data")
+SAVE_PATH = os.path.join(DATA_DIR, "processed", "fault_lines_elazig.geojson")
+os.makedirs(os.path.join(DATA_DIR, "processed"), exist_ok=True)
 
-# 📌 Elazığ Bounding Box (yaklaşık)
+# 📌 Elazığ Bounding Box (yaklaşık) — başka bölge için: SHELTER_BBOX="minx,miny,maxx,maxy"
 bbox_elazig = {
     "minx": 39.0,
     "maxx": 39.5,
     "miny": 38.5,
     "maxy": 39.0
 }
+if "SHELTER_BBOX" in os.environ:
+    bbox_elazig = dict(zip(["minx", "miny", "maxx", "maxy"], map(float, os.environ["SHELTER_BBOX"].split(","))))
 
 print("🔽 Fay hattı verisi indiriliyor ve işleniyor...")
 
@@ -9,8 +9,9 @@ from shapely.geometry import Point
 sys.stdout.reconfigure(encoding='utf-8')
 
 # 📍 المدينة المستهدفة
-place = "Elazığ, Turkey"
-os.makedirs("data/processed", exist_ok=True)
+place = os.environ.get("SHELTER_PLACE", "Elazığ, Turkey")
+DATA_DIR = os.environ.get("SHELTER_DATA_DIR", "data")
+os.makedirs(os.path.join(DATA_DIR, "processed"), exist_ok=True)
 
 # 🏷️ أنواع استخدامات الأراضي التي سنطلبها
 tags = {
@@ -71,8 +72,8 @@ cols = ["landuse_type", "area_m2", "lat", "lon", "hazard_score", "shelter_candid
 final_gdf = gdf[cols].copy()
 
 # ✅ حفظ النتائج
-geojson_path = "data/processed/landuse.geojson"
-csv_path = "data/processed/landuse_summary.csv"
+geojson_path = os.path.join(DATA_DIR, "processed", "landuse.geojson")
+csv_path = os.path.join(DATA_DIR, "processed", "landuse_summary.csv")
 final_gdf.to_file(geojson_path, driver="GeoJSON")
 final_gdf.drop(columns="geometry").to_csv(csv_path, index=False)
 
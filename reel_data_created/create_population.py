@@ -8,8 +8,9 @@ from shapely.geometry import Point
 sys.stdout.reconfigure(encoding='utf-8')
 
 # 📍 Hedef şehir
-place = "Elazığ, Turkey"
-os.makedirs("data/processed", exist_ok=True)
+place = os.environ.get("SHELTER_PLACE", "Elazığ, Turkey")
+DATA_DIR = os.environ.get("SHELTER_DATA_DIR", "data")
+os.makedirs(os.path.join(DATA_DIR, "processed"), exist_ok=True)
 
 # 🏷️ OSM etiketleri
 tags = {
@@ -66,8 +67,8 @@ cols = ["landuse", "area_m2", "population_density", "population_estimate", "dens
 final_gdf = gdf[cols].copy()
 
 # ✅ Dosyaları kaydet
-geojson_path = "data/processed/population.geojson"
-csv_path = "data/processed/population_summary.csv"
+geojson_path = os.path.join(DATA_DIR, "processed", "population.geojson")
+csv_path = os.path.join(DATA_DIR, "processed", "population_summary.csv")
 final_gdf.to_file(geojson_path, driver="GeoJSON")
 final_gdf.drop(columns="geometry").to_csv(csv_path, index=False)
 
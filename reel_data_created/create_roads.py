@@ -7,8 +7,9 @@ import pandas as pd
 sys.stdout.reconfigure(encoding='utf-8')
 
 # 📍 Hedef şehir
-place_name = "Elazığ, Turkey"
-os.makedirs("data/processed", exist_ok=True)
+place_name = os.environ.get("SHELTER_PLACE", "Elazığ, Turkey")
+DATA_DIR = os.environ.get("SHELTER_DATA_DIR", "data")
+os.makedirs(os.path.join(DATA_DIR, "processed"), exist_ok=True)
 
 # 🔍 Yol türü filtresi (OSM highway)
 selected_road_types = ["motorway", "trunk", "primary", "secondary", "tertiary", "residential"]
@@ -42,11 +43,11 @@ columns = ["name", "highway", "length_m", "importance", "geometry"]
 roads_gdf = gdf[columns].copy()
 
 # 💾 Kaydet
-roads_gdf.to_file("data/processed/roads.geojson", driver="GeoJSON")
-roads_gdf.drop(columns="geometry").to_csv("data/processed/roads_summary.csv", index=False)
+roads_gdf.to_file(os.path.join(DATA_DIR, "processed", "roads.geojson"), driver="GeoJSON")
+roads_gdf.drop(columns="geometry").to_csv(os.path.join(DATA_DIR, "processed", "roads_summary.csv"), index=False)
 
 print("✅ Yol verisi başarıyla kaydedildi:")
-print(" - GeoJSON:", "data/processed/roads.geojson")
-print(" - CSV:", "data/processed/roads_summary.csv")
+print(" - GeoJSON:", os.path.join(DATA_DIR, "processed", "roads.geojson"))
+print(" - CSV:", os.path.join(DATA_DIR, "processed", "roads_summary.csv"))
 print(f"🛣️ Toplam yol kaydı: {len(roads_gdf)}")
 print(roads_gdf.head())
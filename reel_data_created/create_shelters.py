@@ -118,8 +118,9 @@ from shapely.geometry import Point
 sys.stdout.reconfigure(encoding='utf-8')
 
 # 📍 Hedef konum
-place = "Elazığ, Turkey"
-os.makedirs("data/geo", exist_ok=True)
+place = os.environ.get("SHELTER_PLACE", "Elazığ, Turkey")
+DATA_DIR = os.environ.get("SHELTER_DATA_DIR", "data")
+os.makedirs(os.path.join(DATA_DIR, "geo"), exist_ok=True)
 
 # 📥 OSM veri filtreleri
 tags = {
@@ -171,7 +172,7 @@ gdf["name"] = [generate_unique_name(row, idx + 1) for idx, row in gdf.iterrows()
 gdf.set_crs(epsg=4326, inplace=True)
 
 # 📊 Nüfus bilgisiyle eşleştirme
-pop_path = "data/processed/population.geojson"
+pop_path = os.path.join(DATA_DIR, "processed", "population.geojson")
 if os.path.exists(pop_path):
     print("🔄 population.geojson bulundu, analiz başlatılıyor...")
     pop_gdf = gpd.read_file(pop_path).to_crs(epsg=3857)
@@ -198,7 +199,7 @@ final_cols = [
     "estimated_coverage_ratio"
 ]
 gdf_final = gdf[final_cols].copy()
-gdf_final.to_file("data/geo/shelters.geojson", driver="GeoJSON")
+gdf_final.to_file(os.path.join(DATA_DIR, "geo", "shelters.geojson"), driver="GeoJSON")
 
 # 🧾 Özet
 print(f"✅ shelters.geojson kaydedildi. Kayıt sayısı: {len(gdf_final)}")
@@ -1,58 +1,39 @@
 import os
-import numpy as np
 import rasterio
-from rasterio import windows
 from rasterio.enums import Resampling
-from rasterio.plot import show
 import matplotlib.pyplot as plt
 
 import sys
 sys.stdout.reconfigure(encoding='utf-8')
-# 📁 Giriş ve çıkış dosyaları
-input_path = "data/raw/N38E039_dem.tif"
-slope_path = "data/processed/slope.tif"
-aspect_path = "data/processed/aspect.tif"
-os.makedirs("data/processed", exist_ok=True)
-
-# ✅ Yardımcı fonksiyonlar: Slope ve Aspect hesaplama
-def calculate_slope_aspect(dem, transform):
-    x, y = np.gradient(dem, transform[0], transform[4])
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
-    # slope in radians → sonra ° veya %'ye çevrilebilir
-    slope_rad = np.arctan(np.sqrt(x**2 + y**2))
-    slope_deg = np.degrees(slope_rad)        # derece cinsinden
-    slope_percent = np.tan(slope_rad) * 100  # yüzde cinsinden
+from src.terrain import slope_aspect
 
-    # Aspect hesaplama (derece cinsinden)
-    aspect = np.degrees(np.arctan2(-x, y))
-    aspect = np.where(aspect < 0, 90.0 - aspect, 360.0 - aspect + 90.0)
-    aspect = np.where(dem == np.nan, np.nan, aspect)  # nodata maskesi
+# 📁 Giriş ve çıkış dosyaları
+DATA_DIR = os.environ.get("SHELTER_DATA_DIR", "data")
+input_path = os.path.join(DATA_DIR, "raw", os.environ.get("SHELTER_DEM_TILE", "N38E039") + "_dem.tif")
+slope_path = os.path.join(DATA_DIR, "processed", "slope.tif")
+aspect_path = os.path.join(DATA_DIR, "processed", "aspect.tif")
+os.makedirs(os.path.join(DATA_DIR, "processed"), exist_ok=True)
 
-    return slope_deg, aspect
+# ✅ Slope ve aspect blok blok hesaplanır (bellek kullanımı DEM boyutundan bağımsız)
+print("🧮 Slope ve aspect hesaplanıyor...")
+slope_aspect(input_path, slope_path, aspect_path, workers=os.cpu_count())
+print(f"✅ slope.tif kaydedildi: {slope_path}")
+print(f"✅ aspect.tif kaydedildi: {aspect_path}")
 
-# ✅ Raster verisini oku ve analiz et
-print("🗺️ DEM verisi okunuyor...")
-with rasterio.open(input_path) as src:
-    dem = src.read(1).astype("float32")
-    dem[dem == src.nodata] = np.nan
-    transform = src.transform
-    profile = src.profile
 
-    print("🧮 Slope ve aspect hesaplanıyor...")
-    slope, aspect = calculate_slope_aspect(dem, transform)
+# ✅ Görselleştirme (küçültülmüş önizleme)
+def read_preview(path, max_size=1024):
+    with rasterio.open(path) as src:
+        scale = max(src.width, src.height) / max_size
+        shape = (max(int(src.height / max(scale, 1)), 1), max(int(src.width / max(scale, 1)), 1))
+        return src.read(1, out_shape=shape, resampling=Resampling.average)
 
-    # 📤 Slope kaydet (° cinsinden)
-    profile.update(dtype='float32', count=1, compress='lzw')
-    with rasterio.open(slope_path, 'w', **profile) as dst:
-        dst.write(slope, 1)
-    print(f"✅ slope.tif kaydedildi: {slope_path}")
 
-    # 📤 Aspect kaydet (°)
-    with rasterio.open(aspect_path, 'w', **profile) as dst:
-        dst.write(aspect, 1)
-    print(f"✅ aspect.tif kaydedildi: {aspect_path}")
+slope = read_preview(slope_path)
+aspect = read_preview(aspect_path)
 
-# ✅ Görselleştirme
 plt.figure(figsize=(12, 5))
 
 plt.subplot(1, 2, 1)
@@ -77,6 +77,114 @@ def ahp_from_matrix(matrix, criteria_names):
     return result
 
 
+# === Batched AHP (N matrices at once) ===
+
+def validate_matrices(matrices):
+    """
+    Batched version of validate_matrix for an (N, n, n) stack.
+
+    Raises:
+        ValueError: With the indices of the first invalid matrices.
+    """
+    matrices = np.asarray(matrices, dtype=float)
+    if matrices.ndim != 3 or matrices.shape[1] != matrices.shape[2]:
+        raise ValueError(f"❌ Expected an (N, n, n) stack, got shape {matrices.shape}.")
+
+    diag_ok = np.isclose(np.diagonal(matrices, axis1=1, axis2=2), 1.0).all(axis=1)
+    recip_ok = np.isclose(matrices, 1 / np.swapaxes(matrices, 1, 2), rtol=1e-3).all(axis=(1, 2))
+
+    for ok, message in [(diag_ok, "Diagonal elements must all be 1"), (recip_ok, "Matrix must be reciprocal")]:
+        if not ok.all():
+            bad = np.flatnonzero(~ok)
+            raise ValueError(f"❌ {message}: {len(bad)} invalid matrices (first: {bad[:5].tolist()}).")
+
+    return matrices
+
+
+def _column_weights(matrices):
+    normalized = matrices / matrices.sum(axis=1, keepdims=True)
+    return normalized.mean(axis=2)
+
+
+def _eigen_weights(matrices):
+    eigenvalues, eigenvectors = np.linalg.eig(matrices)
+    principal = np.argmax(eigenvalues.real, axis=1)
+    rows = np.arange(len(matrices))
+    vectors = np.abs(eigenvectors[rows, :, principal].real)
+    return vectors / vectors.sum(axis=1, keepdims=True)
+
+
+def ahp_batch(matrices, method="column", validate=True):
+    """
+    Compute AHP weights and consistency for a stack of pairwise matrices.
+
+    Args:
+        matrices (array): (N, n, n) stack of pairwise comparison matrices.
+        method (str): "column" (column normalization, as ahp_from_matrix) or "eigen"
+            (principal eigenvector).
+        validate (bool): Check diagonal and reciprocity first.
+
+    Returns:
+        dict: "weights" (N, n), "λ_max", "CI", "CR" (N,) arrays.
+    """
+    matrices = validate_matrices(matrices) if validate else np.asarray(matrices, dtype=float)
+    n = matrices.shape[1]
+
+    if method == "column":
+        weights = _column_weights(matrices)
+    elif method == "eigen":
+        weights = _eigen_weights(matrices)
+    else:
+        raise ValueError(f"❌ Unknown AHP method: '{method}' (use 'column' or 'eigen').")
+
+    weighted_sum = np.einsum("kij,kj->ki", matrices, weights)
+    lambda_max = (weighted_sum / weights).mean(axis=1)
+    ci = (lambda_max - n) / (n - 1) if n > 1 else np.zeros(len(matrices))
+    ri = RI_VALUES.get(n, 1.49)
+    cr = ci / ri if ri != 0 else np.zeros_like(ci)
+
+    logging.info(
+        f"📊 Batched AHP ({method}): {len(matrices)} matrices, "
+        f"{int((cr > 0.1).sum())} with CR > 0.1"
+    )
+    return {"weights": weights, "λ_max": lambda_max, "CI": ci, "CR": cr}
+
+
+def aggregate_judgments(matrices, method="AIJ", member_weights=None, ahp_method="column"):
+    """
+    Aggregate group judgments with the weighted geometric mean.
+
+    Args:
+        matrices (array): (N, n, n) stack, one matrix per decision maker.
+        method (str): "AIJ" (aggregate the judgments, then derive weights) or
+            "AIP" (derive each member's weights, then aggregate the priorities).
+        member_weights (array): Optional (N,) importance of each member (defaults to equal).
+        ahp_method (str): Weight derivation method passed to ahp_batch.
+
+    Returns:
+        dict: "weights" (n,), plus "λ_max", "CI", "CR" of the aggregated matrix (AIJ)
+        or the per-member arrays (AIP).
+    """
+    matrices = validate_matrices(matrices)
+    if member_weights is None:
+        member_weights = np.full(len(matrices), 1 / len(matrices))
+    member_weights = np.asarray(member_weights, dtype=float)
+    member_weights = member_weights / member_weights.sum()
+
+    if method == "AIJ":
+        group_matrix = np.exp(np.einsum("k,kij->ij", member_weights, np.log(matrices)))
+        result = ahp_batch(group_matrix[np.newaxis], method=ahp_method, validate=False)
+        return {key: value[0] for key, value in result.items()}
+
+    if method == "AIP":
+        result = ahp_batch(matrices, method=ahp_method, validate=False)
+        group_weights = np.exp(member_weights @ np.log(result["weights"]))
+        result["weights"] = group_weights / group_weights.sum()
+        return result
+
+    raise ValueError(f"❌ Unknown aggregation method: '{method}' (use 'AIJ' or 'AIP').")
+
+
 def save_ahp_result(result, json_path="data/criteria_weights.json", csv_path="data/criteria_weights.csv"):
     """
     Save AHP result as:
@@ -0,0 +1,162 @@
+import logging
+import time
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+from scipy import sparse
+from scipy.optimize import linprog
+from scipy.spatial import cKDTree
+
+from src import config
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+
+def _projected_xy(gdf: gpd.GeoDataFrame, crs: str) -> np.ndarray:
+    return shapely.get_coordinates(shapely.point_on_surface(gdf.to_crs(crs).geometry.values))
+
+
+def candidate_pairs(demand: gpd.GeoDataFrame, shelters: gpd.GeoDataFrame, k: int = 10, max_distance: float = None,
+                    crs: str = config.PROJECTED_CRS):
+    """
+    Sparse demand → shelter candidate lists from a KD-tree over the shelters.
+
+    Each demand point only considers its k nearest shelters (optionally within
+    max_distance metres), which keeps the problem size at demand × k.
+
+    Returns:
+        (demand_idx, shelter_idx, distance): Parallel arrays of positional indices and metres.
+    """
+    shelter_xy = _projected_xy(shelters, crs)
+    k = min(k, len(shelter_xy))
+    distance, shelter_idx = cKDTree(shelter_xy).query(
+        _projected_xy(demand, crs), k=k, distance_upper_bound=max_distance or np.inf, workers=-1
+    )
+    distance, shelter_idx = distance.reshape(len(demand), k), shelter_idx.reshape(len(demand), k)
+    demand_idx = np.repeat(np.arange(len(demand)), k)
+    distance, shelter_idx = distance.ravel(), shelter_idx.ravel()
+
+    valid = np.isfinite(distance)  # missing neighbours beyond max_distance
+    return demand_idx[valid], shelter_idx[valid], distance[valid]
+
+
+def allocate_greedy(amount: np.ndarray, capacity: np.ndarray, pairs) -> np.ndarray:
+    """
+    Greedy allocation: fill candidate pairs in increasing distance order.
+
+    Demand may be split across shelters. Fast and usually close to optimal
+    when capacity is not tight.
+
+    Returns:
+        np.ndarray: Flow assigned to each candidate pair.
+    """
+    demand_idx, shelter_idx, distance = pairs
+    remaining_demand = np.asarray(amount, dtype=float).tolist()
+    remaining_capacity = np.asarray(capacity, dtype=float).tolist()
+    flow = np.zeros(len(distance))
+
+    order = np.argsort(distance, kind="stable")
+    for e, i, j in zip(order.tolist(), demand_idx[order].tolist(), shelter_idx[order].tolist()):
+        if remaining_demand[i] <= 0 or remaining_capacity[j] <= 0:
+            continue
+        assigned = min(remaining_demand[i], remaining_capacity[j])
+        flow[e] = assigned
+        remaining_demand[i] -= assigned
+        remaining_capacity[j] -= assigned
+    return flow
+
+
+def allocate_lp(amount: np.ndarray, capacity: np.ndarray, pairs) -> np.ndarray:
+    """
+    Exact min-cost allocation over the candidate pairs (transportation LP, HiGHS interior point).
+
+    Every demand point gets an "unserved" slack variable whose cost exceeds
+    any travel distance, so the solver first maximizes the population served
+    and then minimizes total person-metres.
+
+    Returns:
+        np.ndarray: Flow assigned to each candidate pair.
+    """
+    demand_idx, shelter_idx, distance = pairs
+    n_demand, n_shelters, n_pairs = len(amount), len(capacity), len(distance)
+    penalty = (distance.max() if n_pairs else 0.0) * 10 + 1
+
+    cost = np.concatenate([distance, np.full(n_demand, penalty)])
+    pair_cols = np.arange(n_pairs)
+    # Σ_j x_ij + unserved_i = demand_i
+    a_eq = sparse.csr_matrix(
+        (np.ones(n_pairs + n_demand),
+         (np.concatenate([demand_idx, np.arange(n_demand)]), np.concatenate([pair_cols, n_pairs + np.arange(n_demand)]))),
+        shape=(n_demand, n_pairs + n_demand),
+    )
+    # Σ_i x_ij <= capacity_j
+    a_ub = sparse.csr_matrix((np.ones(n_pairs), (shelter_idx, pair_cols)), shape=(n_shelters, n_pairs + n_demand))
+
+    result = linprog(cost, A_ub=a_ub, b_ub=np.asarray(capacity, dtype=float), A_eq=a_eq,
+                     b_eq=np.asarray(amount, dtype=float), bounds=(0, None), method="highs-ipm")
+    if result.status != 0:
+        raise RuntimeError(f"❌ Allocation LP failed: {result.message}")
+    return result.x[:n_pairs]
+
+
+def allocate_population(demand: gpd.GeoDataFrame, shelters: gpd.GeoDataFrame, method: str = "greedy", k: int = 10,
+                        max_distance: float = None, demand_column: str = "population_estimate",
+                        capacity_column: str = "estimated_capacity") -> dict:
+    """
+    Assign population demand points to shelters under capacity limits.
+
+    Args:
+        demand (GeoDataFrame): Population points with a demand column.
+        shelters (GeoDataFrame): Shelters with a capacity column.
+        method (str): "greedy" (nearest-first heuristic) or "lp" (exact min-cost flow).
+        k (int): Candidate shelters per demand point.
+        max_distance (float): Ignore shelters farther than this (metres).
+
+    Returns:
+        dict:
+            assignments (DataFrame): demand / shelter index labels, amount, distance.
+            shelter_load (Series): Population assigned to each shelter.
+            unserved (Series): Unserved population per demand point.
+            summary (dict): Totals and mean travel distance.
+    """
+    if method not in ("greedy", "lp"):
+        raise ValueError(f"❌ Unknown allocation method: '{method}'")
+    start = time.perf_counter()
+
+    amount = demand[demand_column].fillna(0).to_numpy(dtype=float)
+    capacity = shelters[capacity_column].fillna(0).to_numpy(dtype=float)
+    pairs = candidate_pairs(demand, shelters, k=k, max_distance=max_distance)
+    flow = allocate_greedy(amount, capacity, pairs) if method == "greedy" else allocate_lp(amount, capacity, pairs)
+
+    demand_idx, shelter_idx, distance = pairs
+    used = flow > 1e-9
+    assignments = pd.DataFrame({
+        "demand": demand.index.to_numpy()[demand_idx[used]],
+        "shelter": shelters.index.to_numpy()[shelter_idx[used]],
+        "amount": flow[used],
+        "distance": distance[used],
+    })
+    served = np.bincount(demand_idx, weights=flow, minlength=len(demand))
+    unserved = pd.Series(np.maximum(amount - served, 0), index=demand.index, name="unserved")
+    shelter_load = pd.Series(np.bincount(shelter_idx, weights=flow, minlength=len(shelters)),
+                             index=shelters.index, name="assigned_population")
+
+    total_served = float(flow.sum())
+    summary = {
+        "method": method,
+        "demand": float(amount.sum()),
+        "served": total_served,
+        "unserved": float(unserved.sum()),
+        "person_metres": float(flow @ distance),
+        "mean_distance": float(flow @ distance / total_served) if total_served else float("nan"),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    logging.info(
+        f"🏕️ Allocation [{method}]: {summary['served']:.0f}/{summary['demand']:.0f} people served, "
+        f"{summary['unserved']:.0f} unserved, mean distance {summary['mean_distance']:.0f} m "
+        f"({len(distance)} candidate pairs, {summary['seconds']}s)"
+    )
+    return {"assignments": assignments, "shelter_load": shelter_load, "unserved": unserved, "summary": summary}
@@ -9,6 +9,9 @@ OUTPUTS_DIR = os.path.join(PROJECT_ROOT, "..", "outputs")
 MAPS_DIR = os.path.join(OUTPUTS_DIR, "maps")
 REPORTS_DIR = os.path.join(OUTPUTS_DIR, "reports")
 WEIGHTS_PATH = os.path.join(DATA_DIR, "criteria_weights.json")
+CACHE_DIR = os.path.join(PROJECT_ROOT, "..", "cache")
+ENRICHMENT_CACHE_DIR = os.path.join(CACHE_DIR, "enrichment")
+DISTANCE_FIELD_CACHE_DIR = os.path.join(CACHE_DIR, "distance_fields")
 
 # === MCDA Criteria ===
 CRITERIA = [
@@ -19,18 +22,114 @@ CRITERIA = [
     "LandUse_Score"
 ]
 
+# === AHP Judgments ===
+# Default pairwise comparison matrix (row criterion vs. column criterion), edit per project
+AHP_CRITERIA = ["Distance_to_Roads", "Distance_to_Faults", "Population_Density", "LandUse_Score"]
+AHP_PAIRWISE_MATRIX = [
+    [1,   3,   5,   7],
+    [1/3, 1,   3,   5],
+    [1/5, 1/3, 1,   3],
+    [1/7, 1/5, 1/3, 1],
+]
+
+# === CRS Settings ===
+PROJECTED_CRS = "EPSG:32637"  # UTM Zone 37N - suitable for eastern Turkey
+
+# === Region ===
+# Single-region runs read the place from the environment (SHELTER_PLACE="Malatya, Turkey");
+# multi-region runs are described in REGIONS_PATH (see src/region_runner.py).
+PLACE_NAME = os.environ.get("SHELTER_PLACE", "Elazığ, Turkey")
+REGIONS_PATH = os.path.join(DATA_DIR, "regions.json")
+REGIONS_DIR = os.path.join(DATA_DIR, "regions")           # per-region inputs: <REGIONS_DIR>/<name>/{geo,processed,raw}
+REGION_OUTPUTS_DIR = os.path.join(OUTPUTS_DIR, "regions")  # per-region outputs: <REGION_OUTPUTS_DIR>/<name>/
+
 # === Map Settings ===
-DEFAULT_MAP_CENTER = [38.6740, 39.2230]  # Example: Elazığ, Turkey
+DEFAULT_MAP_CENTER = (
+    [float(v) for v in os.environ["SHELTER_MAP_CENTER"].split(",")] if "SHELTER_MAP_CENTER" in os.environ
+    else [38.6740, 39.2230]  # Example: Elazığ, Turkey
+)
 DEFAULT_ZOOM = 12
+BULK_RENDER_THRESHOLD = 1000  # above this many shelters, render them as one data-driven layer
+
+# === Overlay Settings (roads / fault lines) ===
+OVERLAY_PIXEL_TOLERANCE = 1.0   # simplification tolerance in screen pixels
+OVERLAY_COORD_PRECISION = 5     # decimal degrees kept (~1 m)
+OVERLAY_TILE_ZOOMS = range(10, 17)
+ROAD_OVERLAY_FIELDS = ["name", "highway"]
+FAULT_OVERLAY_FIELDS = ["fault_type"]
+
+# === Road Network ===
+GRAPH_SNAP_TOLERANCE = 1.0  # metres; road vertices closer than this are merged into one node
+ROUTE_SEARCH_DETOURS = (1.5, 4.0)  # point-to-point Dijkstra radii, × straight-line distance, before an unbounded search
+
+# === Raster Processing ===
+RASTER_BLOCK_SIZE = 512  # pixels per block edge (multiple of 16)
+TERRAIN_SAMPLING = "zonal"  # "zonal" (mean over the shelter polygon) | "bilinear" | "nearest"
+SURFACE_RESOLUTION = 30.0     # metres per suitability-surface cell
+SURFACE_MAX_DISTANCE = 5000.0  # distance criteria are capped at this value on the surface (metres)
+
+# === Distance Criteria ===
+DISTANCE_METHOD = "vector"  # "vector" (exact nearest-geometry queries) | "field" (cached EDT rasters)
+DISTANCE_FIELD_RESOLUTION = 10.0       # metres; lookup error up to ~1.5 × resolution (see src/distance_field.py)
+DISTANCE_FIELD_MAX_DISTANCE = 10000.0  # metres; farther points fall back to exact distances
+
+# === Land Use Scoring ===
+# Keyword found in the polygon's landuse tag → score (first matching rule wins)
+LANDUSE_SCORE_RULES = [
+    ("park", 0.9),
+    ("residential", 0.5),
+    ("industrial", 0.3),
+]
+LANDUSE_MATCH_SCORE = 0.2    # inside a polygon matching no keyword
+LANDUSE_DEFAULT_SCORE = 0.1  # outside every polygon
+
+# === Storage Backend ===
+# Stages exchange layers in a columnar format; GeoJSON is only an export format.
+STORAGE_FORMAT = "parquet"  # "parquet" | "feather" | "geojson"
+STORAGE_EXTENSIONS = {
+    "parquet": ".parquet",
+    "feather": ".feather",
+    "geojson": ".geojson",
+}
+FEATHER_MEMORY_MAP = True
+MCDA_CHUNK_SIZE = 500_000  # rows per chunk for out-of-core scoring (normalize_and_score_chunked)
+
+# === Report Mini-Maps ===
+MINI_MAP_CACHE_DIR = os.path.join(CACHE_DIR, "mini_maps")
+MINI_MAP_ZOOM = 15
+MINI_MAP_SIZE = (320, 240)  # pixels
+MINI_MAP_FORMAT = "png"     # "png" | "svg"
+
+# === Scoring Service ===
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_MAX_BATCH = 64         # rescoring requests scored together in one matmul
+SERVICE_BATCH_WAIT_MS = 2.0    # how long the first request of a batch waits for others
+SERVICE_RADIUS = 5000.0        # default search radius of /nearest (metres)
+
+# === Pipeline ===
+PIPELINE_STATE_DIR = os.path.join(CACHE_DIR, "pipeline")               # stage hashes + per-stage logs
+PIPELINE_REPORT = os.path.join(OUTPUTS_DIR, "pipeline_report.csv")    # per-stage timing / memory of the last run
+PIPELINE_WORKERS = 4  # stages run at once (the create_* builders are mostly network-bound)
 
 # === File Names ===
-SHELTER_INPUT = os.path.join(PROCESSED_DIR, "shelters_with_criteria.geojson")
-SCORED_OUTPUT = os.path.join(OUTPUTS_DIR, "results.geojson")
+SHELTER_INPUT = os.path.join(PROCESSED_DIR, "shelters_with_criteria" + STORAGE_EXTENSIONS[STORAGE_FORMAT])
+SCORED_OUTPUT = os.path.join(OUTPUTS_DIR, "results" + STORAGE_EXTENSIONS[STORAGE_FORMAT])
+SHELTER_EXPORT = os.path.join(PROCESSED_DIR, "shelters_with_criteria.geojson")
+SCORED_EXPORT = os.path.join(OUTPUTS_DIR, "results.geojson")
+ROAD_GRAPH_PATH = os.path.join(PROCESSED_DIR, "road_graph.npz")
+SURFACE_OUTPUT = os.path.join(OUTPUTS_DIR, "suitability.tif")
 
 
-ROADS_PATH = os.path.join(RAW_DIR, "roads.geojson")  # أو اسم الملف الصحيح لديك
-DEM_PATH = os.path.join(RAW_DIR, "dem.tif")
-POPULATION_PATH = os.path.join(RAW_DIR, "population.tif")
+# Input layers, as written by the reel_data_created/create_*.py scripts
+SHELTERS_PATH = os.path.join(DATA_DIR, "geo", "shelters.geojson")
+ROADS_PATH = os.path.join(PROCESSED_DIR, "roads.geojson")  # written by reel_data_created/create_roads.py
+DEM_TILE = os.environ.get("SHELTER_DEM_TILE", "N38E039")  # SRTM tile of create_dem.py
+DEM_PATH = os.path.join(RAW_DIR, f"{DEM_TILE}_dem.tif")
+POPULATION_PATH = os.path.join(PROCESSED_DIR, "population.geojson")  # written by create_population.py
 HOSPITALS_PATH = os.path.join(RAW_DIR, "hospitals.geojson")
-FAULT_LINES_PATH = os.path.join(RAW_DIR, "fault_lines.geojson")
+FAULT_LINES_PATH = os.path.join(PROCESSED_DIR, "fault_lines_elazig.geojson")  # written by create_fault_lines.py
+LANDUSE_PATH = os.path.join(PROCESSED_DIR, "landuse.geojson")
+SLOPE_PATH = os.path.join(PROCESSED_DIR, "slope.tif")
+ASPECT_PATH = os.path.join(PROCESSED_DIR, "aspect.tif")
 
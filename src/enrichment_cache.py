@@ -0,0 +1,84 @@
+import hashlib
+import json
+import logging
+import os
+
+import pandas as pd
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+_HASH_CHUNK_SIZE = 1 << 20
+
+
+def file_hash(path: str) -> str:
+    """Return the SHA-1 of a file's content, read in 1 MB chunks."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"❌ File not found: {path}")
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def criterion_key(criterion: str, input_paths: list, params: dict = None) -> str:
+    """
+    Build the cache key of one criterion.
+
+    The key covers the criterion name, the content hash of every input file
+    and the (JSON-serializable) function parameters.
+    """
+    payload = {
+        "criterion": criterion,
+        "inputs": [file_hash(path) for path in input_paths],
+        "params": params or {},
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def _scope_id(scope: str) -> str:
+    return hashlib.sha1(os.path.abspath(scope).encode("utf-8")).hexdigest()[:12] if scope else "global"
+
+
+def _artifact_path(cache_dir: str, criterion: str, key: str, scope: str = None) -> str:
+    return os.path.join(cache_dir, f"{criterion}_{_scope_id(scope)}_{key}.json")
+
+
+def load_cached_columns(cache_dir: str, criterion: str, key: str, scope: str = None):
+    """Return the cached columns of a criterion as a DataFrame, or None if stale."""
+    path = _artifact_path(cache_dir, criterion, key, scope)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        artifact = json.load(f)
+    columns = pd.DataFrame(artifact["columns"])
+    return columns.astype(artifact.get("dtypes", {}))
+
+
+def save_cached_columns(cache_dir: str, criterion: str, key: str, columns: pd.DataFrame, scope: str = None):
+    """
+    Store the computed columns of a criterion and drop the artifacts it supersedes.
+
+    Values are stored positionally, so the key must cover the source layer.
+    `scope` is the path of that layer: only older artifacts of the same
+    criterion and scope are dropped, so several shelter layers can share
+    one cache directory without evicting each other.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    superseded = f"{criterion}_{_scope_id(scope)}"
+    for name in os.listdir(cache_dir):
+        stem, ext = os.path.splitext(name)
+        # "<criterion>_<key>" (no scope) is the name of artifacts written before scoping
+        if ext == ".json" and stem.rsplit("_", 1)[0] in (superseded, criterion):
+            os.remove(os.path.join(cache_dir, name))
+
+    artifact = {
+        "criterion": criterion,
+        "key": key,
+        "columns": {col: columns[col].tolist() for col in columns.columns},
+        "dtypes": {col: str(columns[col].dtype) for col in columns.columns},
+    }
+    with open(_artifact_path(cache_dir, criterion, key, scope), "w", encoding="utf-8") as f:
+        json.dump(artifact, f, default=str)
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+
+from src.config import LANDUSE_MATCH_SCORE, LANDUSE_SCORE_RULES
+
+
+def build_landuse_score_table(land_types):
+    """
+    Score of each land-use value, computed once per unique value.
+
+    Rules come from config.LANDUSE_SCORE_RULES (first keyword found wins);
+    values matching no keyword get config.LANDUSE_MATCH_SCORE.
+
+    Returns:
+        pd.Series: One score per value in land_types (same index).
+    """
+    codes, uniques = pd.factorize(pd.Series(land_types), use_na_sentinel=False)
+    lowered = pd.Series([str(v).lower() for v in uniques], dtype=object)
+    conditions = [lowered.str.contains(keyword, regex=False).to_numpy() for keyword, _ in LANDUSE_SCORE_RULES]
+    choices = [score for _, score in LANDUSE_SCORE_RULES]
+    unique_scores = np.select(conditions, choices, default=LANDUSE_MATCH_SCORE)
+    return pd.Series(unique_scores[codes], index=getattr(land_types, "index", None))
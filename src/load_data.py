@@ -3,13 +3,14 @@ import logging
 import geopandas as gpd
 import pandas as pd
 from shapely.geometry import Point
+from src.storage import read_layer, resolve_layer_path
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
 
 # === Directory Configuration ===
 RAW_DIR = "data/raw"
-SUPPORTED_EXTENSIONS = [".geojson", ".csv", ".tif"]
+SUPPORTED_EXTENSIONS = [".parquet", ".feather", ".geojson", ".csv", ".tif"]
 
 # === CRS Configuration ===
 DEFAULT_CRS = "EPSG:4326"  # WGS 84
@@ -23,11 +24,11 @@ def _full_path(filename: str) -> str:
         raise FileNotFoundError(f"❌ File not found: {path}")
     return path
 
-def _load_vector_data(filename: str, crs: str = DEFAULT_CRS) -> gpd.GeoDataFrame:
-    """Generic loader for vector GeoJSON data."""
-    path = _full_path(filename)
+def _load_vector_data(layer: str, crs: str = DEFAULT_CRS) -> gpd.GeoDataFrame:
+    """Generic loader for vector layers (GeoParquet / Feather / GeoJSON, see src.storage)."""
+    path = resolve_layer_path(os.path.join(RAW_DIR, layer))
     logging.info(f"📍 Loading vector data from: {path}")
-    gdf = gpd.read_file(path)
+    gdf = read_layer(path)
     if gdf.crs and gdf.crs.to_string() != crs:
         gdf = gdf.to_crs(crs)
     return gdf
@@ -41,25 +42,25 @@ def _load_csv(filename: str) -> pd.DataFrame:
 # === Data Loaders ===
 
 def load_shelter_points() -> gpd.GeoDataFrame:
-    return _load_vector_data("shelters_from_osm.geojson")
+    return _load_vector_data("shelters_from_osm")
 
 def load_gathering_points() -> gpd.GeoDataFrame:
-    return _load_vector_data("gathering_points.geojson")
+    return _load_vector_data("gathering_points")
 
 def load_roads() -> gpd.GeoDataFrame:
-    return _load_vector_data("roads.geojson")
+    return _load_vector_data("roads")
 
 def load_fault_lines() -> gpd.GeoDataFrame:
-    return _load_vector_data("fault_lines.geojson")
+    return _load_vector_data("fault_lines")
 
 def load_population_density() -> pd.DataFrame:
     return _load_csv("population.csv")
 
 def load_land_use() -> gpd.GeoDataFrame:
-    return _load_vector_data("landuse.geojson")
+    return _load_vector_data("landuse")
 
 def load_rivers() -> gpd.GeoDataFrame:
-    return _load_vector_data("rivers.geojson")
+    return _load_vector_data("rivers")
 
 def load_dem_path() -> str:
     """Return DEM raster path (to be read externally via rasterio)."""
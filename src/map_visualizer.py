@@ -1,8 +1,14 @@
 import folium
-import geopandas as gpd
 import branca.colormap as cm
 import logging
 import os
+import json
+import numpy as np
+import shapely
+from folium.plugins import FastMarkerCluster
+from src import config
+from src.storage import read_layer, layer_exists
+from src.overlays import simplify_overlay, write_overlay_tiles, TiledGeoJsonLayer
 
 # إعداد سجل التشغيل
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
@@ -13,55 +19,120 @@ def create_colormap(min_score, max_score):
     return cm.linear.RdYlGn_09.scale(min_score, max_score).to_step(n=10)
 
 
-def add_geojson_layer(fmap, gdf, name, style_function):
-    """Add a vector layer with tooltip."""
-    fields = [col for col in gdf.columns if col != "geometry"]
+def add_geojson_layer(fmap, gdf, name, style_function, fields=None, simplify_zoom=None):
+    """
+    Add a vector layer with tooltip.
+
+    fields: attribute columns to keep for the tooltip (all columns if None).
+    simplify_zoom: simplify and quantize the geometries for this zoom level.
+    """
+    if fields is None:
+        fields = [col for col in gdf.columns if col != gdf.geometry.name]
+    fields = [col for col in fields if col in gdf.columns]
+    if simplify_zoom is not None:
+        gdf = simplify_overlay(gdf, zoom=simplify_zoom, fields=fields)
+    else:
+        gdf = gdf[fields + [gdf.geometry.name]]
+
+    tooltip = folium.GeoJsonTooltip(fields=fields, aliases=[f"{col}:" for col in fields]) if fields else None
     folium.GeoJson(
         gdf,
         name=name,
         style_function=style_function,
-        tooltip=folium.GeoJsonTooltip(fields=fields, aliases=[f"{col}:" for col in fields])
+        tooltip=tooltip
     ).add_to(fmap)
 
 
-def visualize_shelters(
-    gdf=None,
-    shelter_path="data/processed/shelters_with_score.geojson",
-    roads_path="data/raw/roads.geojson",
-    faults_path="data/raw/fault_lines.geojson",
-    output_path="outputs/maps/shelter_map.html",
-    additional_layers=None,
-    show_labels=False,
-):
-    """Visualize shelters with MCDA score and relevant infrastructure on an interactive map."""
+def add_tiled_overlay(fmap, gdf, tiles_dir, output_path, style, fields=None):
+    """Write a layer as XYZ GeoJSON tiles and load them on demand from the map page."""
+    manifest = write_overlay_tiles(gdf, tiles_dir, fields=fields)
+    url = os.path.relpath(tiles_dir, os.path.dirname(os.path.abspath(output_path))).replace(os.sep, "/")
+    TiledGeoJsonLayer(url, style, manifest["minzoom"], manifest["maxzoom"]).add_to(fmap)
 
-    # Load shelters
-    if gdf is None:
-        logging.info("📍 Loading shelters...")
-        if not os.path.exists(shelter_path):
-            raise FileNotFoundError(f"❌ Shelter file not found: {shelter_path}")
-        gdf = gpd.read_file(shelter_path)
-    else:
-        logging.info("📍 Using GeoDataFrame from memory...")
 
-    if "score" not in gdf.columns:
-        raise ValueError("GeoDataFrame must include a 'score' column.")
+# (column, popup label, unit, decimals) of the fields shown in bulk-mode popups
+POPUP_FIELDS = [
+    ("score", "📊 Score", "", 3),
+    ("Distance_to_Roads", "🛣️ Distance to Roads", " m", 2),
+    ("Distance_to_Faults", "🌋 Distance to Faults", " m", 2),
+    ("Population_Density", "👥 Population Density", "", 2),
+    ("LandUse_Score", "🏞️ Land Use Score", "", 2),
+    ("Slope", "⛰️ Slope", "", 2),
+]
 
-    # Reproject if needed
-    if gdf.crs and gdf.crs.to_epsg() != 4326:
-        gdf = gdf.to_crs(epsg=4326)
+# Builds a clustered circle marker per row; the popup HTML is only built when opened.
+_CLUSTER_CALLBACK = """
+function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: row[3], color: "black", weight: 0.5, fill: true, fillColor: row[2], fillOpacity: 0.9
+    });
+    var labels = %s;
+    marker.bindPopup(function () {
+        var html = "<b>🏕️ Shelter Info</b><br>";
+        for (var i = 0; i < labels.length; i++) {
+            if (row[4 + i] !== null) { html += labels[i][0] + ": " + row[4 + i] + labels[i][1] + "<br>"; }
+        }
+        return html;
+    }, {maxWidth: 300});
+    return marker;
+}
+"""
 
-    # Map center
-    center = gdf.unary_union.centroid
-    fmap = folium.Map(location=[center.y, center.x], zoom_start=12, tiles="CartoDB positron")
 
-    # Color scale
-    min_score = gdf["score"].min()
-    max_score = gdf["score"].max()
-    colormap = create_colormap(min_score, max_score)
+def _shelter_render_data(gdf, colormap, min_score, max_score):
+    """Centroids (lon/lat), fill colors, radii and rounded popup values for every shelter."""
+    centroids = shapely.get_coordinates(shapely.centroid(gdf.geometry.values))
+    scores = gdf["score"].to_numpy(dtype=float)
+    colors = [colormap(score) for score in scores]
+    radii = np.round(6 + 3 * ((scores - min_score) / (max_score - min_score + 1e-6)), 2)
 
-    # Add shelters as circles
-    logging.info("🖍️ Drawing shelter points...")
+    fields = [(col, label, unit) for col, label, unit, _ in POPUP_FIELDS if col in gdf.columns]
+    values = []
+    for col, _, _, decimals in POPUP_FIELDS:
+        if col in gdf.columns:
+            column = gdf[col].to_numpy(dtype=float, na_value=np.nan).round(decimals)
+            values.append([None if np.isnan(v) else float(v) for v in column])
+    return centroids, colors, radii, fields, values
+
+
+def _add_shelter_geojson(fmap, gdf, colormap, min_score, max_score):
+    """Add all shelters as one GeoJSON layer styled from feature properties."""
+    centroids, colors, radii, fields, values = _shelter_render_data(gdf, colormap, min_score, max_score)
+    features = []
+    for i, (lon, lat) in enumerate(np.round(centroids, 6)):
+        properties = {col: column[i] for (col, _, _), column in zip(fields, values)}
+        properties["style"] = {"fillColor": colors[i], "radius": float(radii[i])}
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [float(lon), float(lat)]},
+            "properties": properties,
+        })
+
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        name="Shelters",
+        marker=folium.CircleMarker(radius=6, color="black", weight=0.5, fill=True, fill_opacity=0.9),
+        popup=folium.GeoJsonPopup(
+            fields=[col for col, _, _ in fields],
+            aliases=[f"{label}:" for _, label, _ in fields],
+            max_width=300,
+        ),
+    ).add_to(fmap)
+
+
+def _add_shelter_cluster(fmap, gdf, colormap, min_score, max_score):
+    """Add all shelters as client-side clustered, canvas-rendered markers."""
+    centroids, colors, radii, fields, values = _shelter_render_data(gdf, colormap, min_score, max_score)
+    rows = [
+        [round(float(lat), 6), round(float(lon), 6), colors[i], float(radii[i])] + [column[i] for column in values]
+        for i, (lon, lat) in enumerate(centroids)
+    ]
+    labels = [[label, unit] for _, label, unit in fields]
+    FastMarkerCluster(rows, callback=_CLUSTER_CALLBACK % json.dumps(labels), name="Shelters").add_to(fmap)
+
+
+def _add_shelter_markers(fmap, gdf, colormap, min_score, max_score, show_labels):
+    """Add one CircleMarker with a prebuilt HTML popup per shelter (small maps only)."""
     for _, row in gdf.iterrows():
         score = row["score"]
         coords = row.geometry.centroid
@@ -94,34 +165,125 @@ def visualize_shelters(
                 icon=folium.DivIcon(html=f"<div style='font-size:10px;'>{round(score,2)}</div>")
             ).add_to(fmap)
 
+
+def visualize_shelters(
+    gdf=None,
+    shelter_path="data/processed/shelters_with_score.geojson",
+    roads_path="data/raw/roads.geojson",
+    faults_path="data/raw/fault_lines.geojson",
+    output_path="outputs/maps/shelter_map.html",
+    additional_layers=None,
+    show_labels=False,
+    render_mode="auto",
+    overlay_zoom=config.DEFAULT_ZOOM,
+    overlay_tiles_dir=None,
+):
+    """
+    Visualize shelters with MCDA score and relevant infrastructure on an interactive map.
+
+    render_mode:
+        "markers" - one CircleMarker + HTML popup per shelter (supports show_labels).
+        "geojson" - one data-driven GeoJSON layer; popups are built on click.
+        "cluster" - client-side clustered circle markers with on-demand popups.
+        "auto"    - "markers" up to config.BULK_RENDER_THRESHOLD shelters, else "geojson".
+
+    Road and fault overlays are simplified for `overlay_zoom` and keep only the
+    configured attribute fields. With `overlay_tiles_dir` they are written as
+    XYZ GeoJSON tiles instead and fetched on demand (the map must then be
+    served over HTTP).
+    """
+
+    # Load shelters
+    if gdf is None:
+        logging.info("📍 Loading shelters...")
+        if not layer_exists(shelter_path):
+            raise FileNotFoundError(f"❌ Shelter file not found: {shelter_path}")
+        gdf = read_layer(shelter_path)
+    else:
+        logging.info("📍 Using GeoDataFrame from memory...")
+
+    if "score" not in gdf.columns:
+        raise ValueError("GeoDataFrame must include a 'score' column.")
+
+    # Reproject if needed
+    if gdf.crs and gdf.crs.to_epsg() != 4326:
+        gdf = gdf.to_crs(epsg=4326)
+
+    if render_mode == "auto":
+        render_mode = "markers" if len(gdf) <= config.BULK_RENDER_THRESHOLD else "geojson"
+    if render_mode not in ("markers", "geojson", "cluster"):
+        raise ValueError(f"❌ Unknown render_mode: '{render_mode}'")
+
+    # Map center (bounding-box center for bulk modes, the union is too costly there)
+    if render_mode == "markers":
+        center = gdf.unary_union.centroid
+        center_lat, center_lon = center.y, center.x
+    else:
+        minx, miny, maxx, maxy = gdf.total_bounds
+        center_lat, center_lon = (miny + maxy) / 2, (minx + maxx) / 2
+    fmap = folium.Map(
+        location=[center_lat, center_lon], zoom_start=12, tiles="CartoDB positron",
+        prefer_canvas=render_mode != "markers"
+    )
+
+    # Color scale
+    min_score = float(gdf["score"].min())  # scores are float32; branca serializes the bounds to JSON
+    max_score = float(gdf["score"].max())
+    colormap = create_colormap(min_score, max_score)
+
+    # Add shelters as circles
+    logging.info(f"🖍️ Drawing shelter points ({render_mode})...")
+    if render_mode == "markers":
+        _add_shelter_markers(fmap, gdf, colormap, min_score, max_score, show_labels)
+    else:
+        if show_labels:
+            logging.warning("⚠️ show_labels is only supported in 'markers' render mode.")
+        if render_mode == "geojson":
+            _add_shelter_geojson(fmap, gdf, colormap, min_score, max_score)
+        else:
+            _add_shelter_cluster(fmap, gdf, colormap, min_score, max_score)
+
     logging.info(f"✅ Total shelters plotted: {len(gdf)}")
 
     # Fault lines
-    if os.path.exists(faults_path):
+    if layer_exists(faults_path):
         logging.info("🌋 Adding fault lines...")
-        faults = gpd.read_file(faults_path)
-        add_geojson_layer(
-            fmap, faults, "Fault Lines",
-            style_function=lambda _: {"color": "red", "weight": 2, "opacity": 0.7}
-        )
+        faults = read_layer(faults_path)
+        fault_style = {"color": "red", "weight": 2, "opacity": 0.7}
+        if overlay_tiles_dir:
+            add_tiled_overlay(fmap, faults, os.path.join(overlay_tiles_dir, "faults"), output_path,
+                              fault_style, fields=config.FAULT_OVERLAY_FIELDS)
+        else:
+            add_geojson_layer(
+                fmap, faults, "Fault Lines",
+                style_function=lambda _: fault_style,
+                fields=config.FAULT_OVERLAY_FIELDS, simplify_zoom=overlay_zoom
+            )
 
     # Roads
-    if os.path.exists(roads_path):
+    if layer_exists(roads_path):
         logging.info("🛣️ Adding roads...")
-        roads = gpd.read_file(roads_path)
-        add_geojson_layer(
-            fmap, roads, "Roads",
-            style_function=lambda _: {"color": "blue", "weight": 1.5, "opacity": 0.5}
-        )
+        roads = read_layer(roads_path)
+        road_style = {"color": "blue", "weight": 1.5, "opacity": 0.5}
+        if overlay_tiles_dir:
+            add_tiled_overlay(fmap, roads, os.path.join(overlay_tiles_dir, "roads"), output_path,
+                              road_style, fields=config.ROAD_OVERLAY_FIELDS)
+        else:
+            add_geojson_layer(
+                fmap, roads, "Roads",
+                style_function=lambda _: road_style,
+                fields=config.ROAD_OVERLAY_FIELDS, simplify_zoom=overlay_zoom
+            )
 
     # Additional layers
     if additional_layers:
-        for layer_path, config in additional_layers.items():
-            if os.path.exists(layer_path):
-                name = config.get("name", os.path.basename(layer_path))
-                style_fn = config.get("style_function", lambda _: {"color": "gray", "weight": 1})
-                layer_data = gpd.read_file(layer_path)
-                add_geojson_layer(fmap, layer_data, name, style_fn)
+        for layer_path, layer_config in additional_layers.items():
+            if layer_exists(layer_path):
+                name = layer_config.get("name", os.path.basename(layer_path))
+                style_fn = layer_config.get("style_function", lambda _: {"color": "gray", "weight": 1})
+                layer_data = read_layer(layer_path)
+                add_geojson_layer(fmap, layer_data, name, style_fn,
+                                  fields=layer_config.get("fields"), simplify_zoom=layer_config.get("simplify_zoom"))
             else:
                 logging.warning(f"⚠️ Layer not found: {layer_path}")
 
@@ -4,6 +4,12 @@ import numpy as np
 import logging
 import json
 import os
+import shutil
+import tempfile
+import time
+import pyarrow as pa
+from src import config
+from src.storage import read_layer, write_layer, export_geojson, iter_layer_chunks, open_chunk_writer
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
@@ -20,71 +26,215 @@ def load_weights(json_path="data/criteria_weights.json"):
             return {k: {"weight": v, "direction": "positive"} for k, v in data.items()}
         return data
 
-def min_max_normalize(series: pd.Series) -> pd.Series:
-    """Apply Min-Max normalization with numeric validation."""
-    series = pd.to_numeric(series, errors='coerce')
-    return (series - series.min()) / (series.max() - series.min() + 1e-9)
+def _validate_criterion(gdf, criterion):
+    if criterion not in gdf.columns:
+        raise KeyError(f"❌ Missing criterion column: '{criterion}'")
+    # Check for numeric type
+    if not pd.api.types.is_numeric_dtype(gdf[criterion]):
+        raise TypeError(f"❌ Column '{criterion}' must be numeric for normalization.")
 
-def normalize_criteria(gdf: gpd.GeoDataFrame, weights: dict) -> gpd.GeoDataFrame:
-    """Normalize all relevant criteria and handle positive/negative direction."""
-    for criterion, config in weights.items():
-        if criterion not in gdf.columns:
-            raise KeyError(f"❌ Missing criterion column: '{criterion}'")
 
-        # Check for numeric type
-        if not pd.api.types.is_numeric_dtype(gdf[criterion]):
-            raise TypeError(f"❌ Column '{criterion}' must be numeric for normalization.")
+def build_criteria_matrix(gdf: gpd.GeoDataFrame, weights: dict, dtype=np.float32, bounds: dict = None):
+    """
+    Build the normalized criteria matrix in one pass.
+
+    Each column is min-max normalized (inverted for "negative" criteria) and
+    written straight into a preallocated (rows × criteria) array. Missing
+    values are stored as 0 so they contribute nothing to the score.
+    `bounds` ({criterion: (min, max)}) overrides the column's own min/max,
+    so chunks of a larger table are normalized against global statistics.
+
+    Returns:
+        (np.ndarray, list): The matrix and the criterion order of its columns.
+    """
+    criteria = list(weights)
+    matrix = np.empty((len(gdf), len(criteria)), dtype=dtype)
 
-        norm_col = f"{criterion}_norm"
-        gdf[norm_col] = min_max_normalize(gdf[criterion])
+    for j, criterion in enumerate(criteria):
+        _validate_criterion(gdf, criterion)
+        values = gdf[criterion].to_numpy(dtype=np.float64, na_value=np.nan)
+        if bounds is None:
+            low, high = np.nanmin(values, initial=np.inf), np.nanmax(values, initial=-np.inf)
+        else:
+            low, high = bounds[criterion]
+        column = (values - low) / (high - low + 1e-9)
 
         # Invert if direction is negative
-        if config.get("direction", "positive") == "negative":
-            gdf[norm_col] = 1 - gdf[norm_col]
+        if weights[criterion].get("direction", "positive") == "negative":
+            column = 1 - column
+        matrix[:, j] = np.nan_to_num(column, nan=0.0)
+
+    return matrix, criteria
+
+
+def build_weight_matrix(weight_sets, criteria, dtype=np.float32) -> np.ndarray:
+    """
+    Stack K weight sets into a (criteria × K) matrix.
+
+    Each set is either a weights dict as returned by load_weights or a plain
+    {criterion: weight} mapping.
+    """
+    if isinstance(weight_sets, dict):
+        weight_sets = [weight_sets]
+
+    matrix = np.zeros((len(criteria), len(weight_sets)), dtype=dtype)
+    for k, weight_set in enumerate(weight_sets):
+        for j, criterion in enumerate(criteria):
+            value = weight_set.get(criterion, 0.0)
+            matrix[j, k] = float(value["weight"] if isinstance(value, dict) else value)
+    return matrix
+
+
+def rank_scores(scores: np.ndarray) -> np.ndarray:
+    """Rank each score column (1 = best), ties averaged then truncated as before."""
+    return pd.DataFrame(scores).rank(ascending=False).to_numpy().astype(int)
+
+
+def score_weight_sets(gdf: gpd.GeoDataFrame, weight_sets, directions: dict = None, criteria_matrix=None):
+    """
+    Score all features under K weight sets with a single matmul.
 
+    Args:
+        gdf (GeoDataFrame): Features with the raw criterion columns.
+        weight_sets (list | dict): One or more weight sets.
+        directions (dict): Weights dict whose "direction" entries drive normalization
+            (defaults to the first weight set).
+        criteria_matrix (tuple): Optional prebuilt (matrix, criteria) from build_criteria_matrix.
+
+    Returns:
+        (scores, ranks): Two (rows × K) arrays; no columns are added to gdf.
+    """
+    if isinstance(weight_sets, dict):
+        weight_sets = [weight_sets]
+    if criteria_matrix is None:
+        base = directions or weight_sets[0]
+        base = {c: v if isinstance(v, dict) else {"weight": v} for c, v in base.items()}
+        criteria_matrix = build_criteria_matrix(gdf, base)
+
+    matrix, criteria = criteria_matrix
+    scores = matrix @ build_weight_matrix(weight_sets, criteria, dtype=matrix.dtype)
+    return scores, rank_scores(scores)
+
+
+def add_network_distance(gdf: gpd.GeoDataFrame, population: gpd.GeoDataFrame, graph, top_n: int = None,
+                         score_column: str = "score", population_column: str = "population_estimate",
+                         column: str = "Network_Distance", snapper=None) -> gpd.GeoDataFrame:
+    """
+    Add a road-network accessibility criterion.
+
+    Every population point is assigned to its nearest shelter by road in one
+    multi-source Dijkstra pass. The criterion is the population-weighted mean
+    network distance of the people each shelter serves; shelters that serve
+    nobody (or are not among the seeds) get NaN. Use it with
+    "direction": "negative" in the weights file.
+
+    Args:
+        gdf (GeoDataFrame): Shelters.
+        population (GeoDataFrame): Population points.
+        graph (RoadGraph): Road network (see src.road_graph.load_road_graph).
+        top_n (int): Only seed the top-n shelters by `score_column`.
+        population_column (str): Weight of each population point (1 if missing).
+
+    Returns:
+        GeoDataFrame: gdf with the new column; the per-point assignment is
+        kept in gdf.attrs["network_assignment"].
+    """
+    from src.routing import assign_to_nearest
+
+    seeds = gdf if top_n is None else gdf.nlargest(top_n, score_column)
+    assignment = assign_to_nearest(graph, seeds, population, snapper=snapper)
+
+    served = assignment[np.isfinite(assignment["network_distance"])].copy()
+    if population_column in population.columns:
+        served["weight"] = population.loc[served.index, population_column].fillna(0).to_numpy(dtype=float)
+    else:
+        served["weight"] = 1.0
+    served["weighted"] = served["network_distance"] * served["weight"]
+    totals = served.groupby("nearest_facility")[["weighted", "weight"]].sum()
+    mean_distance = totals["weighted"] / totals["weight"].where(totals["weight"] > 0)
+
+    gdf[column] = mean_distance.reindex(gdf.index).to_numpy(dtype=float)
+    gdf.attrs["network_assignment"] = assignment
+    logging.info(
+        f"🛣️ {column}: {len(served)}/{len(assignment)} population points reach "
+        f"{served['nearest_facility'].nunique()} of {len(seeds)} seed shelters"
+    )
     return gdf
 
-def compute_scores(gdf: gpd.GeoDataFrame, weights: dict) -> gpd.GeoDataFrame:
-    """Compute MCDA weighted score for each feature."""
-    score_cols = []
-    for criterion, config in weights.items():
-        norm_col = f"{criterion}_norm"
-        weight = float(config["weight"])
-        weighted_col = f"{criterion}_w"
 
-        gdf[weighted_col] = gdf[norm_col] * weight
-        score_cols.append(weighted_col)
+def normalize_criteria(gdf: gpd.GeoDataFrame, weights: dict) -> gpd.GeoDataFrame:
+    """Normalize all relevant criteria and handle positive/negative direction."""
+    matrix, criteria = build_criteria_matrix(gdf, weights)
+    for j, criterion in enumerate(criteria):
+        gdf[f"{criterion}_norm"] = matrix[:, j]
+    return gdf
+
+
+def compute_scores(gdf: gpd.GeoDataFrame, weights: dict, criteria_matrix=None,
+                   keep_weighted: bool = True, rank: bool = True) -> gpd.GeoDataFrame:
+    """
+    Compute MCDA weighted score for each feature.
+
+    Uses the `{criterion}_norm` columns unless a prebuilt criteria matrix is
+    given. The `{criterion}_w` columns are only materialized if keep_weighted.
+    With rank=False the full-table rank is skipped (top-k consumers can use
+    src.shelter_query instead).
+    """
+    if criteria_matrix is None:
+        criteria = list(weights)
+        norm_cols = [f"{criterion}_norm" for criterion in criteria]
+        matrix = gdf[norm_cols].to_numpy(dtype=np.float32, na_value=0.0)
+        criteria_matrix = (matrix, criteria)
+
+    matrix, criteria = criteria_matrix
+    weight_vector = build_weight_matrix(weights, criteria, dtype=matrix.dtype)
+
+    if keep_weighted:
+        for j, criterion in enumerate(criteria):
+            gdf[f"{criterion}_w"] = matrix[:, j] * weight_vector[j, 0]
 
-    gdf["score"] = gdf[score_cols].sum(axis=1)
-    gdf["rank"] = gdf["score"].rank(ascending=False).astype(int)
+    scores = matrix @ weight_vector
+    gdf["score"] = scores[:, 0]
+    if rank:
+        gdf["rank"] = rank_scores(scores)[:, 0]
 
     return gdf
 
-def normalize_and_score(input_path, output_path, weights_path="data/criteria_weights.json", export_csv=False):
+def normalize_and_score(input_path, output_path, weights_path="data/criteria_weights.json", export_csv=False,
+                        geojson_path=None, keep_intermediate=True):
     """
     Apply MCDA scoring based on AHP weights.
 
+    Loads the whole layer; for candidate sets that do not fit in memory use
+    normalize_and_score_chunked.
+
     Args:
-        input_path (str): Path to input GeoJSON.
-        output_path (str): Output GeoJSON/GPKG path.
+        input_path (str): Path to input layer (GeoParquet/Feather/GeoJSON).
+        output_path (str): Output path; format follows the extension (.parquet/.feather/.geojson/.gpkg).
         weights_path (str): Path to AHP weights.
         export_csv (bool): Also export to CSV if True.
+        geojson_path (str): Optional GeoJSON export path.
+        keep_intermediate (bool): Also write the `_norm` and `_w` columns.
 
     Returns:
         GeoDataFrame with scores and ranks.
     """
     logging.info(f"📥 Loading shelters from: {input_path}")
-    gdf = gpd.read_file(input_path)
+    gdf = read_layer(input_path)
     weights = load_weights(weights_path)
 
-    # Normalize and score
-    gdf = normalize_criteria(gdf, weights)
-    gdf = compute_scores(gdf, weights)
+    # Normalize once into a float32 matrix and score it
+    criteria_matrix = build_criteria_matrix(gdf, weights)
+    if keep_intermediate:
+        for j, criterion in enumerate(criteria_matrix[1]):
+            gdf[f"{criterion}_norm"] = criteria_matrix[0][:, j]
+    gdf = compute_scores(gdf, weights, criteria_matrix=criteria_matrix, keep_weighted=keep_intermediate)
 
     # Save output
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    driver = "GeoJSON" if output_path.endswith(".geojson") else "GPKG"
-    gdf.to_file(output_path, driver=driver)
+    write_layer(gdf, output_path)
+    if geojson_path:
+        export_geojson(gdf, geojson_path)
+        logging.info(f"🌐 GeoJSON exported to: {geojson_path}")
 
     logging.info(f"✅ Output saved to: {output_path}")
     logging.info(f"🏆 Best score: {gdf['score'].max():.4f}")
@@ -92,8 +242,160 @@ def normalize_and_score(input_path, output_path, weights_path="data/criteria_wei
 
     # Optional CSV Export
     if export_csv:
-        csv_path = output_path.replace(".geojson", ".csv").replace(".gpkg", ".csv")
+        csv_path = os.path.splitext(output_path)[0] + ".csv"
         gdf.drop(columns="geometry").to_csv(csv_path, index=False)
         logging.info(f"📄 CSV exported to: {csv_path}")
 
     return gdf
+
+
+def _criteria_frame(batch: pa.RecordBatch, criteria) -> pd.DataFrame:
+    missing = [c for c in criteria if c not in batch.schema.names]
+    if missing:
+        raise KeyError(f"❌ Missing criterion column: '{missing[0]}'")
+    return batch.select(criteria).to_pandas()
+
+
+def _merge_sorted_runs(run_paths, output_path: str, block_size: int) -> np.ndarray:
+    """
+    K-way merge of ascending .npy runs into one memory-mapped .npy file.
+
+    Each round reads the next block of every run and emits everything up to
+    the smallest block tail, so at most len(runs) × block_size values are in
+    memory at once.
+    """
+    runs = [np.load(path, mmap_mode="r") for path in run_paths]
+    total = sum(len(run) for run in runs)
+    merged = np.lib.format.open_memmap(output_path, mode="w+", dtype=np.float32, shape=(total,))
+    block_size = max(block_size // max(len(runs), 1), 1)
+    positions = [0] * len(runs)
+    written = 0
+
+    while written < total:
+        blocks = [run[pos:pos + block_size] for run, pos in zip(runs, positions)]
+        tails = [block[-1] for run, pos, block in zip(runs, positions, blocks) if pos + len(block) < len(run)]
+        cutoff = min(tails) if tails else np.inf
+        taken = []
+        for i, block in enumerate(blocks):
+            count = int(np.searchsorted(block, cutoff, side="right"))
+            taken.append(block[:count])
+            positions[i] += count
+        chunk = np.sort(np.concatenate(taken))
+        merged[written:written + len(chunk)] = chunk
+        written += len(chunk)
+
+    merged.flush()
+    return merged
+
+
+def normalize_and_score_chunked(input_path, output_path, weights_path="data/criteria_weights.json",
+                                chunk_size: int = config.MCDA_CHUNK_SIZE, keep_intermediate: bool = False,
+                                top_k: int = 10, tmp_dir: str = None) -> dict:
+    """
+    Out-of-core MCDA scoring: same scores and ranks as normalize_and_score,
+    with memory bounded by chunk_size instead of the number of rows.
+
+    Pass 1 reads only the criterion columns, chunk by chunk, and keeps each
+    criterion's global min/max. Pass 2 normalizes and scores each chunk
+    against those bounds and spills its sorted scores to a temporary run;
+    the runs are merged into one sorted, memory-mapped score file (external
+    sort). Pass 3 re-scores each chunk (cheaper than writing and re-reading
+    an unranked copy), ranks it by binary search in the sorted scores and
+    streams it to the output with score / rank (and `_norm` / `_w` columns if
+    keep_intermediate). Geometries are copied as WKB, never decoded.
+
+    Args:
+        input_path (str): Candidate layer (GeoParquet/Feather stream natively; GeoJSON/GPKG via OGR).
+        output_path (str): GeoParquet or Feather output.
+        weights_path (str): Path to AHP weights.
+        chunk_size (int): Rows per chunk.
+        keep_intermediate (bool): Also write the `_norm` and `_w` columns.
+        top_k (int): Number of best rows returned in the summary.
+        tmp_dir (str): Where the sorted score runs are spilled (default: system temp).
+
+    Returns:
+        dict: rows, chunks, output_path, seconds and "top" (GeoDataFrame of
+        the top_k rows by rank).
+    """
+    start = time.perf_counter()
+    weights = load_weights(weights_path)
+    criteria = list(weights)
+    weight_vector = build_weight_matrix(weights, criteria)
+
+    # Pass 1: global min/max per criterion
+    low = np.full(len(criteria), np.inf)
+    high = np.full(len(criteria), -np.inf)
+    rows = chunks = 0
+    for batch in iter_layer_chunks(input_path, chunk_size, columns=criteria):
+        frame = _criteria_frame(batch, criteria)
+        for j, criterion in enumerate(criteria):
+            _validate_criterion(frame, criterion)
+            values = frame[criterion].to_numpy(dtype=np.float64, na_value=np.nan)
+            low[j] = np.fmin(low[j], np.nanmin(values, initial=np.inf))
+            high[j] = np.fmax(high[j], np.nanmax(values, initial=-np.inf))
+        rows += batch.num_rows
+        chunks += 1
+    bounds = {criterion: (low[j], high[j]) for j, criterion in enumerate(criteria)}
+    logging.info(f"📊 Pass 1: min/max of {len(criteria)} criteria over {rows} rows in {chunks} chunks")
+
+    def score_batch(batch):
+        matrix, _ = build_criteria_matrix(_criteria_frame(batch, criteria), weights, bounds=bounds)
+        return matrix, (matrix @ weight_vector)[:, 0]
+
+    work_dir = tempfile.mkdtemp(prefix="mcda_", dir=tmp_dir)
+    try:
+        # Pass 2: score each chunk and spill its sorted scores
+        run_paths = []
+        for i, batch in enumerate(iter_layer_chunks(input_path, chunk_size, columns=criteria)):
+            run_path = os.path.join(work_dir, f"run_{i:06d}.npy")
+            np.save(run_path, np.sort(score_batch(batch)[1]))
+            run_paths.append(run_path)
+        sorted_scores = _merge_sorted_runs(run_paths, os.path.join(work_dir, "scores.npy"), chunk_size)
+        for run_path in run_paths:
+            os.remove(run_path)
+        logging.info(f"🔃 Pass 2: {len(run_paths)} sorted score runs merged")
+
+        # Pass 3: rank (average rank of ties, truncated — as rank_scores) and write
+        top = []
+        writer = None
+        try:
+            for batch in iter_layer_chunks(input_path, chunk_size):
+                matrix, scores = score_batch(batch)
+                right = np.searchsorted(sorted_scores, scores, side="right")
+                left = np.searchsorted(sorted_scores, scores, side="left")
+                ranks = ((rows - right) + (right - left + 1) / 2).astype(np.int64)
+
+                columns = {}
+                if keep_intermediate:
+                    for j, criterion in enumerate(criteria):
+                        columns[f"{criterion}_norm"] = matrix[:, j]
+                    for j, criterion in enumerate(criteria):
+                        columns[f"{criterion}_w"] = matrix[:, j] * weight_vector[j, 0]
+                columns["score"] = scores
+                columns["rank"] = ranks
+                for name, values in columns.items():
+                    if name in batch.schema.names:
+                        batch = batch.drop_columns([name])
+                    batch = batch.append_column(name, pa.array(values))
+
+                if writer is None:
+                    writer = open_chunk_writer(output_path, batch.schema)
+                writer.write_batch(batch)
+                if top_k:
+                    top.append(batch.filter(pa.array(ranks <= top_k)))
+        finally:
+            if writer is not None:
+                writer.close()
+        del sorted_scores
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    top = gpd.GeoDataFrame.from_arrow(pa.Table.from_batches(top)) if top else None
+    if top is not None:
+        top = top.sort_values("rank").head(top_k).reset_index(drop=True)
+
+    seconds = time.perf_counter() - start
+    logging.info(f"✅ Output saved to: {output_path} ({rows} rows, {chunks} chunks, {seconds:.1f}s)")
+    if top is not None and len(top):
+        logging.info(f"🏆 Best score: {top['score'].iloc[0]:.4f}")
+    return {"rows": rows, "chunks": chunks, "output_path": output_path, "seconds": seconds, "top": top}
@@ -0,0 +1,181 @@
+import base64
+import hashlib
+import json
+import logging
+import math
+import os
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import shapely
+
+from src import config
+from src.enrichment_cache import file_hash
+from src.storage import read_layer, resolve_layer_path
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+WEB_MERCATOR = "EPSG:3857"
+WEB_MERCATOR_EXTENT = 20037508.342789244  # half the world width in metres
+DPI = 100
+
+# name → (path, matplotlib style); drawn in this order
+MINI_MAP_LAYERS = {
+    "landuse": (config.LANDUSE_PATH, {"facecolor": "#d9ead3", "edgecolor": "none"}),
+    "roads": (config.ROADS_PATH, {"color": "#7f7f7f", "linewidth": 0.8}),
+    "faults": (config.FAULT_LINES_PATH, {"color": "red", "linewidth": 1.5}),
+}
+
+_LAYERS = {}   # layers_key → loaded layers, per process
+_HASHES = {}   # (path, mtime, size) → content hash, so a layer is hashed once per process
+
+
+def _meters_per_pixel(zoom: int) -> float:
+    """Web-mercator metres per 256 px tile pixel (projected units, not ground distance)."""
+    return 2 * WEB_MERCATOR_EXTENT / (256 * 2 ** zoom)
+
+
+def quantize_location(lat: float, lon: float, zoom: int):
+    """
+    Snap a location to the global web-mercator pixel grid of `zoom`.
+
+    Points falling in the same pixel share one thumbnail.
+
+    Returns:
+        (px, py): Integer pixel coordinates (origin at the top-left of the world).
+    """
+    lat = max(min(lat, 85.0511), -85.0511)
+    n = 256 * 2 ** zoom
+    px = int((lon + 180) / 360 * n)
+    py = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return px, py
+
+
+def _pixel_center(px: int, py: int, zoom: int):
+    """Web-mercator (x, y) of the centre of a global pixel."""
+    resolution = _meters_per_pixel(zoom)
+    return (px + 0.5) * resolution - WEB_MERCATOR_EXTENT, WEB_MERCATOR_EXTENT - (py + 0.5) * resolution
+
+
+def _layer_file(path: str):
+    try:
+        return resolve_layer_path(path)
+    except FileNotFoundError:
+        return None
+
+
+def _cached_file_hash(path: str) -> str:
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _HASHES:
+        _HASHES[key] = file_hash(path)
+    return _HASHES[key]
+
+
+def layers_key(layers: dict = None) -> str:
+    """Content hash of the background layers and their styles; part of every thumbnail's cache key."""
+    payload = []
+    for name, (path, style) in (layers or MINI_MAP_LAYERS).items():
+        source = _layer_file(path)
+        payload.append([name, _cached_file_hash(source) if source else None, style])
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def load_layers(layers: dict = None) -> dict:
+    """
+    Load the background layers once, in web mercator, with their spatial index built.
+
+    Args:
+        layers (dict): name → (path, style); default MINI_MAP_LAYERS.
+
+    Missing layers are skipped. The result is kept for later calls in the
+    same process and reloaded if a layer file changes.
+    """
+    key = layers_key(layers)
+    if key in _LAYERS:
+        return _LAYERS[key]
+
+    loaded = {}
+    for name, (path, style) in (layers or MINI_MAP_LAYERS).items():
+        source = _layer_file(path)
+        if source is None:
+            logging.warning(f"⚠️ Mini-map layer not found, skipped: {path}")
+            continue
+        gdf = read_layer(source)[["geometry"]].to_crs(WEB_MERCATOR)
+        gdf = gdf[~(gdf.geometry.is_empty | gdf.geometry.isna())]
+        gdf.sindex  # build the spatial index before thumbnails are drawn
+        loaded[name] = (gdf, style)
+
+    _LAYERS[key] = loaded
+    return loaded
+
+
+def thumbnail_path(lat: float, lon: float, zoom: int = None, fmt: str = None, cache_dir: str = None,
+                   size=None, layers: dict = None) -> str:
+    """
+    Cache path of the thumbnail covering (lat, lon).
+
+    The name holds the quantized pixel, the size and layers_key, so a new
+    size or an updated road / fault / land-use layer gets a new thumbnail.
+    """
+    zoom = zoom or config.MINI_MAP_ZOOM
+    fmt = fmt or config.MINI_MAP_FORMAT
+    width, height = size or config.MINI_MAP_SIZE
+    px, py = quantize_location(lat, lon, zoom)
+    name = f"{px}_{py}_{width}x{height}_{layers_key(layers)}.{fmt}"
+    return os.path.join(cache_dir or config.MINI_MAP_CACHE_DIR, str(zoom), name)
+
+
+def render_mini_map(lat: float, lon: float, zoom: int = None, size=None, fmt: str = None,
+                    cache_dir: str = None, layers: dict = None) -> str:
+    """
+    Draw a static thumbnail of the local road, fault and land-use layers around a shelter.
+
+    No network tiles are used. Thumbnails are cached by quantized location,
+    zoom, size and layer content (see thumbnail_path), so re-runs and
+    shelters in the same pixel reuse the existing file.
+
+    Args:
+        lat, lon (float): Shelter location (EPSG:4326).
+        zoom (int): Web-map zoom level the thumbnail extent corresponds to.
+        size (tuple): (width, height) in pixels.
+        fmt (str): "png" or "svg".
+        layers (dict): name → (path, style); default MINI_MAP_LAYERS.
+
+    Returns:
+        str: Path to the thumbnail.
+    """
+    zoom = zoom or config.MINI_MAP_ZOOM
+    width, height = size or config.MINI_MAP_SIZE
+    path = thumbnail_path(lat, lon, zoom, fmt, cache_dir, (width, height), layers)
+    if os.path.exists(path):
+        return path
+
+    cx, cy = _pixel_center(*quantize_location(lat, lon, zoom), zoom)
+    half_w, half_h = width / 2 * _meters_per_pixel(zoom), height / 2 * _meters_per_pixel(zoom)
+    window = (cx - half_w, cy - half_h, cx + half_w, cy + half_h)
+
+    fig = plt.figure(figsize=(width / DPI, height / DPI), dpi=DPI)
+    ax = fig.add_axes([0, 0, 1, 1])
+    for gdf, style in load_layers(layers).values():
+        hits = gdf.sindex.query(shapely.box(*window), predicate="intersects")
+        if len(hits):
+            gdf.iloc[hits].plot(ax=ax, **style)
+    ax.plot(cx, cy, marker="o", markersize=8, markerfacecolor="#1f77b4", markeredgecolor="white")
+    ax.set_xlim(window[0], window[2])
+    ax.set_ylim(window[1], window[3])
+    ax.set_axis_off()
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fig.savefig(path, dpi=DPI, facecolor="white")
+    plt.close(fig)
+    return path
+
+
+def thumbnail_data_uri(path: str) -> str:
+    """Inline a thumbnail as a data URI so the PDF converter needs no file access."""
+    mime = "image/svg+xml" if path.endswith(".svg") else "image/png"
+    with open(path, "rb") as f:
+        return f"data:{mime};base64,{base64.b64encode(f.read()).decode('ascii')}"
@@ -0,0 +1,188 @@
+import json
+import logging
+import math
+import os
+
+import geopandas as gpd
+import shapely
+from branca.element import MacroElement
+from jinja2 import Template
+from shapely import STRtree
+
+from src import config
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+EARTH_CIRCUMFERENCE_M = 40_075_016.686
+
+
+def meters_per_pixel(zoom: int, latitude: float) -> float:
+    """Ground resolution of a 256 px web-mercator tile pixel at a zoom level."""
+    return EARTH_CIRCUMFERENCE_M * math.cos(math.radians(latitude)) / (256 * 2 ** zoom)
+
+
+def simplify_overlay(gdf: gpd.GeoDataFrame, zoom: int = config.DEFAULT_ZOOM, fields=None,
+                     pixel_tolerance: float = None, precision: int = None) -> gpd.GeoDataFrame:
+    """
+    Prepare a line/polygon layer for display at a given zoom level.
+
+    - simplifies geometries in the metric CRS with a tolerance of
+      `pixel_tolerance` screen pixels at `zoom`;
+    - quantizes coordinates to `precision` decimal degrees;
+    - keeps only `fields` (no attributes if empty / None).
+
+    Returns:
+        GeoDataFrame in EPSG:4326 without empty geometries.
+    """
+    pixel_tolerance = config.OVERLAY_PIXEL_TOLERANCE if pixel_tolerance is None else pixel_tolerance
+    precision = config.OVERLAY_COORD_PRECISION if precision is None else precision
+    fields = [col for col in (fields or []) if col in gdf.columns]
+
+    gdf = gdf[fields + [gdf.geometry.name]]
+    if gdf.empty:
+        return gdf.to_crs(epsg=4326)
+
+    latitude = gdf.to_crs(epsg=4326).geometry.total_bounds[[1, 3]].mean()
+    tolerance = meters_per_pixel(zoom, latitude) * pixel_tolerance
+
+    projected = gdf.to_crs(config.PROJECTED_CRS)
+    simplified = shapely.simplify(projected.geometry.values, tolerance, preserve_topology=False)
+    result = gpd.GeoDataFrame(gdf.drop(columns=gdf.geometry.name), geometry=simplified, crs=projected.crs)
+    result = result.to_crs(epsg=4326)
+    result.geometry = shapely.set_precision(result.geometry.values, 10 ** -precision)
+    return result[~(result.geometry.is_empty | result.geometry.isna())]
+
+
+def _tile_bounds(x: int, y: int, zoom: int):
+    """(min_lon, min_lat, max_lon, max_lat) of an XYZ tile."""
+    n = 2 ** zoom
+    lon_min, lon_max = x / n * 360 - 180, (x + 1) / n * 360 - 180
+    lat_max = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    lat_min = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return lon_min, lat_min, lon_max, lat_max
+
+
+def _tile_index(lon: float, lat: float, zoom: int):
+    n = 2 ** zoom
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def write_overlay_tiles(gdf: gpd.GeoDataFrame, output_dir: str, zooms=None, fields=None) -> dict:
+    """
+    Write a layer as a directory of XYZ GeoJSON tiles: {output_dir}/{z}/{x}/{y}.geojson.
+
+    Every zoom gets its own simplified copy of the layer, clipped to each tile.
+    A `tiles.json` manifest (bounds, zooms, URL template) is written alongside.
+
+    Returns:
+        dict: The manifest.
+    """
+    zooms = list(zooms or config.OVERLAY_TILE_ZOOMS)
+    os.makedirs(output_dir, exist_ok=True)
+    bounds = gdf.to_crs(epsg=4326).total_bounds
+    n_tiles = 0
+
+    for zoom in zooms:
+        layer = simplify_overlay(gdf, zoom=zoom, fields=fields)
+        if layer.empty:
+            continue
+        geoms = layer.geometry.values
+        tree = STRtree(geoms)
+        properties = layer.drop(columns=layer.geometry.name).to_dict(orient="records")
+
+        x_min, y_max = _tile_index(bounds[0], bounds[1], zoom)
+        x_max, y_min = _tile_index(bounds[2], bounds[3], zoom)
+        for x in range(x_min, x_max + 1):
+            for y in range(y_min, y_max + 1):
+                tile_box = _tile_bounds(x, y, zoom)
+                hits = tree.query(shapely.box(*tile_box), predicate="intersects")
+                if len(hits) == 0:
+                    continue
+                clipped = shapely.clip_by_rect(geoms[hits], *tile_box)
+                features = [
+                    {"type": "Feature", "geometry": shapely.geometry.mapping(geom), "properties": properties[i]}
+                    for i, geom in zip(hits, clipped) if not geom.is_empty
+                ]
+                if not features:
+                    continue
+                tile_path = os.path.join(output_dir, str(zoom), str(x), f"{y}.geojson")
+                os.makedirs(os.path.dirname(tile_path), exist_ok=True)
+                with open(tile_path, "w", encoding="utf-8") as f:
+                    json.dump({"type": "FeatureCollection", "features": features}, f, separators=(",", ":"),
+                              default=str)
+                n_tiles += 1
+
+    manifest = {
+        "format": "geojson",
+        "bounds": [float(v) for v in bounds],
+        "minzoom": min(zooms),
+        "maxzoom": max(zooms),
+        "tiles": "{z}/{x}/{y}.geojson",
+    }
+    with open(os.path.join(output_dir, "tiles.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    logging.info(f"🧩 {n_tiles} overlay tiles written to: {output_dir}")
+    return manifest
+
+
+class TiledGeoJsonLayer(MacroElement):
+    """
+    Leaflet layer that fetches GeoJSON tiles written by write_overlay_tiles on demand.
+
+    Only the tiles of the current (clamped) zoom level are displayed.
+
+    The tile directory must be served over HTTP (browsers block fetch() on file://),
+    e.g. `python -m http.server` from the outputs directory.
+    """
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = (function () {
+            var map = {{ this._parent.get_name() }};
+            var groups = {}, loaded = {}, current = null;
+            var layer = L.layerGroup().addTo(map);
+            function effectiveZoom(z) { return Math.min(Math.max(z, {{ this.minzoom }}), {{ this.maxzoom }}); }
+            function groupFor(z) {
+                if (!groups[z]) { groups[z] = L.geoJson(null, {style: {{ this.style|tojson }}}); }
+                return groups[z];
+            }
+            function show(z) {
+                if (current !== null) { layer.removeLayer(groups[current]); }
+                current = z;
+                layer.addLayer(groupFor(z));
+            }
+            var grid = L.GridLayer.extend({
+                createTile: function (coords) {
+                    var z = effectiveZoom(coords.z);
+                    var scale = Math.pow(2, coords.z - z);
+                    var key = z + "/" + Math.floor(coords.x / scale) + "/" + Math.floor(coords.y / scale);
+                    if (!loaded[key]) {
+                        loaded[key] = true;
+                        fetch({{ this.url|tojson }} + "/" + key + ".geojson")
+                            .then(function (r) { return r.ok ? r.json() : null; })
+                            .then(function (data) { if (data) { groupFor(z).addData(data); } })
+                            .catch(function () {});
+                    }
+                    return document.createElement("div");
+                }
+            });
+            layer.addLayer(new grid({minZoom: {{ this.minzoom }}}));
+            map.on("zoomend", function () { show(effectiveZoom(map.getZoom())); });
+            show(effectiveZoom(map.getZoom()));
+            return layer;
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, url: str, style: dict, minzoom: int, maxzoom: int):
+        super().__init__()
+        self._name = "TiledGeoJsonLayer"
+        self.url = url.rstrip("/")
+        self.style = style
+        self.minzoom = minzoom
+        self.maxzoom = maxzoom
@@ -0,0 +1,386 @@
+import argparse
+import hashlib
+import importlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from src import config
+from src.enrichment_cache import file_hash
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+PIPELINE_VERSION = 1
+REPO_ROOT = os.path.abspath(os.path.join(config.PROJECT_ROOT, ".."))
+SCRIPTS_DIR = os.path.join(REPO_ROOT, "reel_data_created")
+DEFAULT_TARGETS = ("map",)  # "reports" is opt-in: it needs the PDF toolchain and one mini-map download per shelter
+
+
+def run_ahp(matrix, criteria, json_path=config.WEIGHTS_PATH, csv_path=None):
+    """AHP stage: weights from a pairwise matrix, saved in the MCDA format."""
+    import numpy as np
+    from src.ahp_analysis import ahp_from_matrix, save_ahp_result
+
+    csv_path = csv_path or os.path.splitext(json_path)[0] + ".csv"
+    save_ahp_result(ahp_from_matrix(np.asarray(matrix, dtype=float), criteria), json_path=json_path, csv_path=csv_path)
+
+
+def run_map(shelter_path, output_path, roads_path, faults_path):
+    """Map stage: the interactive map of a scored layer."""
+    from src.map_visualizer import visualize_shelters
+    from src.storage import read_layer
+
+    visualize_shelters(gdf=read_layer(shelter_path), shelter_path=shelter_path, roads_path=roads_path,
+                       faults_path=faults_path, output_path=output_path)
+
+
+def run_reports(shelter_path, output_dir):
+    """Report stage: one PDF per shelter (its manifest is the declared output)."""
+    from src.report_generator import generate_reports
+    from src.storage import read_layer
+
+    generate_reports(read_layer(shelter_path), output_dir=output_dir)
+
+
+def default_stages(data_dir: str = config.DATA_DIR, place: str = config.PLACE_NAME, dem_tile: str = config.DEM_TILE) -> list:
+    """
+    The project's stage DAG: create_* → slope/aspect → enrichment → AHP → MCDA → map / reports.
+
+    Each stage declares what it runs ("script" under reel_data_created/, or
+    "func" as "module:function" with JSON "kwargs"), the files it reads
+    ("inputs") and writes ("outputs"), and optional "params"/"env" that are
+    part of its cache key. Dependencies are not listed: a stage depends on
+    whichever stage declares its inputs as outputs.
+    """
+    processed = os.path.join(data_dir, "processed")
+    raw = os.path.join(data_dir, "raw")
+    paths = {
+        "roads": os.path.join(processed, "roads.geojson"),
+        "faults": os.path.join(processed, "fault_lines_elazig.geojson"),
+        "landuse": os.path.join(processed, "landuse.geojson"),
+        "population": os.path.join(processed, "population.geojson"),
+        "shelters": os.path.join(data_dir, "geo", "shelters.geojson"),
+        "dem": os.path.join(raw, f"{dem_tile}_dem.tif"),
+        "slope": os.path.join(processed, "slope.tif"),
+        "aspect": os.path.join(processed, "aspect.tif"),
+    }
+    env = {"SHELTER_DATA_DIR": data_dir, "SHELTER_PLACE": place, "SHELTER_DEM_TILE": dem_tile}
+
+    return [
+        {"name": "roads", "script": "create_roads.py", "env": env, "inputs": [],
+         "outputs": [paths["roads"], os.path.join(processed, "roads_summary.csv")]},
+        {"name": "faults", "script": "create_fault_lines.py", "env": env, "inputs": [],
+         "outputs": [paths["faults"]]},
+        {"name": "landuse", "script": "create_landuse.py", "env": env, "inputs": [],
+         "outputs": [paths["landuse"], os.path.join(processed, "landuse_summary.csv")]},
+        {"name": "population", "script": "create_population.py", "env": env, "inputs": [],
+         "outputs": [paths["population"], os.path.join(processed, "population_summary.csv")]},
+        {"name": "shelters", "script": "create_shelters.py", "env": env, "inputs": [paths["population"]],
+         "outputs": [paths["shelters"]]},
+        {"name": "dem", "script": "create_dem.py", "env": env, "inputs": [],
+         "outputs": [paths["dem"]]},
+        {"name": "slope", "script": "generate_slope_aspect.py", "env": env, "inputs": [paths["dem"]],
+         "outputs": [paths["slope"], paths["aspect"]], "code": ["src/terrain.py"]},
+        {"name": "enrich", "func": "prepare_dataset:enrich_shelters",
+         "kwargs": {"shelters_path": paths["shelters"], "roads_path": paths["roads"], "faults_path": paths["faults"],
+                    "population_path": paths["population"], "landuse_path": paths["landuse"],
+                    "slope_path": paths["slope"], "dem_path": paths["dem"],
+                    "output_path": config.SHELTER_INPUT, "geojson_path": config.SHELTER_EXPORT},
+         "inputs": [paths[name] for name in ("shelters", "roads", "faults", "population", "landuse", "slope", "dem")],
+         "outputs": [config.SHELTER_INPUT, config.SHELTER_EXPORT],
+         "params": {"crs": config.PROJECTED_CRS, "distance_method": config.DISTANCE_METHOD},
+         "code": ["src/spatial_index.py", "src/raster_sampling.py", "src/distance_field.py", "src/terrain.py",
+                  "src/enrichment_cache.py", "src/projection_context.py", "src/storage.py", "src/load_data.py",
+                  "src/landuse.py"]},
+        {"name": "ahp", "func": "src.pipeline:run_ahp",
+         "kwargs": {"matrix": config.AHP_PAIRWISE_MATRIX, "criteria": config.AHP_CRITERIA, "json_path": config.WEIGHTS_PATH},
+         "inputs": [], "outputs": [config.WEIGHTS_PATH], "code": ["src/ahp_analysis.py"]},
+        {"name": "score", "func": "src.mcda_scoring:normalize_and_score",
+         "kwargs": {"input_path": config.SHELTER_INPUT, "output_path": config.SCORED_OUTPUT,
+                    "weights_path": config.WEIGHTS_PATH, "export_csv": True, "geojson_path": config.SCORED_EXPORT},
+         "inputs": [config.SHELTER_INPUT, config.WEIGHTS_PATH],
+         "outputs": [config.SCORED_OUTPUT, config.SCORED_EXPORT, os.path.splitext(config.SCORED_OUTPUT)[0] + ".csv"],
+         "code": ["src/storage.py"]},
+        {"name": "map", "func": "src.pipeline:run_map",
+         "kwargs": {"shelter_path": config.SCORED_OUTPUT, "output_path": os.path.join(config.MAPS_DIR, "shelter_map.html"),
+                    "roads_path": paths["roads"], "faults_path": paths["faults"]},
+         "inputs": [config.SCORED_OUTPUT, paths["roads"], paths["faults"]],
+         "outputs": [os.path.join(config.MAPS_DIR, "shelter_map.html")], "code": ["src/map_visualizer.py", "src/overlays.py", "src/storage.py"]},
+        {"name": "reports", "func": "src.pipeline:run_reports",
+         "kwargs": {"shelter_path": config.SCORED_OUTPUT, "output_dir": config.REPORTS_DIR},
+         "inputs": [config.SCORED_OUTPUT], "outputs": [os.path.join(config.REPORTS_DIR, ".report_manifest.json")],
+         "code": ["src/report_generator.py", "src/mini_map.py", "src/storage.py"]},
+    ]
+
+
+def _abspath(path: str) -> str:
+    return os.path.normpath(os.path.join(REPO_ROOT, path))
+
+
+def _code_files(stage: dict) -> list:
+    """
+    Source files whose change invalidates the stage: its script / function module plus declared extras.
+
+    "code" must list every src module the stage reaches through its imports
+    (config excepted: its values enter through params and paths).
+    """
+    if "script" in stage:
+        files = [os.path.join(SCRIPTS_DIR, stage["script"])]
+    else:
+        files = [os.path.join(REPO_ROOT, stage["func"].split(":")[0].replace(".", os.sep) + ".py")]
+    return files + [_abspath(path) for path in stage.get("code", [])]
+
+
+def resolve_dag(stages: list, targets=None) -> dict:
+    """
+    Validate the stages and derive their dependencies.
+
+    Returns:
+        dict: {name: stage} in topological order, restricted to the targets
+        and their ancestors, each stage with a "deps" list.
+    """
+    by_name = {}
+    producer = {}
+    for stage in stages:
+        if stage["name"] in by_name:
+            raise ValueError(f"❌ Duplicate stage name: '{stage['name']}'")
+        if ("script" in stage) == ("func" in stage):
+            raise ValueError(f"❌ Stage '{stage['name']}' needs exactly one of 'script' or 'func'")
+        by_name[stage["name"]] = dict(stage)
+        for output in stage["outputs"]:
+            if _abspath(output) in producer:
+                raise ValueError(f"❌ {output} is an output of both '{producer[_abspath(output)]}' and '{stage['name']}'")
+            producer[_abspath(output)] = stage["name"]
+
+    for stage in by_name.values():
+        stage["deps"] = sorted({producer[_abspath(path)] for path in stage["inputs"] if _abspath(path) in producer})
+
+    targets = list(by_name) if targets is None else list(targets)
+    for target in targets:
+        if target not in by_name:
+            raise KeyError(f"❌ Unknown stage: '{target}' (stages: {list(by_name)})")
+
+    ordered, visiting = {}, set()
+
+    def visit(name):
+        if name in ordered:
+            return
+        if name in visiting:
+            raise ValueError(f"❌ Stage dependency cycle through '{name}'")
+        visiting.add(name)
+        for dep in by_name[name]["deps"]:
+            visit(dep)
+        visiting.discard(name)
+        ordered[name] = by_name[name]
+
+    for target in targets:
+        visit(target)
+    return ordered
+
+
+def stage_key(stage: dict) -> str:
+    """Cache key of a stage: content hash of its inputs and code, plus its kwargs / params / env."""
+    payload = {
+        "inputs": {path: file_hash(_abspath(path)) for path in stage["inputs"]},
+        "code": [file_hash(path) for path in _code_files(stage)],
+        "kwargs": stage.get("kwargs", {}),
+        "params": stage.get("params", {}),
+        "env": stage.get("env", {}),
+        "version": PIPELINE_VERSION,
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _is_up_to_date(stage: dict, key: str, state: dict):
+    """Return (up_to_date, reason)."""
+    record = state.get(stage["name"])
+    if record is None:
+        return False, "never ran"
+    if record["key"] != key:
+        return False, "inputs or code changed"
+    for path in stage["outputs"]:
+        if not os.path.exists(_abspath(path)):
+            return False, f"missing output {os.path.basename(path)}"
+        if file_hash(_abspath(path)) != record["outputs"].get(path):
+            return False, f"output {os.path.basename(path)} modified"
+    return True, "up to date"
+
+
+def _load_state(state_dir: str) -> dict:
+    path = os.path.join(state_dir, "state.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_state(state_dir: str, state: dict):
+    os.makedirs(state_dir, exist_ok=True)
+    path = os.path.join(state_dir, "state.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _execute(stage: dict, log_path: str) -> dict:
+    """
+    Run one stage in its own child process and measure it.
+
+    Scripts run as-is; functions run through `python -m src.pipeline call`.
+    os.wait4 returns the child's own resource usage, so the peak RSS is the
+    stage's alone even when several stages run at once. Where it is not
+    available (non-Unix), CPU time and peak RSS are reported as None.
+    """
+    if "script" in stage:
+        command = [sys.executable, os.path.join(SCRIPTS_DIR, stage["script"])]
+    else:
+        command = [sys.executable, "-m", "src.pipeline", "call", stage["func"], json.dumps(stage.get("kwargs", {}))]
+    env = {**os.environ, **stage.get("env", {}), "MPLBACKEND": "Agg", "PYTHONIOENCODING": "utf-8"}
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))
+
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.Popen(command, cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+        if hasattr(os, "wait4"):
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+        else:
+            process.wait()
+            usage = None
+    return {
+        "returncode": process.returncode,
+        "seconds": time.perf_counter() - start,
+        "cpu_s": usage.ru_utime + usage.ru_stime if usage else None,
+        # ru_maxrss is in KiB on Linux, in bytes on macOS
+        "peak_rss_mb": usage.ru_maxrss / (1024 ** 2 if sys.platform == "darwin" else 1024) if usage else None,
+    }
+
+
+def _log_tail(path: str, lines: int = 15) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return "".join(f.readlines()[-lines:])
+
+
+def run_pipeline(stages: list = None, targets=DEFAULT_TARGETS, force=(), workers: int = config.PIPELINE_WORKERS,
+                 state_dir: str = config.PIPELINE_STATE_DIR, report_path: str = config.PIPELINE_REPORT) -> pd.DataFrame:
+    """
+    Run the stage DAG, skipping up-to-date stages and running independent ones concurrently.
+
+    A stage is skipped when its key (content hash of inputs and code, plus
+    its arguments) matches the last successful run and its outputs still
+    have the hashes recorded then. A stage becomes ready once all its
+    dependencies succeeded or were skipped; up to `workers` ready stages
+    run at once, each in its own process (stdout in <state_dir>/logs/).
+    A failure blocks only the stages downstream of it.
+
+    Args:
+        stages (list): Stage dicts (default: default_stages()).
+        targets (iterable): Stages to bring up to date, with their ancestors; None = all.
+        force (iterable | True): Stages to run even if up to date (True = every stage).
+
+    Returns:
+        DataFrame: One row per stage (status, reason, seconds, cpu_s,
+        peak_rss_mb), also written to report_path.
+    """
+    start = time.perf_counter()
+    dag = resolve_dag(default_stages() if stages is None else stages, targets)
+    state = _load_state(state_dir)
+    log_dir = os.path.join(state_dir, "logs")
+    os.makedirs(log_dir, exist_ok=True)
+    logging.info(f"🧭 Pipeline: {' → '.join(dag)} ({workers} worker(s))")
+
+    rows = {name: {"stage": name, "status": "pending", "reason": None, "seconds": None, "cpu_s": None,
+                   "peak_rss_mb": None} for name in dag}
+    done = set()
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            for name, stage in dag.items():
+                row = rows[name]
+                if row["status"] != "pending" or len(running) >= workers:
+                    continue
+                if any(rows[dep]["status"] in ("failed", "blocked") for dep in stage["deps"]):
+                    row.update(status="blocked", reason="upstream failed")
+                    continue
+                if not all(dep in done for dep in stage["deps"]):
+                    continue
+                try:
+                    key = stage_key(stage)
+                except FileNotFoundError as exc:
+                    row.update(status="failed", reason=str(exc))
+                    logging.error(f"❌ {name}: {exc}")
+                    continue
+                up_to_date, reason = _is_up_to_date(stage, key, state)
+                if up_to_date and not (force is True or name in force):
+                    row.update(status="skipped", reason=reason)
+                    done.add(name)
+                    logging.info(f"⏭️ {name}: {reason}")
+                    continue
+                row.update(status="running", reason="forced" if up_to_date else reason)
+                logging.info(f"▶️ {name}: {row['reason']}")
+                future = pool.submit(_execute, stage, os.path.join(log_dir, f"{name}.log"))
+                running[future] = (name, key)
+
+            if not running:
+                # Stages are visited in topological order, so nothing is left pending here
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name, key = running.pop(future)
+                stage, row = dag[name], rows[name]
+                result = future.result()
+                row.update(seconds=round(result["seconds"], 3),
+                           cpu_s=None if result["cpu_s"] is None else round(result["cpu_s"], 3),
+                           peak_rss_mb=None if result["peak_rss_mb"] is None else round(result["peak_rss_mb"], 1))
+                missing = [path for path in stage["outputs"] if not os.path.exists(_abspath(path))]
+                if result["returncode"] != 0 or missing:
+                    row.update(status="failed", reason=f"exit code {result['returncode']}" if result["returncode"]
+                               else f"missing outputs: {[os.path.basename(path) for path in missing]}")
+                    logging.error(f"❌ {name} failed ({row['reason']}), log {log_dir}/{name}.log:\n"
+                                  f"{_log_tail(os.path.join(log_dir, f'{name}.log'))}")
+                    continue
+                state[name] = {"key": key, "outputs": {path: file_hash(_abspath(path)) for path in stage["outputs"]}}
+                _save_state(state_dir, state)
+                row["status"] = "ran"
+                done.add(name)
+                peak = "" if row["peak_rss_mb"] is None else f", {row['peak_rss_mb']:.0f} MB peak"
+                logging.info(f"✅ {name}: {row['seconds']:.1f}s{peak}")
+
+    report = pd.DataFrame(list(rows.values()))
+    report.attrs["wall_s"] = time.perf_counter() - start
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    report.to_csv(report_path, index=False)
+
+    counts = report["status"].value_counts().to_dict()
+    logging.info(f"🏁 Pipeline finished in {report.attrs['wall_s']:.1f}s wall "
+                 f"(stage sum {report['seconds'].sum():.1f}s): {counts}. Report: {report_path}")
+    return report
+
+
+def _call(func: str, kwargs_json: str):
+    module_name, func_name = func.split(":")
+    getattr(importlib.import_module(module_name), func_name)(**json.loads(kwargs_json))
+
+
+if __name__ == "__main__":
+    # python -m src.pipeline [stage ...] [--force stage ...]              → bring the targets up to date
+    # python -m src.pipeline call module:function '<json kwargs>'          → run one function stage (used by _execute)
+    if len(sys.argv) > 1 and sys.argv[1] == "call":
+        _call(sys.argv[2], sys.argv[3])
+    else:
+        parser = argparse.ArgumentParser(description="Run the shelter pipeline DAG.")
+        parser.add_argument("targets", nargs="*", default=list(DEFAULT_TARGETS), help="stages to bring up to date")
+        parser.add_argument("--force", nargs="*", default=None, help="stages to rerun (no names: all)")
+        parser.add_argument("--workers", type=int, default=config.PIPELINE_WORKERS)
+        args = parser.parse_args()
+        force = () if args.force is None else (args.force or True)
+        print(run_pipeline(targets=args.targets, force=force, workers=args.workers).to_string(index=False))
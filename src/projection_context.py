@@ -0,0 +1,76 @@
+import logging
+import time
+from contextlib import contextmanager
+
+import geopandas as gpd
+import pandas as pd
+
+from src.config import PROJECTED_CRS
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+
+class ProjectionContext:
+    """
+    Hold every layer of an enrichment run in one projected CRS.
+
+    Each named layer is reprojected at most once; later steps reuse the
+    projected frame. Reprojection counts and
+    timings are recorded per step for the final report.
+    """
+
+    def __init__(self, crs: str = PROJECTED_CRS):
+        self.crs = crs
+        self._layers = {}
+        self._current_step = None
+        self.stats = {}
+
+    def _record(self, key, value):
+        step = self._current_step or "setup"
+        row = self.stats.setdefault(step, {"reprojections": 0, "reproject_s": 0.0, "total_s": 0.0})
+        row[key] += value
+
+    @contextmanager
+    def step(self, name: str):
+        """Attribute reprojections and wall time inside the block to `name`."""
+        previous, self._current_step = self._current_step, name
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self._record("total_s", time.perf_counter() - start)
+            self._current_step = previous
+
+    def _to_crs(self, gdf: gpd.GeoDataFrame, crs) -> gpd.GeoDataFrame:
+        if gdf.crs is not None and gdf.crs == crs:
+            return gdf
+        start = time.perf_counter()
+        projected = gdf.to_crs(crs)
+        self._record("reprojections", 1)
+        self._record("reproject_s", time.perf_counter() - start)
+        return projected
+
+    def project(self, name: str, gdf: gpd.GeoDataFrame = None) -> gpd.GeoDataFrame:
+        """Return the projected layer `name`, projecting `gdf` on first use."""
+        if name not in self._layers:
+            if gdf is None:
+                raise KeyError(f"❌ Layer '{name}' has not been registered.")
+            self._layers[name] = self._to_crs(gdf, self.crs)
+        return self._layers[name]
+
+    def export(self, gdf: gpd.GeoDataFrame, crs: str = "EPSG:4326") -> gpd.GeoDataFrame:
+        """Convert a frame to the export CRS; a no-op if it is already there."""
+        with self.step("export"):
+            return self._to_crs(gdf, crs)
+
+    def report(self) -> pd.DataFrame:
+        """Log and return the per-step reprojection counts and timings."""
+        table = pd.DataFrame.from_dict(self.stats, orient="index")
+        table.index.name = "step"
+        for step, row in table.iterrows():
+            logging.info(
+                f"⏱️ {step}: {int(row['reprojections'])} reprojection(s), "
+                f"{row['reproject_s']:.3f}s reprojecting / {row['total_s']:.3f}s total"
+            )
+        return table
@@ -0,0 +1,182 @@
+import logging
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio
+import shapely
+from affine import Affine
+from rasterio.features import geometry_mask
+from rasterio.windows import Window
+
+from src import config
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+ZONAL_STATS = ("mean", "min", "max", "std", "count")
+
+
+def _to_pixel(transform, x, y):
+    """Fractional (col, row) of map coordinates (inverse of the raster transform)."""
+    a, b, c, d, e, f = transform.a, transform.b, transform.c, transform.d, transform.e, transform.f
+    det = a * e - b * d
+    col = (e * (x - c) - b * (y - f)) / det
+    row = (a * (y - f) - d * (x - c)) / det
+    return col, row
+
+
+def _window_transform(transform, window: Window) -> Affine:
+    """Transform of a window's top-left pixel."""
+    col_off, row_off = window.col_off, window.row_off
+    return Affine(transform.a, transform.b, transform.c + col_off * transform.a + row_off * transform.b,
+                  transform.d, transform.e, transform.f + col_off * transform.d + row_off * transform.e)
+
+
+def _read_masked(dataset, window: Window, band: int) -> np.ndarray:
+    data = dataset.read(band, window=window).astype(np.float64)
+    if dataset.nodata is not None:
+        data[data == dataset.nodata] = np.nan
+    return data
+
+
+def _geometries(gdf, crs):
+    if isinstance(gdf, gpd.GeoDataFrame):
+        gdf = gdf.geometry
+    return gdf.to_crs(crs).values
+
+
+def sample_xy(dataset, x, y, method: str = "nearest", band: int = 1,
+              block_size: int = config.RASTER_BLOCK_SIZE) -> np.ndarray:
+    """
+    Sample an open raster at coordinate arrays given in the raster CRS.
+
+    Coordinates are bucketed by block_size × block_size block; each occupied
+    block is read once (with a one-pixel halo for bilinear), so memory depends
+    on the block size, not the raster size. method="max" returns the largest
+    of the 4 cells bilinear would interpolate between (to detect capped
+    neighbours, see src/distance_field.py).
+
+    Returns:
+        np.ndarray: float64 values, NaN outside the raster or on nodata.
+    """
+    if method not in ("nearest", "bilinear", "max"):
+        raise ValueError(f"❌ Unknown sampling method: '{method}'")
+
+    col, row = _to_pixel(dataset.transform, np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    values = np.full(col.shape, np.nan)
+    width, height = dataset.width, dataset.height
+
+    inside = (col >= 0) & (col < width) & (row >= 0) & (row < height)
+    if method != "nearest":
+        # Pixel centres sit at +0.5; interpolate between the 4 surrounding centres
+        col, row = col - 0.5, row - 0.5
+    col0, row0 = np.floor(col).astype(np.int64), np.floor(row).astype(np.int64)
+
+    block_col = np.clip(col0, 0, width - 1) // block_size
+    block_row = np.clip(row0, 0, height - 1) // block_size
+    block_id = block_row * (width // block_size + 1) + block_col
+
+    # Group points by block with one sort instead of a mask per block
+    candidates = np.flatnonzero(inside)
+    candidates = candidates[np.argsort(block_id[candidates], kind="stable")]
+    starts = np.flatnonzero(np.diff(block_id[candidates], prepend=-1))
+    for members in np.split(candidates, starts[1:]):
+        if members.size == 0:
+            continue
+        bc, br = block_col[members[0]], block_row[members[0]]
+        halo = 0 if method == "nearest" else 1
+        c_start, r_start = max(bc * block_size - halo, 0), max(br * block_size - halo, 0)
+        c_stop = min((bc + 1) * block_size + halo, width)
+        r_stop = min((br + 1) * block_size + halo, height)
+        data = _read_masked(dataset, Window(c_start, r_start, c_stop - c_start, r_stop - r_start), band)
+
+        if method == "nearest":
+            values[members] = data[row0[members] - r_start, col0[members] - c_start]
+            continue
+
+        # Neighbour indices clamped to the raster edge (edge pixels are replicated)
+        c_lo = np.clip(col0[members], 0, width - 1) - c_start
+        c_hi = np.clip(col0[members] + 1, 0, width - 1) - c_start
+        r_lo = np.clip(row0[members], 0, height - 1) - r_start
+        r_hi = np.clip(row0[members] + 1, 0, height - 1) - r_start
+        if method == "max":
+            values[members] = np.maximum.reduce([data[r_lo, c_lo], data[r_lo, c_hi], data[r_hi, c_lo], data[r_hi, c_hi]])
+            continue
+        fc = np.clip(col[members] - col0[members], 0, 1)
+        fr = np.clip(row[members] - row0[members], 0, 1)
+        top = data[r_lo, c_lo] * (1 - fc) + data[r_lo, c_hi] * fc
+        bottom = data[r_hi, c_lo] * (1 - fc) + data[r_hi, c_hi] * fc
+        values[members] = top * (1 - fr) + bottom * fr
+
+    return values
+
+
+def sample_points(raster_path: str, points, method: str = "nearest", band: int = 1,
+                  block_size: int = config.RASTER_BLOCK_SIZE) -> np.ndarray:
+    """
+    Sample a raster at many points, reading only the blocks that contain them.
+
+    Lines and polygons are sampled at a point on their surface.
+
+    Args:
+        raster_path (str): Raster file.
+        points (GeoDataFrame | GeoSeries): Sample locations (any CRS).
+        method (str): "nearest" or "bilinear".
+        band (int): Band number.
+
+    Returns:
+        np.ndarray: float64 values, NaN outside the raster or on nodata.
+    """
+    with rasterio.open(raster_path) as src:
+        xy = shapely.get_coordinates(shapely.point_on_surface(_geometries(points, src.crs)))
+        return sample_xy(src, xy[:, 0], xy[:, 1], method=method, band=band, block_size=block_size)
+
+
+def zonal_stats(raster_path: str, polygons, stats=("mean",), band: int = 1, all_touched: bool = True) -> pd.DataFrame:
+    """
+    Raster statistics inside each polygon, reading only the polygon's bounding window.
+
+    Args:
+        raster_path (str): Raster file.
+        polygons (GeoDataFrame | GeoSeries): Zones (any CRS).
+        stats (tuple): Any of "mean", "min", "max", "std", "count".
+        all_touched (bool): Include every pixel touched by the polygon
+            (keeps small polygons from having no pixels).
+
+    Returns:
+        DataFrame (same index as polygons): One column per statistic, NaN if
+        the polygon covers no valid pixel.
+    """
+    unknown = set(stats) - set(ZONAL_STATS)
+    if unknown:
+        raise ValueError(f"❌ Unknown zonal statistics: {sorted(unknown)}")
+
+    index = polygons.index
+    result = {name: np.full(len(index), np.nan) for name in stats}
+
+    with rasterio.open(raster_path) as src:
+        geoms = _geometries(polygons, src.crs)
+        for i, geom in enumerate(geoms):
+            if geom is None or geom.is_empty:
+                continue
+            minx, miny, maxx, maxy = geom.bounds
+            cols, rows = _to_pixel(src.transform, np.array([minx, maxx]), np.array([miny, maxy]))
+            c_start, c_stop = max(int(np.floor(cols.min())), 0), min(int(np.ceil(cols.max())), src.width)
+            r_start, r_stop = max(int(np.floor(rows.min())), 0), min(int(np.ceil(rows.max())), src.height)
+            if c_start >= c_stop or r_start >= r_stop:
+                continue
+
+            window = Window(c_start, r_start, c_stop - c_start, r_stop - r_start)
+            data = _read_masked(src, window, band)
+            outside = geometry_mask([geom], out_shape=data.shape, transform=_window_transform(src.transform, window),
+                                    all_touched=all_touched)
+            pixels = data[~outside & ~np.isnan(data)]
+            if pixels.size == 0:
+                if "count" in result:
+                    result["count"][i] = 0
+                continue
+            for name in stats:
+                result[name][i] = pixels.size if name == "count" else getattr(np, name)(pixels)
+
+    return pd.DataFrame(result, index=index)
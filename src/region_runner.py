@@ -0,0 +1,257 @@
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import prepare_dataset
+from src import config
+from src.ahp_analysis import ahp_from_matrix, save_ahp_result
+from src.storage import layer_exists, layer_path, read_layer, resolve_layer_path, write_layer
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+STAGES = ("prepare", "ahp", "score", "map")
+
+# Per-region input layers, laid out under the region's data_dir like the single-region data/ tree.
+# Faults are per region too: create_fault_lines.py clips them to SHELTER_BBOX, so the Elazığ file
+# would silently measure every other region's Distance_to_Faults to the wrong segment.
+REGION_LAYERS = {
+    "shelters": config.SHELTERS_PATH,
+    "roads": config.ROADS_PATH,
+    "faults": config.FAULT_LINES_PATH,
+    "population": config.POPULATION_PATH,
+    "landuse": config.LANDUSE_PATH,
+    "slope": config.SLOPE_PATH,
+}
+RASTER_LAYERS = ("slope", "dem")
+
+
+def _region_slug(name: str) -> str:
+    return "".join(c if c.isalnum() else "_" for c in name.lower()).strip("_")
+
+
+def load_regions(regions_path: str = config.REGIONS_PATH) -> list:
+    """
+    Read the region list.
+
+    The file is a JSON list (or {"regions": [...]}) of objects with at least
+    "name"; optional keys are "place", "data_dir" (default
+    config.REGIONS_DIR/<name>), "output_dir", "crs" (a metric CRS, or
+    "auto" for the region's UTM zone), "dem_tile" (SRTM tile of the
+    region's DEM, as given to create_dem.py; default config.DEM_TILE),
+    "layers" ({layer: path} overrides) and "pairwise" (a region-specific
+    AHP matrix).
+    """
+    if not os.path.exists(regions_path):
+        raise FileNotFoundError(f"❌ Regions file not found: {regions_path}")
+    with open(regions_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return data["regions"] if isinstance(data, dict) else data
+
+
+def region_paths(region: dict, output_root: str = config.REGION_OUTPUTS_DIR) -> dict:
+    """Resolve every input and output path of a region."""
+    if "name" not in region:
+        raise KeyError(f"❌ Region without a name: {region}")
+    slug = _region_slug(region["name"])
+    data_dir = region.get("data_dir", os.path.join(config.REGIONS_DIR, slug))
+    output_dir = region.get("output_dir", os.path.join(output_root, slug))
+
+    paths = {name: os.path.join(data_dir, os.path.relpath(default, config.DATA_DIR)) for name, default in REGION_LAYERS.items()}
+    paths["dem"] = os.path.join(data_dir, "raw", f"{region.get('dem_tile', config.DEM_TILE)}_dem.tif")
+    paths.update(region.get("layers", {}))
+    paths.update(
+        output_dir=output_dir,
+        enriched=layer_path(os.path.join(output_dir, "shelters_with_criteria")),
+        scored=layer_path(os.path.join(output_dir, "results")),
+        scored_export=os.path.join(output_dir, "results.geojson"),
+        weights=os.path.join(output_dir, "criteria_weights.json"),
+        map=os.path.join(output_dir, "maps", "shelter_map.html"),
+        # Artifacts are scoped to the shelters layer, so regions share one enrichment cache
+        cache_dir=config.ENRICHMENT_CACHE_DIR,
+    )
+    return paths
+
+
+def check_region_inputs(paths: dict):
+    """
+    Fail if any input layer of a region is missing.
+
+    enrich_shelters skips optional criteria (e.g. elevation) whose layer
+    is absent, which would leave a region silently scored on fewer criteria.
+    """
+    missing = [
+        f"{name}: {paths[name]}" for name in ("shelters", "roads", "faults", "population", "landuse", "slope", "dem")
+        if not (os.path.exists(paths[name]) if name in RASTER_LAYERS else layer_exists(paths[name]))
+    ]
+    if missing:
+        raise FileNotFoundError(f"❌ Missing region inputs (run the create_* scripts with SHELTER_DATA_DIR): {missing}")
+
+
+def prepare_shared_inputs(output_dir: str = config.REGION_OUTPUTS_DIR, faults_path: str = None,
+                          weights_path: str = config.WEIGHTS_PATH, pairwise_matrix=None, criteria_names=None) -> dict:
+    """
+    Prepare the inputs every region reads, once, before the pool starts.
+
+    The AHP weights are computed once if a pairwise matrix is given, else
+    taken from weights_path. faults_path is only for an unclipped fault
+    source covering every region (e.g. the full PB2002 set); it is
+    converted to the columnar storage format once. Without it each region
+    reads its own faults layer.
+    """
+    start = time.perf_counter()
+    shared_dir = os.path.join(output_dir, "_shared")
+    shared = {"weights": weights_path, "faults": None}
+
+    if faults_path is not None:
+        source = resolve_layer_path(faults_path)
+        target = layer_path(os.path.join(shared_dir, "fault_lines"))
+        if not os.path.exists(target) or os.path.getmtime(target) < os.path.getmtime(source):
+            write_layer(read_layer(source), target)
+        shared["faults"] = target
+
+    if pairwise_matrix is not None:
+        os.makedirs(shared_dir, exist_ok=True)
+        shared["weights"] = os.path.join(shared_dir, "criteria_weights.json")
+        save_ahp_result(ahp_from_matrix(np.asarray(pairwise_matrix, dtype=float), criteria_names), json_path=shared["weights"],
+                        csv_path=os.path.join(shared_dir, "criteria_weights.csv"))
+    elif not os.path.exists(weights_path):
+        raise FileNotFoundError(f"❌ Weights file not found: {weights_path} (pass a pairwise matrix to compute it)")
+
+    shared["seconds"] = time.perf_counter() - start
+    logging.info(f"📦 Shared inputs ready in {shared['seconds']:.2f}s: "
+                 f"faults {shared['faults'] or 'per region'}, weights {shared['weights']}")
+    return shared
+
+
+def run_region(region: dict, shared: dict, stages=STAGES, output_root: str = config.REGION_OUTPUTS_DIR) -> dict:
+    """
+    Run prepare → AHP → score → map for one region, writing only under its output_dir.
+
+    Never raises: a failing stage is recorded in the returned row and the
+    remaining stages are skipped.
+
+    Returns:
+        dict: region, status, failed_stage, error, shelters, <stage>_s and total_s.
+    """
+    from src.map_visualizer import visualize_shelters
+    from src.mcda_scoring import normalize_and_score
+
+    start = time.perf_counter()
+    row = {"region": region.get("name"), "status": "ok", "failed_stage": None, "error": None, "shelters": None}
+    row.update({f"{stage}_s": None for stage in STAGES})
+    stage = "setup"
+    try:
+        paths = region_paths(region, output_root)
+        if shared["faults"] is not None:
+            paths["faults"] = shared["faults"]
+        if "prepare" in stages:
+            check_region_inputs(paths)
+        os.makedirs(paths["output_dir"], exist_ok=True)
+        crs = region.get("crs", config.PROJECTED_CRS)
+        if crs == "auto":
+            crs = read_layer(paths["shelters"]).estimate_utm_crs().to_string()
+        weights_path = shared["weights"]
+        scored = None
+
+        for stage in stages:
+            stage_start = time.perf_counter()
+            if stage == "prepare":
+                enriched = prepare_dataset.enrich_shelters(
+                    shelters_path=paths["shelters"], roads_path=paths["roads"], faults_path=paths["faults"],
+                    population_path=paths["population"], landuse_path=paths["landuse"],
+                    slope_path=paths["slope"], dem_path=paths["dem"], output_path=paths["enriched"],
+                    geojson_path=None, cache_dir=paths["cache_dir"], crs=crs,
+                )
+                row["shelters"] = len(enriched)
+            elif stage == "ahp":
+                if region.get("pairwise") is not None:
+                    with open(shared["weights"], "r", encoding="utf-8") as f:
+                        criteria = region.get("criteria", list(json.load(f)))
+                    save_ahp_result(ahp_from_matrix(np.asarray(region["pairwise"], dtype=float), criteria), json_path=paths["weights"],
+                                    csv_path=os.path.splitext(paths["weights"])[0] + ".csv")
+                    weights_path = paths["weights"]
+            elif stage == "score":
+                scored = normalize_and_score(paths["enriched"], paths["scored"], weights_path=weights_path,
+                                             geojson_path=paths["scored_export"])
+                row["shelters"] = len(scored)
+            elif stage == "map":
+                visualize_shelters(gdf=scored, shelter_path=paths["scored"], roads_path=paths["roads"],
+                                   faults_path=paths["faults"], output_path=paths["map"])
+            else:
+                raise ValueError(f"❌ Unknown stage: '{stage}' (stages: {STAGES})")
+            row[f"{stage}_s"] = round(time.perf_counter() - stage_start, 3)
+    except Exception as exc:
+        logging.exception(f"❌ Region {row['region']} failed in {stage}")
+        row.update(status="failed", failed_stage=stage, error=f"{type(exc).__name__}: {exc}")
+
+    row["total_s"] = round(time.perf_counter() - start, 3)
+    return row
+
+
+def run_regions(regions: list = None, regions_path: str = config.REGIONS_PATH, workers: int = None,
+                stages=STAGES, pairwise_matrix=None, criteria_names=None,
+                weights_path: str = config.WEIGHTS_PATH, faults_path: str = None,
+                output_dir: str = config.REGION_OUTPUTS_DIR) -> pd.DataFrame:
+    """
+    Run the pipeline for many regions over a process pool.
+
+    Shared, immutable inputs (weights, and an unclipped fault source if
+    faults_path is given) are prepared once in the parent; each region then
+    runs in one worker, reads its own layers and writes only under its own
+    output directory, so regions never contend for files. One failing
+    region does not stop the others.
+
+    Args:
+        regions (list): Region dicts (see load_regions); default: read regions_path.
+        workers (int): Process pool size; None or 1 runs regions one after another.
+        stages (tuple): Subset of STAGES to run, in order.
+        pairwise_matrix (array): Compute the shared weights from this AHP matrix.
+        faults_path (str): Fault layer covering every region; default: each region's own.
+
+    Returns:
+        DataFrame: One timing row per region (also saved as region_timings.csv).
+    """
+    start = time.perf_counter()
+    regions = load_regions(regions_path) if regions is None else regions
+    names = [_region_slug(region.get("name", "")) for region in regions]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"❌ Region names must be unique (outputs would collide): {duplicates}")
+
+    shared = prepare_shared_inputs(output_dir, faults_path, weights_path, pairwise_matrix, criteria_names)
+    logging.info(f"🗺️ Running {len(regions)} regions with {workers or 1} worker(s): {' → '.join(stages)}")
+
+    rows = []
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(run_region, region, shared, stages, output_dir): region for region in regions}
+            for future in as_completed(futures):
+                rows.append(future.result())
+                logging.info(f"🏁 {rows[-1]['region']}: {rows[-1]['status']} in {rows[-1]['total_s']}s "
+                             f"({len(rows)}/{len(regions)})")
+    else:
+        for region in regions:
+            rows.append(run_region(region, shared, stages, output_dir))
+
+    timings = pd.DataFrame(rows).sort_values("region").reset_index(drop=True)
+    timings.attrs["shared_s"] = shared["seconds"]
+    timings.attrs["wall_s"] = time.perf_counter() - start
+    os.makedirs(output_dir, exist_ok=True)
+    timings.to_csv(os.path.join(output_dir, "region_timings.csv"), index=False)
+
+    stage_totals = ", ".join(f"{stage} {timings[f'{stage}_s'].sum():.1f}s" for stage in stages)
+    logging.info(
+        f"✅ {int((timings['status'] == 'ok').sum())}/{len(timings)} regions ok in {timings.attrs['wall_s']:.1f}s wall "
+        f"(shared inputs {shared['seconds']:.1f}s; summed stages: {stage_totals})"
+    )
+    return timings
+
+
+if __name__ == "__main__":
+    print(run_regions(workers=os.cpu_count()).to_string(index=False))
@@ -1,12 +1,27 @@
 import os
+import json
+import time
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import geopandas as gpd
 import pandas as pd
 import pdfkit
 import folium
 from jinja2 import Environment, FileSystemLoader
 
+from src.mini_map import load_layers, render_mini_map, thumbnail_data_uri
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+TEMPLATE_DIR = "src/templates"
+REPORT_MANIFEST = ".report_manifest.json"
+REPORT_MANIFEST_SAVE_EVERY = 25  # finished PDFs between manifest saves
+
 # إعداد قالب Jinja2
-env = Environment(loader=FileSystemLoader("src/templates"))
+env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+_WORKER_TEMPLATE = None
 
 def render_report_html(record, template_name="shelter_report.html"):
     """
@@ -26,6 +41,8 @@ def generate_mini_map(lat, lon):
     """
     Generate mini Folium map centered at given coordinates.
 
+    Interactive only: reports embed static thumbnails (see src/mini_map.py).
+
     Returns:
         str: Path to saved HTML map.
     """
@@ -35,28 +52,152 @@ def generate_mini_map(lat, lon):
     fmap.save(map_path)
     return map_path
 
-def generate_reports(gdf, output_dir="outputs/reports"):
+def _record_hash(record, template_source):
+    """Hash of a shelter record plus the template source, used to skip unchanged reports."""
+    payload = {key: (value.wkt if hasattr(value, "wkt") else value) for key, value in record.items()}
+    encoded = json.dumps([payload, template_source], sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def _init_report_worker(template_dir, template_name):
+    """Compile the Jinja2 template and load the mini-map layers once per worker process."""
+    global _WORKER_TEMPLATE
+    _WORKER_TEMPLATE = Environment(loader=FileSystemLoader(template_dir)).get_template(template_name)
+    load_layers()
+
+
+def _render_report(record, output_dir):
+    """Stage 1 (process pool): mini-map thumbnail + HTML render. Returns the HTML path."""
+    lat, lon = record["geometry"].y, record["geometry"].x
+    record["map_path"] = render_mini_map(lat, lon)
+    record["map_image"] = thumbnail_data_uri(record["map_path"])
+    html = _WORKER_TEMPLATE.render(shelter=record)
+    html_file = os.path.join(output_dir, f"shelter_{int(record['id'])}.html")
+    with open(html_file, "w", encoding="utf-8") as f:
+        f.write(html)
+    return html_file
+
+
+def _convert_pdf(html_file):
+    """Stage 2 (thread pool, pdfkit runs wkhtmltopdf as a subprocess)."""
+    pdf_file = html_file.replace(".html", ".pdf")
+    pdfkit.from_file(html_file, pdf_file)
+    return pdf_file
+
+
+def _load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(path, manifest):
+    # Write then rename, so an interrupted save never leaves a truncated manifest
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def generate_reports(gdf, output_dir="outputs/reports", workers=None, pdf_workers=None, resume=True,
+                     template_dir=TEMPLATE_DIR, template_name="shelter_report.html"):
     """
     Generate individual reports for each shelter in the GeoDataFrame.
 
+    HTML rendering runs in a process pool (template compiled once per worker);
+    each finished HTML file is handed straight to a PDF conversion pool, so the
+    two stages overlap. With resume=True, shelters whose record hash matches
+    the manifest of a previous run (and whose PDF exists) are skipped; the
+    manifest is saved as PDFs finish, so an interrupted run resumes too.
+
     Args:
         gdf (GeoDataFrame): Contains shelter data.
         output_dir (str): Directory to save PDF reports.
+        workers (int): Render processes (default: CPU count).
+        pdf_workers (int): Concurrent PDF conversions (default: workers).
+        resume (bool): Skip reports whose input did not change.
+
+    Returns:
+        dict: Throughput metrics (rendered, skipped, failed, seconds, reports_per_s).
     """
     os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    workers = workers or os.cpu_count() or 1
+    pdf_workers = pdf_workers or workers
+
+    with open(os.path.join(template_dir, template_name), "r", encoding="utf-8") as f:
+        template_source = f.read()
+
+    manifest_path = os.path.join(output_dir, REPORT_MANIFEST)
+    manifest = _load_manifest(manifest_path) if resume else {}
 
+    pending = []
+    skipped = 0
     for _, row in gdf.iterrows():
         record = row.to_dict()
-        lat, lon = row.geometry.y, row.geometry.x
-        map_path = generate_mini_map(lat, lon)
-        record['map_path'] = map_path
+        report_id = str(int(record["id"]))
+        record_hash = _record_hash(record, template_source)
+        pdf_file = os.path.join(output_dir, f"shelter_{report_id}.pdf")
+        if resume and manifest.get(report_id) == record_hash and os.path.exists(pdf_file):
+            skipped += 1
+            continue
+        pending.append((report_id, record_hash, record))
+
+    rendered, failed = 0, 0
+    pdf_futures = {}
+
+    def collect(future):
+        # Record one finished PDF; the manifest is flushed every few reports so an interrupted run can resume
+        nonlocal rendered, failed
+        report_id, record_hash = pdf_futures.pop(future)
+        try:
+            pdf_file = future.result()
+        except Exception as e:
+            failed += 1
+            logging.error(f"❌ PDF conversion failed for shelter {report_id}: {e}")
+            return
+        manifest[report_id] = record_hash
+        rendered += 1
+        logging.info(f"✅ Report generated: {pdf_file}")
+        if rendered % REPORT_MANIFEST_SAVE_EVERY == 0:
+            _save_manifest(manifest_path, manifest)
 
-        html = render_report_html(record)
-        html_file = os.path.join(output_dir, f"shelter_{int(row['id'])}.html")
-        pdf_file = html_file.replace(".html", ".pdf")
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_report_worker,
+                                 initargs=(template_dir, template_name)) as render_pool, \
+                ThreadPoolExecutor(max_workers=pdf_workers) as pdf_pool:
+            render_futures = {
+                render_pool.submit(_render_report, record, output_dir): (report_id, record_hash)
+                for report_id, record_hash, record in pending
+            }
+            for future in as_completed(render_futures):
+                report_id, record_hash = render_futures[future]
+                try:
+                    pdf_futures[pdf_pool.submit(_convert_pdf, future.result())] = (report_id, record_hash)
+                except Exception as e:
+                    failed += 1
+                    logging.error(f"❌ Report rendering failed for shelter {report_id}: {e}")
+                for done in [f for f in pdf_futures if f.done()]:
+                    collect(done)
 
-        with open(html_file, "w", encoding="utf-8") as f:
-            f.write(html)
+            for future in as_completed(list(pdf_futures)):
+                collect(future)
+    finally:
+        # Also reached on Ctrl-C / a dead worker: keep every PDF finished so far
+        for done in [f for f in pdf_futures if f.done() and not f.cancelled()]:
+            collect(done)
+        _save_manifest(manifest_path, manifest)
 
-        pdfkit.from_file(html_file, pdf_file)
-        print(f"✅ Report generated: {pdf_file}")
+    elapsed = time.perf_counter() - start
+    metrics = {
+        "rendered": rendered,
+        "skipped": skipped,
+        "failed": failed,
+        "seconds": round(elapsed, 2),
+        "reports_per_s": round(rendered / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    logging.info(
+        f"📄 Reports: {rendered} generated, {skipped} unchanged, {failed} failed "
+        f"in {metrics['seconds']}s ({metrics['reports_per_s']} reports/s)"
+    )
+    return metrics
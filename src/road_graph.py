@@ -0,0 +1,240 @@
+import logging
+import os
+import time
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+from src import config
+from src.enrichment_cache import file_hash
+from src.storage import read_layer, resolve_layer_path
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+GRAPH_FORMAT_VERSION = 1
+
+
+class RoadGraph:
+    """
+    Undirected road network stored as CSR arrays.
+
+    Nodes are numbered 0..n-1 with projected coordinates in `node_xy`;
+    the neighbours of node i are indices[indptr[i]:indptr[i + 1]], with
+    edge lengths in metres in the matching slice of `weights`.
+    """
+
+    def __init__(self, node_xy, indptr, indices, weights, crs=config.PROJECTED_CRS, source_hash=None,
+                 tolerance=None, source_stat=None):
+        self.node_xy = np.asarray(node_xy, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.crs = crs
+        self.source_hash = source_hash
+        self.source_stat = source_stat  # (size, mtime_ns) of the roads file when source_hash was taken
+        self.tolerance = tolerance
+        self._csr = None
+        self._components = None
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.node_xy)
+
+    @property
+    def n_edges(self) -> int:
+        """Number of undirected edges."""
+        return len(self.indices) // 2
+
+    def to_csr(self) -> sparse.csr_matrix:
+        """The adjacency matrix, ready for scipy.sparse.csgraph (built once, then shared)."""
+        if self._csr is None:
+            self._csr = sparse.csr_matrix((self.weights, self.indices, self.indptr), shape=(self.n_nodes, self.n_nodes))
+        return self._csr
+
+    def components(self) -> np.ndarray:
+        """Connected-component label of every node (computed once)."""
+        if self._components is None:
+            _, self._components = connected_components(self.to_csr(), directed=False)
+        return self._components
+
+    def edges(self):
+        """Each undirected edge once: (u, v, length) arrays with u < v."""
+        u = np.repeat(np.arange(self.n_nodes, dtype=np.int32), np.diff(self.indptr))
+        keep = u < self.indices
+        return u[keep], self.indices[keep], self.weights[keep]
+
+    def node_lonlat(self) -> np.ndarray:
+        """Node coordinates in EPSG:4326 as (lon, lat)."""
+        points = gpd.GeoSeries(shapely.points(self.node_xy), crs=self.crs).to_crs(epsg=4326)
+        return shapely.get_coordinates(points.values)
+
+    def save(self, path: str) -> str:
+        """Serialize to an uncompressed .npz so loading is a few array reads."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        np.savez(
+            path,
+            version=GRAPH_FORMAT_VERSION,
+            node_xy=self.node_xy,
+            indptr=self.indptr,
+            indices=self.indices,
+            weights=self.weights,
+            crs=str(self.crs),
+            source_hash=self.source_hash or "",
+            source_stat=np.asarray(self.source_stat or (-1, -1), dtype=np.int64),
+            tolerance=np.nan if self.tolerance is None else self.tolerance,
+        )
+        return path
+
+    @classmethod
+    def load(cls, path: str) -> "RoadGraph":
+        with np.load(path) as data:
+            if int(data["version"]) != GRAPH_FORMAT_VERSION:
+                raise ValueError(f"❌ Unsupported road graph format version in {path}")
+            tolerance = float(data["tolerance"])
+            source_stat = tuple(int(v) for v in data["source_stat"]) if "source_stat" in data.files else None
+            return cls(
+                data["node_xy"], data["indptr"], data["indices"], data["weights"],
+                crs=str(data["crs"]),
+                source_hash=str(data["source_hash"]) or None,
+                tolerance=None if np.isnan(tolerance) else tolerance,
+                source_stat=source_stat if source_stat != (-1, -1) else None,
+            )
+
+
+def _merge_nodes(coords: np.ndarray, tolerance: float):
+    """
+    Merge vertices closer than `tolerance` into one node.
+
+    Returns:
+        labels (array): Node id of every input vertex.
+        node_xy (array): (n_nodes, 2) mean position of each merged cluster.
+    """
+    # Exact duplicates (shared endpoints) first, so the KD-tree only sees distinct points
+    unique_xy, labels = np.unique(coords, axis=0, return_inverse=True)
+    labels = labels.ravel()
+
+    if tolerance and tolerance > 0 and len(unique_xy) > 1:
+        pairs = cKDTree(unique_xy).query_pairs(r=tolerance, output_type="ndarray")
+        if len(pairs):
+            n = len(unique_xy)
+            adjacency = sparse.coo_matrix((np.ones(len(pairs), dtype=np.int8), (pairs[:, 0], pairs[:, 1])),
+                                          shape=(n, n))
+            n_clusters, cluster = connected_components(adjacency, directed=False)
+            counts = np.bincount(cluster, minlength=n_clusters)
+            merged = np.column_stack([
+                np.bincount(cluster, weights=unique_xy[:, 0], minlength=n_clusters) / counts,
+                np.bincount(cluster, weights=unique_xy[:, 1], minlength=n_clusters) / counts,
+            ])
+            return cluster[labels], merged
+
+    return labels, unique_xy
+
+
+def build_road_graph(roads, tolerance: float = None, crs: str = config.PROJECTED_CRS) -> RoadGraph:
+    """
+    Build the road graph from a line layer without any per-feature Python loop.
+
+    MultiLineStrings are exploded, every pair of consecutive vertices becomes
+    an edge weighted by its length in metres, vertices within `tolerance`
+    are merged, and parallel edges keep their shortest length.
+
+    Args:
+        roads (GeoDataFrame | str): Road lines or a layer path.
+        tolerance (float): Node merge distance in metres (default: config.GRAPH_SNAP_TOLERANCE).
+        crs (str): Metric CRS used for coordinates and lengths.
+
+    Returns:
+        RoadGraph
+    """
+    start = time.perf_counter()
+    tolerance = config.GRAPH_SNAP_TOLERANCE if tolerance is None else tolerance
+    gdf = read_layer(roads, columns=["geometry"]) if isinstance(roads, str) else roads
+
+    geoms = gdf.to_crs(crs).geometry.values
+    geoms = geoms[~(shapely.is_empty(geoms) | shapely.is_missing(geoms))]
+    parts = shapely.get_parts(geoms)
+    parts = parts[shapely.get_type_id(parts) == 1]  # LineString parts only
+    coords, part_index = shapely.get_coordinates(parts, return_index=True)
+
+    # Consecutive vertices of the same part form a segment
+    same_part = part_index[1:] == part_index[:-1]
+    seg_u = np.flatnonzero(same_part)
+    seg_v = seg_u + 1
+    lengths = np.hypot(*(coords[seg_v] - coords[seg_u]).T)
+
+    labels, node_xy = _merge_nodes(coords, tolerance)
+    u, v = labels[seg_u], labels[seg_v]
+    keep = u != v  # segments collapsed by merging
+    u, v, lengths = u[keep], v[keep], lengths[keep]
+
+    # Both directions, then keep the shortest of any parallel edges
+    n_nodes = len(node_xy)
+    rows = np.concatenate([u, v]).astype(np.int64)
+    cols = np.concatenate([v, u]).astype(np.int64)
+    lengths = np.concatenate([lengths, lengths])
+    order = np.lexsort((lengths, cols, rows))
+    rows, cols, lengths = rows[order], cols[order], lengths[order]
+    first = np.ones(len(rows), dtype=bool)
+    first[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+    rows, cols, lengths = rows[first], cols[first], lengths[first]
+
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_nodes), out=indptr[1:])
+
+    graph = RoadGraph(node_xy, indptr, cols, lengths, crs=crs, tolerance=tolerance)
+    logging.info(
+        f"🛣️ Road graph: {graph.n_nodes} nodes, {graph.n_edges} edges "
+        f"from {len(parts)} lines in {time.perf_counter() - start:.2f}s"
+    )
+    return graph
+
+
+def load_road_graph(roads_path: str = config.ROADS_PATH, graph_path: str = config.ROAD_GRAPH_PATH,
+                    tolerance: float = None, rebuild: bool = False) -> RoadGraph:
+    """
+    Load the serialized road graph, rebuilding it if the roads layer or tolerance changed.
+
+    The roads file is only hashed when its size or mtime differ from the
+    ones recorded with the graph, so an unchanged layer costs one stat().
+
+    Returns:
+        RoadGraph
+    """
+    tolerance = config.GRAPH_SNAP_TOLERANCE if tolerance is None else tolerance
+    roads_path = resolve_layer_path(roads_path)
+    stat = os.stat(roads_path)
+    source_stat = (stat.st_size, stat.st_mtime_ns)
+    source_hash = None
+
+    if not rebuild and os.path.exists(graph_path):
+        start = time.perf_counter()
+        graph = RoadGraph.load(graph_path)
+        if graph.tolerance == tolerance and graph.source_stat == source_stat:
+            logging.info(f"🛣️ Road graph loaded from {graph_path} in {(time.perf_counter() - start) * 1000:.1f} ms")
+            return graph
+        source_hash = file_hash(roads_path)
+        if graph.tolerance == tolerance and graph.source_hash == source_hash:
+            # Touched but unchanged: record the new size/mtime so the next load skips the hash
+            graph.source_stat = source_stat
+            graph.save(graph_path)
+            logging.info(f"🛣️ Road graph loaded from {graph_path} in {(time.perf_counter() - start) * 1000:.1f} ms")
+            return graph
+        logging.info("🔄 Roads layer or tolerance changed, rebuilding the road graph.")
+
+    graph = build_road_graph(roads_path, tolerance=tolerance)
+    graph.source_hash = source_hash or file_hash(roads_path)
+    graph.source_stat = source_stat
+    graph.save(graph_path)
+    logging.info(f"💾 Road graph saved to: {graph_path}")
+    return graph
+
+
+if __name__ == "__main__":
+    load_road_graph(rebuild=True)
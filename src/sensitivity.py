@@ -0,0 +1,178 @@
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from src import config
+from src.ahp_analysis import ahp_batch
+from src.mcda_scoring import build_criteria_matrix, load_weights, rank_scores
+from src.storage import read_layer
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+_WORKER_MATRIX = None
+
+
+def sample_weights(weights: dict, n_draws: int, method: str = "dirichlet", concentration: float = 200.0,
+                   jitter: float = 0.1, pairwise_matrix=None, spread: float = 0.2, seed=None) -> np.ndarray:
+    """
+    Draw perturbed weight vectors around the AHP weights.
+
+    Args:
+        weights (dict): Weights as returned by load_weights (criterion order is kept).
+        n_draws (int): Number of draws.
+        method (str): "dirichlet" (Dirichlet centred on the weights, sharper with a
+            larger concentration), "jitter" (uniform ±jitter relative noise) or
+            "pairwise" (log-normal noise on the pairwise judgments, re-derived by AHP).
+        pairwise_matrix (array): The (n, n) pairwise matrix for the "pairwise" method.
+        spread (float): Log-scale standard deviation of pairwise judgment noise.
+
+    Returns:
+        np.ndarray: (n_draws, criteria) float32 weights, each row summing to 1.
+    """
+    rng = np.random.default_rng(seed)
+    base = np.array([float(v["weight"]) for v in weights.values()])
+    base = base / base.sum()
+
+    if method == "dirichlet":
+        draws = rng.dirichlet(np.maximum(base * concentration, 1e-6), size=n_draws)
+    elif method == "jitter":
+        draws = base * (1 + rng.uniform(-jitter, jitter, size=(n_draws, len(base))))
+    elif method == "pairwise":
+        if pairwise_matrix is None:
+            raise ValueError("❌ The 'pairwise' method needs the pairwise comparison matrix.")
+        matrix = np.asarray(pairwise_matrix, dtype=float)
+        if matrix.shape != (len(base), len(base)):
+            raise ValueError(f"❌ Pairwise matrix shape {matrix.shape} does not match {len(base)} criteria.")
+        upper = np.triu(np.ones(matrix.shape, dtype=bool), k=1)
+        perturbed = np.broadcast_to(matrix, (n_draws,) + matrix.shape).copy()
+        perturbed[:, upper] *= np.exp(rng.normal(0, spread, size=(n_draws, int(upper.sum()))))
+        # Restore reciprocity: a_ji = 1 / a_ij
+        perturbed[:, upper.T] = 1 / np.swapaxes(perturbed, 1, 2)[:, upper.T]
+        draws = ahp_batch(perturbed, validate=False)["weights"]
+    else:
+        raise ValueError(f"❌ Unknown perturbation method: '{method}'")
+
+    draws = np.clip(draws, 0, None)
+    return (draws / draws.sum(axis=1, keepdims=True)).astype(np.float32)
+
+
+def _accumulate(matrix: np.ndarray, draws: np.ndarray, top_ranks: int, n_bins: int, batch_size: int):
+    """Score and rank one chunk of draws, returning partial rank counts."""
+    n_rows = matrix.shape[0]
+    top_ranks = min(top_ranks, n_rows)
+    rai_counts = np.zeros((n_rows, top_ranks), dtype=np.int64)
+    histogram = np.zeros(n_rows * n_bins, dtype=np.int64)
+    rows = np.arange(n_rows)
+
+    for start in range(0, len(draws), batch_size):
+        batch = draws[start:start + batch_size]
+        scores = matrix @ batch.T                        # (rows, B)
+        order = np.argsort(-scores, axis=0, kind="stable")  # order[r, b] = row at rank r + 1
+        del scores
+
+        # Rank acceptability: how often each row lands on each of the top ranks
+        top = order[:top_ranks]
+        np.add.at(rai_counts, (top.ravel(), np.repeat(np.arange(top_ranks), top.shape[1])), 1)
+
+        # Per-row rank histogram (rank bins of equal width)
+        ranks = np.empty_like(order)
+        ranks[order, np.arange(order.shape[1])] = rows[:, np.newaxis]
+        bins = ranks * n_bins // n_rows
+        histogram += np.bincount((rows[:, np.newaxis] * n_bins + bins).ravel(), minlength=n_rows * n_bins)
+
+    return rai_counts, histogram.reshape(n_rows, n_bins)
+
+
+def _init_worker(matrix):
+    global _WORKER_MATRIX
+    _WORKER_MATRIX = matrix
+
+
+def _worker_accumulate(draws, top_ranks, n_bins, batch_size):
+    return _accumulate(_WORKER_MATRIX, draws, top_ranks, n_bins, batch_size)
+
+
+def _histogram_percentiles(histogram: np.ndarray, n_rows: int, percentiles) -> dict:
+    """Approximate rank percentiles from per-row rank histograms (bin midpoints)."""
+    n_bins = histogram.shape[1]
+    cumulative = np.cumsum(histogram, axis=1)
+    total = cumulative[:, -1:]
+    bin_width = n_rows / n_bins
+    result = {}
+    for p in percentiles:
+        bin_idx = (cumulative < np.ceil(total * p / 100)).sum(axis=1)
+        # Exact rank when every rank has its own bin, otherwise the bin midpoint
+        rank = bin_idx + 1 if bin_width == 1 else (bin_idx + 0.5) * bin_width + 0.5
+        result[f"rank_p{p:02d}"] = np.minimum(rank, n_rows)
+    return result
+
+
+def run_sensitivity(gdf, weights: dict, n_draws: int = 1000, method: str = "dirichlet", top_ranks: int = 10,
+                    rank_bins: int = 100, percentiles=(5, 50, 95), batch_size: int = 64, workers: int = None,
+                    seed=None, **sample_kwargs) -> pd.DataFrame:
+    """
+    Monte Carlo weight-sensitivity and rank-stability analysis.
+
+    Draws are scored in batches against the shared float32 criteria matrix;
+    only per-row counters are kept, so memory is bounded by
+    rows × (top_ranks + rank_bins) regardless of the number of draws.
+
+    Args:
+        gdf (GeoDataFrame): Features with the raw criterion columns.
+        weights (dict): Base weights (load_weights format).
+        n_draws (int): Number of perturbed weight vectors.
+        method (str): Perturbation method, see sample_weights.
+        top_ranks (int): Ranks for which acceptability indices are reported.
+        rank_bins (int): Histogram bins per row for rank percentiles (exact when >= rows).
+        batch_size (int): Draws scored per matmul.
+        workers (int): Spread the draws over a process pool if > 1.
+
+    Returns:
+        DataFrame (same index as gdf): base rank, rank percentiles, rai_1..rai_k
+        (share of draws at each rank) and rai_top_k.
+    """
+    start = time.perf_counter()
+    matrix, _ = build_criteria_matrix(gdf, weights)
+    n_rows = len(matrix)
+    n_bins = min(rank_bins, n_rows)
+    top_ranks = min(top_ranks, n_rows)
+    draws = sample_weights(weights, n_draws, method=method, seed=seed, **sample_kwargs)
+
+    if workers and workers > 1:
+        chunks = np.array_split(draws, workers)
+        rai_counts = np.zeros((n_rows, top_ranks), dtype=np.int64)
+        histogram = np.zeros((n_rows, n_bins), dtype=np.int64)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(matrix,)) as pool:
+            futures = [pool.submit(_worker_accumulate, chunk, top_ranks, n_bins, batch_size)
+                       for chunk in chunks if len(chunk)]
+            for future in futures:
+                partial_rai, partial_hist = future.result()
+                rai_counts += partial_rai
+                histogram += partial_hist
+    else:
+        rai_counts, histogram = _accumulate(matrix, draws, top_ranks, n_bins, batch_size)
+
+    base_vector = np.array([float(v["weight"]) for v in weights.values()], dtype=matrix.dtype)
+    result = pd.DataFrame(index=gdf.index)
+    result["rank"] = rank_scores((matrix @ base_vector)[:, np.newaxis])[:, 0]
+    for name, values in _histogram_percentiles(histogram, n_rows, percentiles).items():
+        result[name] = values
+    for r in range(top_ranks):
+        result[f"rai_{r + 1}"] = rai_counts[:, r] / n_draws
+    result[f"rai_top_{top_ranks}"] = rai_counts.sum(axis=1) / n_draws
+
+    logging.info(f"🎲 Sensitivity: {n_draws} draws × {n_rows} features in {time.perf_counter() - start:.2f}s")
+    return result
+
+
+if __name__ == "__main__":
+    shelters = read_layer(config.SCORED_OUTPUT)
+    summary = run_sensitivity(shelters, load_weights(config.WEIGHTS_PATH), n_draws=2000, seed=0)
+    output_path = os.path.join(config.OUTPUTS_DIR, "rank_sensitivity.csv")
+    summary.to_csv(output_path)
+    logging.info(f"📄 Rank sensitivity saved to: {output_path}")
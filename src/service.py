@@ -0,0 +1,433 @@
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import shapely
+
+from src import config
+from src.ahp_analysis import ahp_batch
+from src.mcda_scoring import build_criteria_matrix, build_weight_matrix, load_weights
+from src.shelter_query import ShelterIndex, top_k_indices
+from src.storage import read_layer
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+HTTP_STATUS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               500: "Internal Server Error"}
+
+
+class ServiceError(Exception):
+    """Request error reported to the client with an HTTP status."""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class ScoringState:
+    """
+    Everything the service keeps resident: the normalized criteria matrix,
+    the shelter query index, and optionally the road graph and its snapper.
+
+    Criterion directions come from the weights file at startup; rescoring
+    requests only change the weights.
+    """
+
+    def __init__(self, shelters_path: str = config.SHELTER_INPUT, weights_path: str = config.WEIGHTS_PATH,
+                 with_graph: bool = True):
+        start = time.perf_counter()
+        gdf = read_layer(shelters_path)
+        self.weights = load_weights(weights_path)
+        self.matrix, self.criteria = build_criteria_matrix(gdf, self.weights)
+        self.base_vector = build_weight_matrix(self.weights, self.criteria)[:, 0]
+
+        gdf["score"] = self.matrix @ self.base_vector
+        self.index = ShelterIndex(gdf)
+        self.ids = gdf.index.to_numpy()
+        self.lonlat = shapely.get_coordinates(shapely.point_on_surface(gdf.geometry.to_crs(epsg=4326).values))
+
+        self.graph = self.snapper = None
+        if with_graph:
+            from src.road_graph import load_road_graph
+            from src.routing import GraphSnapper
+
+            self.graph = load_road_graph()
+            self.snapper = GraphSnapper(self.graph)
+
+        logging.info(
+            f"🔥 Service state warm: {len(gdf)} shelters × {len(self.criteria)} criteria"
+            f"{', road graph ' + str(self.graph.n_nodes) + ' nodes' if self.graph else ''} "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+    def weight_vector(self, payload: dict) -> tuple:
+        """(weights, extra) from a {"weights": {...}} or {"pairwise": [[...]]} request body."""
+        if "pairwise" in payload:
+            result = ahp_batch(np.asarray(payload["pairwise"], dtype=float)[np.newaxis])
+            if result["weights"].shape[1] != len(self.criteria):
+                raise ServiceError(f"❌ Pairwise matrix must be {len(self.criteria)}×{len(self.criteria)} "
+                                   f"(criteria: {self.criteria})")
+            return result["weights"][0].astype(np.float32), {"CR": float(result["CR"][0])}
+
+        weights = payload.get("weights")
+        if not isinstance(weights, dict):
+            raise ServiceError("❌ Body needs 'weights' ({criterion: weight}) or 'pairwise' (matrix).")
+        unknown = set(weights) - set(self.criteria)
+        if unknown:
+            raise ServiceError(f"❌ Unknown criteria: {sorted(unknown)} (criteria: {self.criteria})")
+        return build_weight_matrix(weights, self.criteria)[:, 0], {}
+
+    def shelters(self, positions, scores, distances=None) -> list:
+        rows = []
+        for i, position in enumerate(positions):
+            row = {
+                "id": self.ids[position].item() if hasattr(self.ids[position], "item") else self.ids[position],
+                "score": round(float(scores[position]), 6),
+                "lon": round(float(self.lonlat[position, 0]), 6),
+                "lat": round(float(self.lonlat[position, 1]), 6),
+            }
+            if distances is not None:
+                row["distance_m"] = round(float(distances[i]), 1)
+            rows.append(row)
+        return rows
+
+
+class ScoreBatcher:
+    """
+    Micro-batches rescoring requests.
+
+    The first request of a batch waits up to `max_wait_ms` for others (or
+    until `max_batch` arrive); the batch is then scored with one
+    (rows × criteria) @ (criteria × B) matmul in a worker thread, so the
+    event loop keeps accepting connections meanwhile.
+    """
+
+    def __init__(self, state: ScoringState, max_batch: int = config.SERVICE_MAX_BATCH,
+                 max_wait_ms: float = config.SERVICE_BATCH_WAIT_MS):
+        self.state = state
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1e3
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.requests = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def score(self, weight_vector: np.ndarray, k: int):
+        """Top-k positions and the score column for one weight vector."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((weight_vector, k, future))
+        return await future
+
+    def _score_batch(self, vectors, ks):
+        scores = self.state.matrix @ np.column_stack(vectors)
+        return [(top_k_indices(scores[:, j], k), scores[:, j]) for j, k in enumerate(ks)]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            vectors, ks, futures = zip(*batch)
+            try:
+                results = await loop.run_in_executor(None, self._score_batch, vectors, ks)
+            except Exception as exc:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            for future, result in zip(futures, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class ShelterService:
+    """
+    Minimal asyncio HTTP/1.1 JSON service (keep-alive, no extra dependencies).
+
+    Endpoints:
+        GET  /health                  State summary and batching counters.
+        GET  /top?k=10                Best shelters under the startup weights.
+        POST /score    {"weights": {criterion: w} | "pairwise": [[...]], "k": 10}
+                                      Rescore all shelters, return the top k.
+        POST /nearest  {"lon", "lat", "radius", "k", "route": false}
+                                      Best shelters within radius (startup
+                                      weights), with the road route to the best.
+    """
+
+    def __init__(self, state: ScoringState, host: str = config.SERVICE_HOST, port: int = config.SERVICE_PORT,
+                 max_batch: int = config.SERVICE_MAX_BATCH, max_wait_ms: float = config.SERVICE_BATCH_WAIT_MS):
+        self.state = state
+        self.host = host
+        self.port = port
+        self.batcher = ScoreBatcher(state, max_batch, max_wait_ms)
+        self.server = None
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/top"): self.top,
+            ("POST", "/score"): self.score,
+            ("POST", "/nearest"): self.nearest,
+        }
+
+    async def start(self):
+        self.batcher.start()
+        self.server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logging.info(f"🚀 Shelter service listening on http://{self.host}:{self.port}")
+        return self
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        await self.batcher.stop()
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    # --- Endpoints ---
+
+    async def health(self, query, body):
+        return {
+            "status": "ok",
+            "shelters": len(self.state.ids),
+            "criteria": self.state.criteria,
+            "graph": self.state.graph is not None,
+            "batches": self.batcher.batches,
+            "scored_requests": self.batcher.requests,
+        }
+
+    async def top(self, query, body):
+        k = int(query.get("k", [10])[0])
+        positions = top_k_indices(self.state.index.scores, k)
+        return {"shelters": self.state.shelters(positions, self.state.index.scores)}
+
+    async def score(self, query, body):
+        vector, extra = self.state.weight_vector(body)
+        positions, scores = await self.batcher.score(vector, int(body.get("k", 10)))
+        weights = dict(zip(self.state.criteria, np.round(vector.astype(float), 6).tolist()))
+        return {"weights": weights, **extra, "shelters": self.state.shelters(positions, scores)}
+
+    async def nearest(self, query, body):
+        try:
+            location = shapely.Point(float(body["lon"]), float(body["lat"]))
+        except (KeyError, TypeError, ValueError):
+            raise ServiceError("❌ Body needs numeric 'lon' and 'lat'.")
+        radius = float(body.get("radius", config.SERVICE_RADIUS))
+        k = int(body.get("k", 1))
+
+        positions, distances = self.state.index.near_positions(location, radius, k)
+        response = {"shelters": self.state.shelters(positions, self.state.index.scores, distances)}
+
+        if body.get("route") and len(positions):
+            if self.state.graph is None:
+                raise ServiceError("❌ Routing needs the road graph (start the service with the graph).")
+            from src.routing import get_shortest_path
+
+            route = await asyncio.get_running_loop().run_in_executor(
+                None, get_shortest_path, self.state.graph, location, self.state.index.gdf.geometry.iloc[positions[0]],
+                self.state.snapper)
+            response["route"] = {"distance_m": round(float(route["distance"]), 1), "path": route["path"]}
+        return response
+
+    # --- HTTP plumbing ---
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                raw = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                status, payload = await self._dispatch(method, target, raw)
+                data = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {HTTP_STATUS[status]}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                    .encode("latin-1") + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, target: str, raw: bytes):
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            known = any(path == url.path for _, path in self.routes)
+            return (405 if known else 404), {"error": f"❌ {method} {url.path} not supported"}
+        try:
+            body = json.loads(raw) if raw else {}
+            return 200, await handler(parse_qs(url.query), body)
+        except ServiceError as exc:
+            return exc.status, {"error": str(exc)}
+        except (KeyError, ValueError, TypeError) as exc:
+            return 400, {"error": str(exc)}
+        except Exception as exc:
+            logging.exception("❌ Request failed")
+            return 500, {"error": str(exc)}
+
+
+# === Load test ===
+
+async def _request(reader, writer, method: str, path: str, body: dict = None):
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def _make_payloads(kind: str, n_requests: int, criteria: list, locations: np.ndarray, seed=42):
+    rng = np.random.default_rng(seed)
+    if kind == "score":
+        draws = rng.dirichlet(np.ones(len(criteria)), size=n_requests)
+        return [("POST", "/score", {"weights": dict(zip(criteria, row.round(4).tolist())), "k": 10})
+                for row in draws]
+    if kind == "nearest":
+        picks = locations[rng.integers(0, len(locations), n_requests)]
+        jitter = rng.normal(0, 0.005, size=picks.shape)
+        return [("POST", "/nearest", {"lon": float(x), "lat": float(y), "radius": config.SERVICE_RADIUS, "k": 3})
+                for x, y in picks + jitter]
+    raise ValueError(f"❌ Unknown load-test kind: '{kind}'")
+
+
+async def load_test(host: str, port: int, kind: str = "score", n_requests: int = 1_000, concurrency: int = 32,
+                    criteria: list = None, locations: np.ndarray = None, seed=42) -> dict:
+    """
+    Fire n_requests at a running service from `concurrency` keep-alive clients.
+
+    Args:
+        kind (str): "score" (random Dirichlet weights) or "nearest" (points
+            around random shelters; `locations` is an (n, 2) lon/lat array).
+        criteria (list): Criterion names for "score" payloads.
+
+    Returns:
+        dict: requests, errors, concurrency, throughput and p50 / p90 / p99 / max latency (ms).
+    """
+    payloads = _make_payloads(kind, n_requests, criteria or [], locations, seed)
+    queue = asyncio.Queue()
+    for payload in payloads:
+        queue.put_nowait(payload)
+    latencies, errors = [], 0
+
+    async def client():
+        nonlocal errors
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while not queue.empty():
+                method, path, body = queue.get_nowait()
+                start = time.perf_counter()
+                status, _ = await _request(reader, writer, method, path, body)
+                latencies.append(time.perf_counter() - start)
+                errors += status != 200
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ms = np.array(latencies) * 1e3
+    result = {
+        "kind": kind,
+        "requests": len(ms),
+        "errors": errors,
+        "concurrency": concurrency,
+        "requests_per_s": round(len(ms) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p90_ms": round(float(np.percentile(ms, 90)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+    logging.info(
+        f"⏱️ {kind}: {result['requests']} req @ {concurrency} clients, {result['requests_per_s']} req/s, "
+        f"p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms, errors {errors}"
+    )
+    return result
+
+
+async def benchmark_service(state: ScoringState, n_requests: int = 2_000, concurrencies=(1, 8, 32),
+                            max_batch: int = config.SERVICE_MAX_BATCH,
+                            max_wait_ms: float = config.SERVICE_BATCH_WAIT_MS) -> list:
+    """
+    Start the service on a free local port and load-test /score and /nearest.
+
+    Client and server share one event loop (and CPU), so absolute numbers are
+    pessimistic; compare runs on the same machine.
+    """
+    service = await ShelterService(state, port=0, max_batch=max_batch, max_wait_ms=max_wait_ms).start()
+    results = []
+    try:
+        for kind in ("score", "nearest"):
+            for concurrency in concurrencies:
+                batches_before = service.batcher.batches
+                result = await load_test(service.host, service.port, kind, n_requests, concurrency,
+                                         state.criteria, state.lonlat)
+                if kind == "score":
+                    batches = service.batcher.batches - batches_before
+                    result["mean_batch"] = round(result["requests"] / max(batches, 1), 1)
+                results.append(result)
+    finally:
+        await service.stop()
+    return results
+
+
+if __name__ == "__main__":
+    # python -m src.service            → serve on config.SERVICE_HOST:SERVICE_PORT
+    # python -m src.service loadtest   → in-process load test with p50/p99 latencies
+    warm_state = ScoringState(with_graph=os.path.exists(config.ROAD_GRAPH_PATH))
+    if len(sys.argv) > 1 and sys.argv[1] == "loadtest":
+        for row in asyncio.run(benchmark_service(warm_state)):
+            print(row)
+    else:
+        asyncio.run(ShelterService(warm_state).serve_forever())
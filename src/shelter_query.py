@@ -0,0 +1,149 @@
+import logging
+import time
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from scipy.spatial import cKDTree
+from shapely import STRtree
+
+from src import config
+from src.routing import _points_xy
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k highest scores, best first.
+
+    argpartition selects the k best in O(n); only those k are sorted. NaN
+    scores are never selected. Ties keep their original row order, as
+    sort_values does.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    valid = np.flatnonzero(~np.isnan(scores))
+    k = min(k, len(valid))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(valid):
+        values = scores[valid]
+        threshold = values[np.argpartition(-values, k - 1)[k - 1]]
+        # argpartition picks arbitrary rows among ties at the threshold; take the first ones
+        above = valid[values > threshold]
+        tied = valid[values == threshold]
+        valid = np.concatenate([above, tied[:k - len(above)]])
+    return valid[np.lexsort((valid, -scores[valid]))]
+
+
+class ShelterIndex:
+    """
+    Read-only query index over a scored shelter layer.
+
+    Built once (KD-tree on shelter points, STRtree on geometries, score
+    array); every query then touches only the candidate rows, so there is
+    no rescoring, re-ranking or full sort per request.
+    """
+
+    def __init__(self, gdf: gpd.GeoDataFrame, score_column: str = "score", crs: str = config.PROJECTED_CRS):
+        if score_column not in gdf.columns:
+            raise KeyError(f"❌ Missing score column: '{score_column}'")
+        if gdf.crs is None:
+            raise ValueError("❌ Shelter layer has no CRS.")
+
+        self.gdf = gdf
+        self.crs = crs
+        self.scores = gdf[score_column].to_numpy(dtype=np.float64, na_value=np.nan)
+        self.geometries = gdf.geometry.to_crs(crs).values
+        self.xy = shapely.get_coordinates(shapely.point_on_surface(self.geometries))
+        self.point_tree = cKDTree(self.xy)
+        self.geometry_tree = STRtree(np.asarray(self.geometries))
+
+    def _result(self, positions: np.ndarray, distances: np.ndarray = None) -> gpd.GeoDataFrame:
+        result = self.gdf.iloc[positions].copy()
+        result["query_rank"] = np.arange(1, len(positions) + 1)
+        if distances is not None:
+            result["distance_m"] = distances
+        return result
+
+    def top_k(self, k: int = 10) -> gpd.GeoDataFrame:
+        """The k best-scoring shelters overall."""
+        return self._result(top_k_indices(self.scores, k))
+
+    def top_k_near(self, location, radius: float, k: int = 10) -> gpd.GeoDataFrame:
+        """
+        The k best-scoring shelters within `radius` metres of a location.
+
+        Args:
+            location: Point (EPSG:4326 if a bare shapely geometry, see
+                routing._points_xy) or projected (x, y).
+            radius (float): Search radius in metres (straight line, shelter
+                point on surface).
+
+        Returns:
+            GeoDataFrame: Up to k rows, best first, with query_rank and distance_m.
+        """
+        return self._result(*self.near_positions(location, radius, k))
+
+    def near_positions(self, location, radius: float, k: int = 10):
+        """Row positions and distances (metres) behind top_k_near, without building a frame."""
+        xy = _points_xy(location, self.crs)[0]
+        candidates = np.sort(np.asarray(self.point_tree.query_ball_point(xy, radius), dtype=np.int64))
+        best = candidates[top_k_indices(self.scores[candidates], k)]
+        return best, np.hypot(*(self.xy[best] - xy).T)
+
+    def top_k_within(self, area, k: int = 10, crs: str = "EPSG:4326") -> gpd.GeoDataFrame:
+        """
+        The k best-scoring shelters intersecting a polygon.
+
+        Args:
+            area (Polygon | GeoSeries | GeoDataFrame): Search area; bare
+                geometries are taken in `crs`, the union of a series is used.
+        """
+        if isinstance(area, (gpd.GeoSeries, gpd.GeoDataFrame)):
+            area = area.to_crs(self.crs).union_all()
+        else:
+            area = gpd.GeoSeries([area], crs=crs).to_crs(self.crs).iloc[0]
+        candidates = np.sort(self.geometry_tree.query(area, predicate="intersects"))
+        return self._result(candidates[top_k_indices(self.scores[candidates], k)])
+
+    def best_near(self, location, radius: float):
+        """The single best shelter within `radius` metres, or None."""
+        result = self.top_k_near(location, radius, k=1)
+        return None if result.empty else result.iloc[0]
+
+
+def benchmark_queries(index: ShelterIndex, radius: float = 5_000.0, k: int = 10, n_queries: int = 1_000, seed=42):
+    """
+    Time top-k queries against a full sort_values per request.
+
+    Query locations are random shelter points.
+
+    Returns:
+        dict: Mean milliseconds per query type.
+    """
+    rng = np.random.default_rng(seed)
+    locations = index.xy[rng.integers(0, len(index.xy), n_queries)]
+    timings = {}
+
+    start = time.perf_counter()
+    for _ in range(n_queries):
+        index.top_k(k)
+    timings["top_k_ms"] = (time.perf_counter() - start) / n_queries * 1e3
+
+    start = time.perf_counter()
+    for location in locations:
+        index.top_k_near(location, radius, k)
+    timings["top_k_near_ms"] = (time.perf_counter() - start) / n_queries * 1e3
+
+    start = time.perf_counter()
+    for _ in range(min(n_queries, 100)):
+        index.gdf.sort_values("score", ascending=False).head(k)
+    timings["sort_values_ms"] = (time.perf_counter() - start) / min(n_queries, 100) * 1e3
+
+    logging.info(
+        f"⏱️ {len(index.xy)} shelters: top_k {timings['top_k_ms']:.3f} ms, "
+        f"top_k_near {timings['top_k_near_ms']:.3f} ms, sort_values {timings['sort_values_ms']:.3f} ms"
+    )
+    return timings
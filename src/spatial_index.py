@@ -0,0 +1,108 @@
+import logging
+import time
+
+import numpy as np
+import geopandas as gpd
+from shapely import STRtree
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+
+class NearestFeatureIndex:
+    """
+    STRtree-backed nearest-feature engine built once per target layer.
+
+    Both layers must share the same (preferably metric) CRS; distances are
+    returned in CRS units.
+    """
+
+    def __init__(self, target_gdf: gpd.GeoDataFrame):
+        if target_gdf.empty:
+            raise ValueError("❌ Target layer is empty, cannot build a spatial index.")
+
+        geoms = target_gdf.geometry.values
+        valid = ~(geoms.isna() | geoms.is_empty)
+        self.crs = target_gdf.crs
+        self.geometries = np.asarray(geoms[valid])
+        self.ids = target_gdf.index.to_numpy()[valid]
+        self.tree = STRtree(self.geometries)
+
+    def query(self, source, return_ids=True):
+        """
+        Batched nearest-feature lookup.
+
+        Args:
+            source (GeoDataFrame | GeoSeries | array): Source geometries.
+            return_ids (bool): Also return the index label of the nearest feature.
+
+        Returns:
+            np.ndarray of distances, or (distances, ids) if return_ids is True.
+        """
+        if isinstance(source, gpd.GeoDataFrame):
+            source = source.geometry
+        if isinstance(source, gpd.GeoSeries):
+            if self.crs and source.crs and source.crs != self.crs:
+                raise ValueError(f"❌ CRS mismatch: {source.crs} vs {self.crs}")
+            source = source.values
+        source = np.asarray(source)
+
+        # all_matches=False keeps exactly one (the first) nearest feature per source
+        (src_idx, tgt_idx), dist = self.tree.query_nearest(
+            source, return_distance=True, all_matches=False
+        )
+
+        distances = np.full(len(source), np.nan)
+        distances[src_idx] = dist
+        if not return_ids:
+            return distances
+
+        ids = np.full(len(source), None, dtype=object)
+        ids[src_idx] = self.ids[tgt_idx]
+        return distances, ids
+
+
+def benchmark_nearest(n_sources=(1_000, 10_000, 100_000), n_targets=(10_000, 100_000, 1_000_000), seed=42):
+    """
+    Benchmark index build and batched query times on synthetic data.
+
+    Sources are random points and targets are short random segments inside a
+    50 km × 50 km metric extent.
+
+    Returns:
+        list[dict]: One row per (sources, targets) combination.
+    """
+    import shapely
+
+    rng = np.random.default_rng(seed)
+    extent = 50_000.0
+    results = []
+
+    for m in n_targets:
+        start = rng.uniform(0, extent, size=(m, 2))
+        end = start + rng.normal(0, 50, size=(m, 2))
+        segments = shapely.linestrings(np.stack([start, end], axis=1))
+        targets = gpd.GeoDataFrame(geometry=segments, crs="EPSG:32637")
+
+        t0 = time.perf_counter()
+        index = NearestFeatureIndex(targets)
+        build_s = time.perf_counter() - t0
+
+        for n in n_sources:
+            points = shapely.points(rng.uniform(0, extent, size=(n, 2)))
+            t0 = time.perf_counter()
+            index.query(points)
+            query_s = time.perf_counter() - t0
+            results.append({
+                "sources": n,
+                "targets": m,
+                "build_s": round(build_s, 3),
+                "query_s": round(query_s, 3),
+            })
+            logging.info(f"⏱️ {n:>7} sources × {m:>8} segments: build {build_s:.2f}s, query {query_s:.2f}s")
+
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_nearest()
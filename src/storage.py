@@ -0,0 +1,260 @@
+import json
+import logging
+import os
+import tempfile
+import time
+
+import geopandas as gpd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyproj import CRS
+
+from src import config
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+# Extension → storage format
+FORMAT_BY_EXTENSION = {
+    ".parquet": "parquet",
+    ".geoparquet": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".geojson": "geojson",
+    ".json": "geojson",
+    ".gpkg": "gpkg",
+}
+
+
+def detect_format(path: str) -> str:
+    """Return the storage format implied by a file extension."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMAT_BY_EXTENSION:
+        raise ValueError(f"❌ Unsupported layer format: '{ext}' ({path})")
+    return FORMAT_BY_EXTENSION[ext]
+
+
+def layer_path(stem: str, fmt: str = None) -> str:
+    """Build a layer path from a stem (no extension) and a storage format."""
+    fmt = fmt or config.STORAGE_FORMAT
+    if fmt not in config.STORAGE_EXTENSIONS:
+        raise ValueError(f"❌ Unknown storage format: '{fmt}'")
+    return stem + config.STORAGE_EXTENSIONS[fmt]
+
+
+def resolve_layer_path(path: str) -> str:
+    """
+    Find the file backing a layer.
+
+    An existing path is returned as is. Otherwise the same stem is tried with
+    the configured storage format first, then every other known format, so
+    legacy GeoJSON inputs keep working until they are converted.
+    """
+    if os.path.exists(path):
+        return path
+
+    stem, ext = os.path.splitext(path)
+    if ext.lower() not in FORMAT_BY_EXTENSION:
+        stem = path
+    formats = [config.STORAGE_FORMAT] + [f for f in config.STORAGE_EXTENSIONS if f != config.STORAGE_FORMAT]
+    for fmt in formats:
+        candidate = layer_path(stem, fmt)
+        if os.path.exists(candidate):
+            return candidate
+
+    raise FileNotFoundError(f"❌ Layer not found: {path}")
+
+
+def layer_exists(path: str) -> bool:
+    """True if `path` or a sibling in another storage format exists."""
+    try:
+        resolve_layer_path(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def read_layer(path: str, columns=None, memory_map: bool = None) -> gpd.GeoDataFrame:
+    """
+    Read a vector layer with the backend matching its extension.
+
+    Args:
+        path (str): Layer path (an extensionless stem is resolved too).
+        columns (list): Optional subset of columns (columnar formats only).
+        memory_map (bool): Memory-map Feather files (default: config.FEATHER_MEMORY_MAP).
+
+    Returns:
+        GeoDataFrame
+    """
+    path = resolve_layer_path(path)
+    fmt = detect_format(path)
+
+    if fmt == "parquet":
+        return gpd.read_parquet(path, columns=columns)
+    if fmt == "feather":
+        if memory_map is None:
+            memory_map = config.FEATHER_MEMORY_MAP
+        return gpd.read_feather(path, columns=columns, memory_map=memory_map)
+
+    gdf = gpd.read_file(path)
+    if columns is not None:
+        gdf = gdf[[col for col in columns if col != "geometry"] + ["geometry"]]
+    return gdf
+
+
+def write_layer(gdf: gpd.GeoDataFrame, path: str) -> str:
+    """Write a vector layer with the backend matching its extension."""
+    fmt = detect_format(path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if fmt == "parquet":
+        gdf.to_parquet(path, compression="zstd")
+    elif fmt == "feather":
+        # Uncompressed so the file can be memory-mapped without decoding
+        gdf.to_feather(path, compression="uncompressed")
+    elif fmt == "geojson":
+        gdf.to_file(path, driver="GeoJSON")
+    else:
+        gdf.to_file(path, driver="GPKG")
+    return path
+
+
+def _geo_metadata(crs, column: str = "geometry") -> dict:
+    """GeoParquet "geo" schema metadata for a WKB geometry column."""
+    geo = {
+        "version": "1.0.0",
+        "primary_column": column,
+        "columns": {column: {"encoding": "WKB", "geometry_types": [],
+                             "crs": CRS.from_user_input(crs).to_json_dict() if crs else None}},
+    }
+    return {b"geo": json.dumps(geo).encode("utf-8")}
+
+
+def _read_ogr_chunks(path: str, chunk_size: int, columns=None):
+    """Stream a GeoJSON/GPKG layer as Arrow batches with a WKB "geometry" column."""
+    from pyogrio.raw import open_arrow
+
+    fields = None if columns is None else [col for col in columns if col != "geometry"]
+    read_geometry = columns is None or "geometry" in columns
+    with open_arrow(path, batch_size=chunk_size, columns=fields, read_geometry=read_geometry,
+                    use_pyarrow=True) as (meta, reader):
+        metadata = _geo_metadata(meta["crs"]) if read_geometry else None
+        for batch in reader:
+            geometry_name = meta["geometry_name"] or "wkb_geometry"
+            fields = [field.with_name("geometry") if field.name == geometry_name else field for field in batch.schema]
+            schema = pa.schema(fields, metadata=metadata)
+            yield pa.RecordBatch.from_arrays(batch.columns, schema=schema)
+
+
+def iter_layer_chunks(path: str, chunk_size: int = config.MCDA_CHUNK_SIZE, columns=None):
+    """
+    Stream a layer as Arrow record batches of at most chunk_size rows.
+
+    Geometries stay WKB-encoded and the schema keeps the GeoParquet "geo"
+    metadata, so batches can be written back out without decoding them.
+    At most one Parquet row group (or one batch) is materialized at a time;
+    with `columns`, columnar formats read nothing else from disk.
+
+    Args:
+        path (str): Layer path (an extensionless stem is resolved too).
+        chunk_size (int): Maximum rows per batch.
+        columns (list): Optional subset of columns ("geometry" included if listed).
+
+    Yields:
+        pyarrow.RecordBatch
+    """
+    path = resolve_layer_path(path)
+    fmt = detect_format(path)
+
+    if fmt == "parquet":
+        parquet_file = pq.ParquetFile(path)
+        metadata = parquet_file.schema_arrow.metadata
+        # One row group at a time: iter_batches keeps read-ahead buffers that grow with the file
+        for i in range(parquet_file.num_row_groups):
+            table = parquet_file.read_row_group(i, columns=columns)
+            for batch in table.to_batches(max_chunksize=chunk_size):
+                yield batch.replace_schema_metadata(metadata)
+            del table
+    elif fmt == "feather":
+        with pa.memory_map(path) if config.FEATHER_MEMORY_MAP else pa.OSFile(path) as source:
+            reader = pa.ipc.open_file(source)
+            metadata = reader.schema.metadata
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(columns)
+                for offset in range(0, batch.num_rows, chunk_size):
+                    yield batch.slice(offset, chunk_size).replace_schema_metadata(metadata)
+    else:
+        yield from _read_ogr_chunks(path, chunk_size, columns)
+
+
+def open_chunk_writer(path: str, schema: pa.Schema):
+    """
+    Open a streaming writer for record batches (GeoParquet or Feather only).
+
+    The returned writer has write_batch() and close() and is a context manager.
+    """
+    fmt = detect_format(path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    if fmt == "parquet":
+        return pq.ParquetWriter(path, schema, compression="zstd")
+    if fmt == "feather":
+        return pa.ipc.new_file(path, schema)
+    raise ValueError(f"❌ Chunked output needs a columnar format (.parquet/.feather): {path}")
+
+
+def export_geojson(gdf: gpd.GeoDataFrame, path: str) -> str:
+    """Export a layer as GeoJSON (EPSG:4326) for sharing and web maps."""
+    if detect_format(path) != "geojson":
+        raise ValueError(f"❌ GeoJSON export path must end with .geojson: {path}")
+    if gdf.crs and gdf.crs.to_epsg() != 4326:
+        gdf = gdf.to_crs(epsg=4326)
+    return write_layer(gdf, path)
+
+
+def benchmark_io(paths, repeat: int = 3):
+    """
+    Compare load times of the same layers stored as GeoJSON, GeoParquet and Feather.
+
+    Args:
+        paths (list): Source layers (any readable format).
+        repeat (int): Reads per format; the best time is reported.
+
+    Returns:
+        list[dict]: One row per (layer, format).
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for path in paths:
+            gdf = read_layer(path)
+            name = os.path.splitext(os.path.basename(path))[0]
+
+            for fmt in config.STORAGE_EXTENSIONS:
+                target = write_layer(gdf, layer_path(os.path.join(tmp_dir, name), fmt))
+                timings = []
+                for _ in range(repeat):
+                    t0 = time.perf_counter()
+                    read_layer(target)
+                    timings.append(time.perf_counter() - t0)
+
+                row = {
+                    "layer": name,
+                    "format": fmt,
+                    "rows": len(gdf),
+                    "size_mb": round(os.path.getsize(target) / 1e6, 3),
+                    "read_s": round(min(timings), 4),
+                }
+                results.append(row)
+                logging.info(f"⏱️ {name} [{fmt}]: {row['read_s']}s, {row['size_mb']} MB")
+
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_io([config.ROADS_PATH, config.SCORED_OUTPUT])
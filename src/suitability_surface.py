@@ -0,0 +1,300 @@
+import logging
+import math
+import multiprocessing.util
+import os
+import time
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import rasterio
+import shapely
+from affine import Affine
+from pyproj import Transformer
+from rasterio.features import rasterize
+from rasterio.windows import Window
+from scipy.spatial import cKDTree
+from shapely import STRtree
+
+from src import config
+from src.distance_field import build_distance_field, distance_block
+from src.landuse import build_landuse_score_table
+from src.mcda_scoring import load_weights
+from src.raster_sampling import sample_xy
+from src.storage import read_layer
+from src.terrain import block_windows
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+# Criteria the surface can compute, and the input layer each one needs
+SURFACE_CRITERIA = {
+    "Distance_to_Roads": "roads",
+    "Distance_to_Faults": "faults",
+    "Population_Density": "population",
+    "LandUse_Score": "landuse",
+    "Slope": "slope",
+}
+
+DEFAULT_LAYERS = {
+    "roads": config.ROADS_PATH,
+    "faults": config.FAULT_LINES_PATH,
+    "population": config.POPULATION_PATH,
+    "landuse": config.LANDUSE_PATH,
+    "slope": config.SLOPE_PATH,
+}
+
+_WORKER_STATE = None
+
+
+class SurfaceGrid:
+    """Regular north-up grid in a metric CRS, with its bounds snapped to the resolution."""
+
+    def __init__(self, bounds, resolution: float, crs: str = config.PROJECTED_CRS):
+        minx, miny, maxx, maxy = bounds
+        minx, miny = math.floor(minx / resolution) * resolution, math.floor(miny / resolution) * resolution
+        maxx, maxy = math.ceil(maxx / resolution) * resolution, math.ceil(maxy / resolution) * resolution
+        self.resolution = resolution
+        self.crs = crs
+        self.width = int(round((maxx - minx) / resolution))
+        self.height = int(round((maxy - miny) / resolution))
+        self.transform = Affine(resolution, 0, minx, 0, -resolution, maxy)
+
+    def window_transform(self, window: Window) -> Affine:
+        t = self.transform
+        return Affine(t.a, 0, t.c + window.col_off * t.a, 0, t.e, t.f + window.row_off * t.e)
+
+    def cell_centers(self, window: Window):
+        """(x, y) arrays of the cell centres of a window."""
+        t = self.transform
+        xs = t.c + (window.col_off + np.arange(window.width) + 0.5) * t.a
+        ys = t.f + (window.row_off + np.arange(window.height) + 0.5) * t.e
+        return np.meshgrid(xs, ys)
+
+
+def _load_sources(layers: dict, needed: set, crs: str, resources: ExitStack, distance_fields: dict = None) -> dict:
+    """Load and index the layers a worker needs (once per process); rasters are closed with `resources`."""
+    sources = {}
+    for name in ("roads", "faults"):
+        if name in needed and distance_fields:
+            sources[name] = resources.enter_context(rasterio.open(distance_fields[name]))
+        elif name in needed:
+            geoms = read_layer(layers[name]).to_crs(crs).geometry.values
+            geoms = np.asarray(geoms[~(geoms.isna() | geoms.is_empty)])
+            sources[name] = (geoms, STRtree(geoms))
+
+    if "population" in needed:
+        population = read_layer(layers["population"]).to_crs(crs)
+        column = next(c for c in ("population_density", "population_estimate") if c in population.columns)
+        values = population[column].to_numpy(dtype=np.float64)
+        values = np.where(np.isnan(values), np.nanmean(values), values)
+        sources["population"] = (cKDTree(shapely.get_coordinates(population.geometry.values)), values)
+
+    if "landuse" in needed:
+        landuse = read_layer(layers["landuse"]).to_crs(crs).reset_index(drop=True)
+        if "landuse" in landuse.columns:
+            scores = build_landuse_score_table(landuse["landuse"]).to_numpy()
+        else:
+            scores = np.full(len(landuse), config.LANDUSE_MATCH_SCORE)
+        geoms = landuse.geometry.values
+        sources["landuse"] = (np.asarray(geoms), scores, STRtree(np.asarray(geoms)))
+
+    if "slope" in needed:
+        dataset = resources.enter_context(rasterio.open(layers["slope"]))
+        sources["slope"] = (dataset, Transformer.from_crs(crs, dataset.crs, always_xy=True))
+    return sources
+
+
+def _distance_values(source, grid: SurfaceGrid, window: Window, max_distance: float) -> np.ndarray:
+    """Capped distance of each cell centre, from a padded block EDT or a cached distance field."""
+    if isinstance(source, rasterio.io.DatasetReader):
+        xs, ys = grid.cell_centers(window)
+        return sample_xy(source, xs.ravel(), ys.ravel(), method="nearest").reshape(xs.shape).astype(np.float32)
+    geoms, tree = source
+    return distance_block(geoms, tree, grid.transform, window, max_distance)
+
+
+def _landuse_block(source, grid: SurfaceGrid, window: Window) -> np.ndarray:
+    """Land-use score of the polygon containing each cell centre (first polygon wins, as in the shelter enrichment)."""
+    geoms, scores, tree = source
+    transform = grid.window_transform(window)
+    bounds = (transform.c, transform.f + window.height * transform.e, transform.c + window.width * transform.a,
+              transform.f)
+    hits = np.sort(tree.query(shapely.box(*bounds), predicate="intersects"))
+    out = np.full((window.height, window.width), config.LANDUSE_DEFAULT_SCORE, dtype=np.float32)
+    if len(hits):
+        # Later shapes overwrite earlier ones, so burn in reverse layer order
+        shapes = [(geoms[i], float(scores[i])) for i in hits[::-1]]
+        rasterize(shapes, out=out, transform=transform)
+    return out
+
+
+def _compute_block(sources: dict, grid: SurfaceGrid, window: Window, criteria: list, max_distance: float):
+    """Raw criterion values of one block as a (criteria, rows, cols) float32 stack."""
+    stack = np.empty((len(criteria), window.height, window.width), dtype=np.float32)
+    xs = ys = None
+    for i, criterion in enumerate(criteria):
+        layer = SURFACE_CRITERIA[criterion]
+        if layer in ("roads", "faults"):
+            stack[i] = _distance_values(sources[layer], grid, window, max_distance)
+        elif layer == "landuse":
+            stack[i] = _landuse_block(sources[layer], grid, window)
+        else:
+            if xs is None:
+                xs, ys = grid.cell_centers(window)
+            if layer == "population":
+                tree, values = sources[layer]
+                _, idx = tree.query(np.column_stack([xs.ravel(), ys.ravel()]))
+                stack[i] = values[idx].reshape(xs.shape)
+            else:
+                dataset, transformer = sources[layer]
+                sx, sy = transformer.transform(xs.ravel(), ys.ravel())
+                stack[i] = sample_xy(dataset, sx, sy, method="bilinear").reshape(xs.shape)
+    return window, stack
+
+
+def _init_worker(layers, needed, crs, distance_fields, grid, criteria, max_distance):
+    global _WORKER_STATE
+    resources = ExitStack()
+    # Pool workers leave through os._exit, so atexit would not run; multiprocessing finalizers do
+    multiprocessing.util.Finalize(None, resources.close, exitpriority=10)
+    _WORKER_STATE = (_load_sources(layers, needed, crs, resources, distance_fields), grid, criteria, max_distance)
+
+
+def _worker_compute_block(window):
+    sources, grid, criteria, max_distance = _WORKER_STATE
+    return _compute_block(sources, grid, window, criteria, max_distance)
+
+
+def _tiled_profile(grid: SurfaceGrid, count: int, block_size: int) -> dict:
+    return {
+        "driver": "GTiff", "dtype": "float32", "count": count, "nodata": np.nan,
+        "width": grid.width, "height": grid.height, "crs": grid.crs, "transform": grid.transform,
+        "tiled": True, "blockxsize": block_size, "blockysize": block_size,
+        "compress": "deflate", "predictor": 3, "BIGTIFF": "IF_SAFER",
+    }
+
+
+def build_suitability_surface(weights_path: str = config.WEIGHTS_PATH, output_path: str = config.SURFACE_OUTPUT,
+                              bounds=None, resolution: float = config.SURFACE_RESOLUTION, layers: dict = None,
+                              max_distance: float = config.SURFACE_MAX_DISTANCE,
+                              block_size: int = config.RASTER_BLOCK_SIZE, workers: int = None,
+                              keep_criteria: bool = False, distance_method: str = "block") -> str:
+    """
+    Score every cell of a grid with the AHP weights (raster MCDA).
+
+    Pass 1 computes the raw criteria block by block — capped distance
+    transforms for roads/faults (per padded block, or read from a cached
+    distance field with distance_method="field"), nearest population
+    value, land-use score of the containing polygon, bilinear slope — into a temporary tiled
+    multi-band GeoTIFF while tracking each criterion's min/max. Pass 2
+    min-max normalizes (inverting "negative" criteria), applies the weights
+    and writes the score raster. Only a few blocks are in memory at a time,
+    so grid size is bounded by disk, not RAM.
+
+    Args:
+        weights_path (str): AHP weights (load_weights format).
+        output_path (str): Score raster (tiled GeoTIFF).
+        bounds (tuple): Grid extent in config.PROJECTED_CRS (default: population layer extent).
+        resolution (float): Cell size in metres.
+        layers (dict): Override input paths (keys of DEFAULT_LAYERS).
+        max_distance (float): Distance criteria are capped at this value (metres).
+        workers (int): Compute pass-1 blocks in a process pool if > 1.
+        keep_criteria (bool): Keep the raw criteria raster next to the output.
+        distance_method (str): "block" (EDT per padded block) or "field" (build / reuse
+            whole-grid distance fields from src.distance_field, shared across runs).
+
+    Returns:
+        str: output_path
+    """
+    start = time.perf_counter()
+    weights = load_weights(weights_path)
+    criteria = list(weights)
+    unsupported = [c for c in criteria if c not in SURFACE_CRITERIA]
+    if unsupported:
+        raise ValueError(f"❌ Criteria not available as surfaces: {unsupported} (supported: {list(SURFACE_CRITERIA)})")
+    if block_size % 16:
+        raise ValueError(f"❌ Block size must be a multiple of 16 for tiled GeoTIFFs: {block_size}")
+
+    layers = dict(DEFAULT_LAYERS, **(layers or {}))
+    needed = {SURFACE_CRITERIA[c] for c in criteria}
+    crs = config.PROJECTED_CRS
+    if bounds is None:
+        bounds = read_layer(layers["population"]).to_crs(crs).total_bounds
+    grid = SurfaceGrid(bounds, resolution, crs)
+    windows = block_windows(grid.width, grid.height, block_size)
+    distance_fields = None
+    if distance_method == "field":
+        bounds = (grid.transform.c, grid.transform.f + grid.height * grid.transform.e,
+                  grid.transform.c + grid.width * grid.transform.a, grid.transform.f)
+        distance_fields = {
+            name: build_distance_field(layers[name], bounds, resolution, max_distance, crs,
+                                       block_size=block_size, snap_bounds=False)
+            for name in ("roads", "faults") if name in needed
+        }
+    elif distance_method != "block":
+        raise ValueError(f"❌ Unknown distance method: '{distance_method}'")
+    logging.info(f"🗺️ Suitability grid: {grid.width}×{grid.height} cells @ {resolution} m, {len(windows)} blocks")
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    criteria_path = os.path.splitext(output_path)[0] + "_criteria.tif"
+    low = np.full(len(criteria), np.inf)
+    high = np.full(len(criteria), -np.inf)
+
+    # Pass 1: raw criteria + running min/max
+    with rasterio.open(criteria_path, "w", **_tiled_profile(grid, len(criteria), block_size)) as dst:
+        for i, criterion in enumerate(criteria):
+            dst.set_band_description(i + 1, criterion)
+
+        def write(result):
+            window, stack = result
+            dst.write(stack, window=window)
+            flat = stack.reshape(len(criteria), -1)
+            low[:] = np.fmin(low, np.nanmin(flat, axis=1, initial=np.inf))
+            high[:] = np.fmax(high, np.nanmax(flat, axis=1, initial=-np.inf))
+
+        if workers and workers > 1:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(layers, needed, crs, distance_fields, grid, criteria, max_distance)) as pool:
+                in_flight = deque()
+                for window in windows:
+                    if len(in_flight) >= 2 * workers:
+                        write(in_flight.popleft().result())
+                    in_flight.append(pool.submit(_worker_compute_block, window))
+                while in_flight:
+                    write(in_flight.popleft().result())
+        else:
+            with ExitStack() as resources:
+                sources = _load_sources(layers, needed, crs, resources, distance_fields)
+                for window in windows:
+                    write(_compute_block(sources, grid, window, criteria, max_distance))
+    pass1_s = time.perf_counter() - start
+
+    # Pass 2: normalize, weight, score
+    weight_vector = np.array([float(weights[c]["weight"]) for c in criteria], dtype=np.float32)
+    invert = np.array([weights[c].get("direction", "positive") == "negative" for c in criteria])
+    scale = (high - low + 1e-9).astype(np.float32)
+    with rasterio.open(criteria_path) as src, \
+            rasterio.open(output_path, "w", **_tiled_profile(grid, 1, block_size)) as dst:
+        dst.set_band_description(1, "score")
+        for window in windows:
+            stack = src.read(window=window)
+            normalized = (stack - low[:, None, None].astype(np.float32)) / scale[:, None, None]
+            normalized[invert] = 1 - normalized[invert]
+            normalized = np.nan_to_num(normalized, nan=0.0)
+            dst.write(np.tensordot(weight_vector, normalized, axes=1).astype(np.float32), 1, window=window)
+
+    if not keep_criteria:
+        os.remove(criteria_path)
+    logging.info(
+        f"✅ Suitability surface saved to: {output_path} "
+        f"(criteria {pass1_s:.1f}s, scoring {time.perf_counter() - start - pass1_s:.1f}s)"
+    )
+    return output_path
+
+
+if __name__ == "__main__":
+    build_suitability_surface(workers=os.cpu_count())
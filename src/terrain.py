@@ -0,0 +1,149 @@
+import logging
+import multiprocessing.util
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+
+from src import config
+
+# Logging configuration
+logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+HALO = 1  # np.gradient needs one neighbouring pixel on each side
+
+_WORKER_DATASET = None
+
+
+def calculate_slope_aspect(dem, transform):
+    """
+    Slope and aspect (degrees) of a DEM array, in float32.
+
+    Same formulas as reel_data_created/generate_slope_aspect.py.
+    """
+    dem = np.asarray(dem, dtype=np.float32)
+    x, y = np.gradient(dem, np.float32(transform.a), np.float32(transform.e))
+
+    slope = np.degrees(np.arctan(np.sqrt(x ** 2 + y ** 2)))
+
+    aspect = np.degrees(np.arctan2(-x, y))
+    aspect = np.where(aspect < 0, 90.0 - aspect, 360.0 - aspect + 90.0).astype(np.float32)
+    aspect[np.isnan(dem)] = np.nan
+    return slope.astype(np.float32), aspect
+
+
+def block_windows(width: int, height: int, block_size: int):
+    """Non-overlapping windows covering the raster, row by row."""
+    return [
+        Window(col, row, min(block_size, width - col), min(block_size, height - row))
+        for row in range(0, height, block_size)
+        for col in range(0, width, block_size)
+    ]
+
+
+def _with_halo(window: Window, width: int, height: int):
+    """Window grown by HALO pixels (clipped to the raster) and the slice of the core inside it."""
+    col0, row0 = max(window.col_off - HALO, 0), max(window.row_off - HALO, 0)
+    col1 = min(window.col_off + window.width + HALO, width)
+    row1 = min(window.row_off + window.height + HALO, height)
+    core = (slice(window.row_off - row0, window.row_off - row0 + window.height),
+            slice(window.col_off - col0, window.col_off - col0 + window.width))
+    return Window(col0, row0, col1 - col0, row1 - row0), core
+
+
+def _process_block(dataset, window: Window):
+    """Read one block with its halo and return its slope / aspect core."""
+    padded, core = _with_halo(window, dataset.width, dataset.height)
+    dem = dataset.read(1, window=padded).astype(np.float32)
+    if dataset.nodata is not None:
+        dem[dem == dataset.nodata] = np.nan
+    slope, aspect = calculate_slope_aspect(dem, dataset.transform)
+    return window, slope[core], aspect[core]
+
+
+def _init_worker(dem_path):
+    global _WORKER_DATASET
+    _WORKER_DATASET = rasterio.open(dem_path)
+    # Pool workers leave through os._exit, so atexit would not run; multiprocessing finalizers do
+    multiprocessing.util.Finalize(None, _WORKER_DATASET.close, exitpriority=10)
+
+
+def _worker_process_block(window):
+    return _process_block(_WORKER_DATASET, window)
+
+
+def _output_profile(profile: dict, block_size: int) -> dict:
+    profile = profile.copy()
+    profile.update(
+        driver="GTiff", dtype="float32", count=1, nodata=np.nan,
+        tiled=True, blockxsize=block_size, blockysize=block_size,
+        compress="deflate", predictor=3, BIGTIFF="IF_SAFER",
+    )
+    return profile
+
+
+def slope_aspect(dem_path: str, slope_path: str = config.SLOPE_PATH, aspect_path: str = config.ASPECT_PATH,
+                 block_size: int = config.RASTER_BLOCK_SIZE, workers: int = None):
+    """
+    Compute slope and aspect rasters block by block.
+
+    Each block is read with a one-pixel halo so the gradients match a
+    whole-array computation exactly, and is written straight into tiled,
+    compressed float32 GeoTIFFs. With workers > 1 blocks are computed in a
+    process pool; at most 2 × workers blocks are in flight, so memory stays
+    bounded by the block size whatever the DEM size.
+
+    Args:
+        dem_path (str): Input DEM.
+        slope_path, aspect_path (str): Output rasters (degrees).
+        block_size (int): Block edge in pixels (multiple of 16).
+        workers (int): Process pool size; None or 1 runs in-process.
+
+    Returns:
+        (slope_path, aspect_path)
+    """
+    if block_size % 16:
+        raise ValueError(f"❌ Block size must be a multiple of 16 for tiled GeoTIFFs: {block_size}")
+    start = time.perf_counter()
+
+    with rasterio.open(dem_path) as src:
+        profile = _output_profile(src.profile, block_size)
+        windows = block_windows(src.width, src.height, block_size)
+        shape = (src.height, src.width)
+
+        for path in (slope_path, aspect_path):
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        with rasterio.open(slope_path, "w", **profile) as slope_dst, \
+                rasterio.open(aspect_path, "w", **profile) as aspect_dst:
+
+            def write(result):
+                window, slope, aspect = result
+                slope_dst.write(slope, 1, window=window)
+                aspect_dst.write(aspect, 1, window=window)
+
+            if workers and workers > 1:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                         initargs=(dem_path,)) as pool:
+                    in_flight = deque()
+                    for window in windows:
+                        if len(in_flight) >= 2 * workers:
+                            write(in_flight.popleft().result())
+                        in_flight.append(pool.submit(_worker_process_block, window))
+                    while in_flight:
+                        write(in_flight.popleft().result())
+            else:
+                for window in windows:
+                    write(_process_block(src, window))
+
+    logging.info(
+        f"⛰️ Slope/aspect: {shape[1]}×{shape[0]} px in {len(windows)} blocks "
+        f"in {time.perf_counter() - start:.2f}s → {slope_path}, {aspect_path}"
+    )
+    return slope_path, aspect_path